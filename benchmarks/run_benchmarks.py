@@ -0,0 +1,393 @@
+"""Benchmark các thao tác của CatGhepCoBan / VideoProcessor.
+
+Ví dụ::
+
+    python benchmarks/run_benchmarks.py --output bench_results.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --fail-on-regression
+    python benchmarks/run_benchmarks.py --output benchmarks/baseline.json   # lưu baseline mới
+
+Mỗi case chạy trong một tiến trình Python riêng để peak RSS và CPU (gồm cả
+các tiến trình ffmpeg con) không lẫn giữa các case. Các case ``startup/*``
+đo thời gian khởi động của CLI (``--help``, ``probe``) và của việc import
+thư viện, để phát hiện import nặng lọt vào đường khởi động.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import statistics
+import subprocess
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC = os.path.join(ROOT, "src")
+
+# Nguồn test tổng hợp bằng lavfi: (tên, (rộng, cao), thời lượng giây).
+LAVFI_FIXTURES = [
+    ("lavfi_360p_5s", (640, 360), 5),
+    ("lavfi_720p_10s", (1280, 720), 10),
+    ("lavfi_1080p_10s", (1920, 1080), 10),
+]
+BUNDLED_FIXTURES = [("video1", "video1.mp4"), ("video2", "video2.mp4")]
+FPS = 30
+SHORT_AUDIO_SECONDS = 2
+LONG_AUDIO_SECONDS = 30
+
+OPERATIONS = [
+    "merge",
+    "merge_reencode",
+    "split",
+    "extract_audio",
+    "replace_audio",
+    "mix_two_audios",
+    "swap_at_start_short",
+    "swap_at_start_long",
+]
+DEFAULT_THRESHOLD = 1.2
+# Thời gian khởi động (giây) các lệnh không render: chạy nhiều lần, lấy trung vị.
+STARTUP_REPEAT = 5
+
+
+def _ffmpeg_binary():
+    sys.path.insert(0, SRC)
+    from FFmpegTools import FFMPEG_BINARY
+    return FFMPEG_BINARY
+
+
+def _run(cmd):
+    proc = subprocess.run(cmd, stdin=subprocess.DEVNULL, capture_output=True)
+    if proc.returncode != 0:
+        raise IOError(proc.stderr.decode("utf8", errors="ignore").strip())
+    return proc
+
+
+def make_fixtures(workdir):
+    """Tạo (hoặc dùng lại) media mẫu, trả về {tên: thông tin fixture}."""
+    folder = os.path.join(workdir, "fixtures")
+    os.makedirs(folder, exist_ok=True)
+    ffmpeg = _ffmpeg_binary()
+    fixtures = {}
+    for name, (w, h), duration in LAVFI_FIXTURES:
+        path = os.path.join(folder, f"{name}.mp4")
+        if not os.path.exists(path):
+            _run([
+                ffmpeg, "-y", "-v", "error",
+                "-f", "lavfi", "-i", f"testsrc2=size={w}x{h}:rate={FPS}:duration={duration}",
+                "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+                "-c:v", "libx264", "-preset", "veryfast", "-g", str(2 * FPS),
+                "-pix_fmt", "yuv420p", "-c:a", "aac", "-shortest", path,
+            ])
+        fixtures[name] = {"path": path, "resolution": [w, h]}
+    for name, filename in BUNDLED_FIXTURES:
+        path = os.path.join(ROOT, filename)
+        if os.path.exists(path):
+            fixtures[name] = {"path": path, "resolution": None}
+    for name, duration in (("short", SHORT_AUDIO_SECONDS), ("long", LONG_AUDIO_SECONDS)):
+        path = os.path.join(folder, f"audio_{name}.mp3")
+        if not os.path.exists(path):
+            _run([
+                ffmpeg, "-y", "-v", "error", "-f", "lavfi",
+                "-i", f"sine=frequency=660:sample_rate=44100:duration={duration}",
+                "-c:a", "libmp3lame", path,
+            ])
+        fixtures[f"audio_{name}"] = {"path": path, "resolution": None}
+    return fixtures
+
+
+def list_cases(fixtures, operations=None):
+    """Danh sách case dạng ``<thao tác>/<fixture>``."""
+    operations = operations or OPERATIONS
+    videos = [name for name in fixtures if not name.startswith("audio_")]
+    return [f"{op}/{video}" for op in operations for video in videos]
+
+
+def startup_commands(fixtures):
+    """{case: dòng lệnh} đo thời gian khởi động của CLI và import thư viện."""
+    cli = [sys.executable, os.path.join(SRC, "cli.py")]
+    return {
+        "startup/help": cli + ["--help"],
+        "startup/probe": cli + ["probe", fixtures[next(iter(fixtures))]["path"]],
+        "startup/import_videomerger": [
+            sys.executable, "-c", f"import sys; sys.path.insert(0, {SRC!r}); import VideoMerger",
+        ],
+    }
+
+
+def measure_command(cmd, repeat=STARTUP_REPEAT, env=None):
+    """Chạy ``cmd`` ``repeat`` lần, trả về trung vị wall/CPU của tiến trình.
+
+    Không có peak RSS: ru_maxrss của tiến trình con mang theo mức RSS của
+    tiến trình benchmark lúc fork, vô nghĩa với lệnh chỉ chạy vài trăm ms.
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.Popen(
+            cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL, env=env,
+        )
+        # wait4 cho rusage của riêng tiến trình này (và con của nó).
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall = time.perf_counter() - start
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        if proc.returncode != 0:
+            return {"error": f"mã thoát {proc.returncode}"}
+        runs.append({"wall_time": wall, "cpu_time": usage.ru_utime + usage.ru_stime})
+    result = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+    result.update(
+        peak_rss_mb=None, output_fps=None, realtime_factor=None, output_bytes=0, runs=len(runs)
+    )
+    return result
+
+
+def _partner(fixtures, video):
+    """Video thứ hai cho các thao tác cần hai input."""
+    if video == "video1" and "video2" in fixtures:
+        return fixtures["video2"]["path"]
+    if video == "video2" and "video1" in fixtures:
+        return fixtures["video1"]["path"]
+    return fixtures[video]["path"]
+
+
+def _execute(case, fixtures, workdir, profile):
+    """Chạy một case trong tiến trình hiện tại, trả về (file ra, tiến trình xử lý)."""
+    sys.path.insert(0, SRC)
+    from VideoMerger import VideoProcessor
+    from MediaProbe import probe_media
+
+    op, video = case.split("/", 1)
+    src = fixtures[video]["path"]
+    resolution = fixtures[video]["resolution"]
+    if resolution is None:
+        info = probe_media(src)
+        resolution = [info["width"], info["height"]]
+    out_dir = os.path.join(workdir, "out", case.replace("/", "_"))
+    shutil.rmtree(out_dir, ignore_errors=True)
+    vp = VideoProcessor(
+        output_folder=out_dir, target_resolution=tuple(resolution), target_fps=FPS,
+        temp_folder=os.path.join(out_dir, "temp"), encode_profile=profile,
+    )
+    cg = vp.CG
+    partner = _partner(fixtures, video)
+
+    start = time.perf_counter()
+    if op == "merge":
+        outputs = [cg.merge_videos(src, partner)]
+    elif op == "merge_reencode":
+        outputs = [cg.merge_videos(src, partner, mode="reencode")]
+    elif op == "split":
+        outputs = list(cg.split_video_by_time(src, probe_media(src)["duration"] / 2))
+    elif op == "extract_audio":
+        outputs = [cg.extract_audio(src)]
+    elif op == "replace_audio":
+        outputs = [cg.replace_audio(src, partner, os.path.join(out_dir, "replaced.mp4"))]
+    elif op == "mix_two_audios":
+        outputs = [cg.mix_two_audios(src, partner)]
+    elif op in ("swap_at_start_short", "swap_at_start_long"):
+        audio = fixtures["audio_" + op.rsplit("_", 1)[1]]["path"]
+        outputs = [vp.merge_with_audio_swap_at_start(src, audio, "swapped.mp4")]
+    else:
+        raise ValueError(f"Thao tác không hợp lệ: {op}")
+    wall = time.perf_counter() - start
+    if not outputs or any(o is None for o in outputs):
+        raise RuntimeError(f"Case '{case}' không tạo được file ra.")
+    return outputs, wall
+
+
+def _rusage_totals():
+    me = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = me.ru_utime + me.ru_stime + children.ru_utime + children.ru_stime
+    # ru_maxrss tính bằng KB trên Linux, byte trên macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return cpu, me.ru_maxrss * scale, children.ru_maxrss * scale
+
+
+def run_case_in_process(case, fixtures, workdir, profile):
+    """Chạy ``case`` và đo wall/CPU/peak RSS; dùng trong tiến trình con."""
+    sys.path.insert(0, SRC)
+    from MediaProbe import probe_media
+
+    cpu_before = _rusage_totals()[0]
+    outputs, wall = _execute(case, fixtures, workdir, profile)
+    cpu_after, rss_self, rss_children = _rusage_totals()
+    info = probe_media(outputs[0])
+    media_seconds = sum(probe_media(o)["duration"] or 0.0 for o in outputs)
+    frames = sum(
+        (probe_media(o)["duration"] or 0.0) * (probe_media(o)["fps"] or 0.0)
+        for o in outputs if probe_media(o)["has_video"]
+    )
+    return {
+        "wall_time": wall,
+        "cpu_time": cpu_after - cpu_before,
+        "peak_rss_mb": max(rss_self, rss_children) / 1e6,
+        "python_rss_mb": rss_self / 1e6,
+        "output_fps": frames / wall if info["has_video"] and wall > 0 else None,
+        "realtime_factor": media_seconds / wall if wall > 0 else None,
+        "output_bytes": sum(os.path.getsize(o) for o in outputs),
+    }
+
+
+def run_case(case, fixtures_path, workdir, profile, repeat=1):
+    """Chạy ``case`` ``repeat`` lần, mỗi lần một tiến trình con; lấy trung vị."""
+    runs = []
+    env = dict(os.environ, TUDONGGHEP_PROBE_CACHE="")
+    for i in range(repeat):
+        result_file = os.path.join(workdir, "case_result.json")
+        if os.path.exists(result_file):
+            os.remove(result_file)
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-case", case,
+             "--fixtures", fixtures_path, "--workdir", workdir,
+             "--profile", profile, "--result-file", result_file],
+            stdin=subprocess.DEVNULL, capture_output=True, env=env,
+        )
+        if proc.returncode != 0 or not os.path.exists(result_file):
+            error = proc.stderr.decode("utf8", errors="ignore").strip().splitlines()
+            return {"error": error[-1] if error else f"mã thoát {proc.returncode}"}
+        with open(result_file) as f:
+            runs.append(json.load(f))
+    result = dict(runs[len(runs) // 2])
+    for key in ("wall_time", "cpu_time", "peak_rss_mb"):
+        result[key] = statistics.median(r[key] for r in runs)
+    result["runs"] = len(runs)
+    return result
+
+
+def environment_info(profile):
+    ffmpeg = _ffmpeg_binary()
+    try:
+        version = _run([ffmpeg, "-version"]).stdout.decode("utf8", errors="ignore").splitlines()[0]
+    except (IOError, OSError, IndexError):
+        version = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": version,
+        "encode_profile": profile,
+    }
+
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """So sánh với baseline, trả về {case: {...}} kèm cờ ``regression``.
+
+    Case bị coi là chậm đi khi wall time hoặc peak RSS vượt ``threshold``
+    lần giá trị baseline.
+    """
+    comparison = {}
+    for case, current in results.items():
+        base = baseline.get(case)
+        if not base or "error" in base or "error" in current:
+            continue
+        entry = {}
+        for key in ("wall_time", "cpu_time", "peak_rss_mb"):
+            if base.get(key) and current.get(key):
+                entry[f"{key}_ratio"] = current[key] / base[key]
+        entry["regression"] = any(
+            entry.get(f"{key}_ratio", 0) > threshold for key in ("wall_time", "peak_rss_mb")
+        )
+        comparison[case] = entry
+    return comparison
+
+
+def format_table(results, comparison=None):
+    comparison = comparison or {}
+    lines = [f"{'case':42} {'wall s':>8} {'cpu s':>8} {'RSS MB':>8} {'fps':>8} {'x base':>7}"]
+    for case, r in results.items():
+        if "error" in r:
+            lines.append(f"{case:42} LỖI: {r['error']}")
+            continue
+        fps = f"{r['output_fps']:.1f}" if r.get("output_fps") else "-"
+        rss = f"{r['peak_rss_mb']:.1f}" if r.get("peak_rss_mb") else "-"
+        ratio = comparison.get(case, {}).get("wall_time_ratio")
+        mark = f"{ratio:.2f}" if ratio else "-"
+        if comparison.get(case, {}).get("regression"):
+            mark += "!"
+        lines.append(
+            f"{case:42} {r['wall_time']:8.2f} {r['cpu_time']:8.2f} "
+            f"{rss:>8} {fps:>8} {mark:>7}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workdir", default=os.path.join(ROOT, "bench_work"))
+    parser.add_argument("--output", default=os.path.join(ROOT, "bench_results.json"))
+    parser.add_argument("--baseline", help="file JSON kết quả cũ để so sánh")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--profile", default="balanced", help="encode profile")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--only", action="append", default=[],
+                        help="chỉ chạy case chứa chuỗi này (lặp được)")
+    # Dùng nội bộ khi chạy một case trong tiến trình con.
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    parser.add_argument("--fixtures", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.makedirs(args.workdir, exist_ok=True)
+
+    if args.run_case:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
+        result = run_case_in_process(args.run_case, fixtures, args.workdir, args.profile)
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    fixtures = make_fixtures(args.workdir)
+    fixtures_path = os.path.join(args.workdir, "fixtures.json")
+    with open(fixtures_path, "w") as f:
+        json.dump(fixtures, f)
+    cases = [c for c in list_cases(fixtures) if not args.only or any(s in c for s in args.only)]
+
+    results = {}
+    # Probe không dùng cache trên đĩa để đo cả phần đọc ``ffmpeg -i``.
+    env = dict(os.environ, TUDONGGHEP_PROBE_CACHE="")
+    for case, cmd in startup_commands(fixtures).items():
+        if args.only and not any(s in case for s in args.only):
+            continue
+        results[case] = measure_command(cmd, env=env)
+        r = results[case]
+        status = f"LỖI: {r['error']}" if "error" in r else f"{r['wall_time']:.3f}s"
+        print(f"{case}: {status}", flush=True)
+    for case in cases:
+        results[case] = run_case(case, fixtures_path, args.workdir, args.profile, args.repeat)
+        r = results[case]
+        status = f"LỖI: {r['error']}" if "error" in r else f"{r['wall_time']:.2f}s"
+        print(f"{case}: {status}", flush=True)
+
+    comparison = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        comparison = compare_results(results, baseline, args.threshold)
+    report = {"environment": environment_info(args.profile), "results": results}
+    if comparison:
+        report["comparison"] = comparison
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(format_table(results, comparison))
+    print(f"Đã ghi kết quả: {args.output}")
+
+    regressions = [case for case, c in comparison.items() if c["regression"]]
+    if regressions:
+        print("Chậm hơn baseline: " + ", ".join(regressions))
+    failed = [case for case, r in results.items() if "error" in r]
+    if failed or (args.fail_on_regression and regressions):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+import asyncio
+import functools
+import threading
+import contextvars
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .VideoMerger import VideoProcessor
+    from .MediaProbe import probe_media
+    from .FFmpegTools import ffmpeg_command, use_ffmpeg_runner
+    from .Instrumentation import _ProgressEvents
+except ImportError:
+    from VideoMerger import VideoProcessor
+    from MediaProbe import probe_media
+    from FFmpegTools import ffmpeg_command, use_ffmpeg_runner
+    from Instrumentation import _ProgressEvents
+
+
+def _progress_event(block, output_path, duration):
+    """Đổi một khối ``key=value`` của ``ffmpeg -progress`` thành event."""
+    done = block.get("progress") == "end"
+    out_time = block.get("out_time_us", "")
+    seconds = int(out_time) / 1e6 if out_time.lstrip("-").isdigit() else None
+    event = {"event": "progress", "path": output_path, "time": seconds, "done": done}
+    speed = block.get("speed", "").rstrip("x")
+    try:
+        event["speed"] = float(speed)
+    except ValueError:
+        pass
+    if done:
+        event["fraction"] = 1.0
+    elif duration and seconds is not None:
+        event["fraction"] = max(0.0, min(1.0, seconds / duration))
+    return event
+
+
+async def run_ffmpeg_async(args, on_progress=None, duration=None):
+    """Chạy ffmpeg như asyncio subprocess, ném IOError kèm stderr nếu thất bại.
+
+    ``on_progress(event)`` được gọi mỗi lần ffmpeg báo tiến trình (khoảng
+    0.5s một lần); ``duration`` (giây) dùng để tính ``fraction``. Hủy
+    coroutine này sẽ kill ffmpeg và chờ nó thoát hẳn.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *ffmpeg_command(["-progress", "pipe:1", "-nostats", *args]),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stderr = asyncio.ensure_future(proc.stderr.read())
+    try:
+        block = {}
+        async for line in proc.stdout:
+            key, _, value = line.decode("utf8", errors="ignore").strip().partition("=")
+            block[key] = value
+            if key == "progress":
+                if on_progress:
+                    on_progress(_progress_event(block, args[-1], duration))
+                block = {}
+        returncode = await proc.wait()
+        error = (await stderr).decode("utf8", errors="ignore").strip()
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        stderr.cancel()
+        raise
+    if returncode != 0:
+        raise IOError(f"ffmpeg lỗi (mã {returncode}): {error}")
+
+
+def _expected_duration(args):
+    """Thời lượng file ra ước lượng từ ``-t`` hoặc input đầu tiên (None nếu không biết)."""
+    try:
+        if "-t" in args:
+            return float(args[args.index("-t") + 1])
+        return probe_media(args[args.index("-i") + 1])["duration"]
+    except Exception:
+        return None
+
+
+class _CancellableProgress(_ProgressEvents):
+    """Logger proglog cho moviepy: báo tiến trình qua runner và dừng khi bị hủy."""
+
+    def __init__(self, runner):
+        super().__init__(runner, None, step=0.02)
+        self.runner = runner
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        self.runner.check_cancelled()
+        super().bars_callback(bar, attr, value, old_value)
+
+
+class _JobRunner:
+    """Chạy ffmpeg của một job trên event loop, được gọi từ worker thread của job.
+
+    ``cancel()`` kill mọi ffmpeg đang chạy của job; lần gọi ``run_ffmpeg``
+    hoặc ``check_cancelled`` kế tiếp trong worker ném CancelledError, nên code
+    đồng bộ dừng lại như khi gặp exception (file tạm bị xóa, clip được đóng).
+    """
+
+    def __init__(self, loop, emit):
+        self.loop = loop
+        self.emit = emit
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._running = set()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise asyncio.CancelledError()
+
+    def run(self, args):
+        self.check_cancelled()
+        future = asyncio.run_coroutine_threadsafe(
+            run_ffmpeg_async(args, self.emit, _expected_duration(args)), self.loop
+        )
+        with self._lock:
+            self._running.add(future)
+        if self.cancelled.is_set():
+            future.cancel()
+        try:
+            future.result()
+        except concurrent.futures.CancelledError:
+            raise asyncio.CancelledError() from None
+        finally:
+            with self._lock:
+                self._running.discard(future)
+
+    def cancel(self):
+        self.cancelled.set()
+        with self._lock:
+            running = list(self._running)
+        for future in running:
+            future.cancel()
+
+    def moviepy_logger(self):
+        return _CancellableProgress(self)
+
+
+def _call_with_runner(runner, func, args, kwargs):
+    with use_ffmpeg_runner(runner):
+        return func(*args, **kwargs)
+
+
+class AsyncJob:
+    """Một thao tác đang chạy trong AsyncVideoProcessor.
+
+    ``await job`` trả về kết quả của hàm đồng bộ tương ứng;
+    ``async for event in job.progress()`` nhận các event ``progress`` cho tới
+    khi job xong (chỉ một consumer); ``job.cancel()`` dừng job và kill ffmpeg.
+    """
+
+    def __init__(self, task, events):
+        self.task = task
+        self._events = events
+
+    async def progress(self):
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+
+    def cancel(self):
+        return self.task.cancel()
+
+    def done(self):
+        return self.task.done()
+
+    def __await__(self):
+        return self.task.__await__()
+
+
+class AsyncVideoProcessor:
+    """Giao diện asyncio cho VideoProcessor và CatGhepCoBan (qua ``self.CG``).
+
+    Mỗi thao tác chạy trong một worker thread để không chặn event loop, còn
+    ffmpeg mà nó gọi qua ``run_ffmpeg`` được chạy như asyncio subprocess trên
+    loop. Tối đa ``max_concurrency`` thao tác chạy cùng lúc, các thao tác
+    khác chờ semaphore. Các hàm ``*_async`` trả về ``AsyncJob``::
+
+        job = processor.merge_with_audio_swap_at_start_async(video, audio)
+        async for event in job.progress():
+            print(event.get("fraction"))
+        path = await job
+    """
+
+    def __init__(self, processor=None, max_concurrency=2, **processor_kwargs):
+        self.processor = processor or VideoProcessor(**processor_kwargs)
+        self.CG = self.processor.CG
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_concurrency, thread_name_prefix="tudongghep-async")
+
+    def submit(self, func, *args, **kwargs):
+        """Chạy ``func(*args, **kwargs)`` (hàm đồng bộ) thành AsyncJob; cần event loop đang chạy."""
+        events = asyncio.Queue()
+        task = asyncio.ensure_future(self._run(func, args, kwargs, events))
+        return AsyncJob(task, events)
+
+    async def _run(self, func, args, kwargs, events):
+        loop = asyncio.get_running_loop()
+        try:
+            async with self._semaphore:
+                runner = _JobRunner(
+                    loop, lambda event: loop.call_soon_threadsafe(events.put_nowait, event)
+                )
+                call = functools.partial(
+                    contextvars.copy_context().run, _call_with_runner, runner, func, args, kwargs
+                )
+                future = asyncio.wrap_future(self._executor.submit(call))
+                try:
+                    return await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    runner.cancel()
+                    # Giữ semaphore tới khi worker thật sự dừng (ffmpeg đã bị kill).
+                    await asyncio.wait([future])
+                    if not future.cancelled():
+                        future.exception()
+                    raise
+        finally:
+            events.put_nowait(None)
+
+    def merge_with_audio_swap_at_start_async(self, video_path, new_audio_path, output_filename=None):
+        return self.submit(
+            self.processor.merge_with_audio_swap_at_start, video_path, new_audio_path, output_filename
+        )
+
+    def merge_fan_out_async(self, video_path, audio_paths, output_filenames=None):
+        return self.submit(self.processor.merge_fan_out, video_path, audio_paths, output_filenames)
+
+    def merge_videos_async(self, link1, link2, output_path=None, mode="auto"):
+        return self.submit(self.CG.merge_videos, link1, link2, output_path, mode)
+
+    def merge_many_async(self, paths, output_path=None, mode="auto"):
+        return self.submit(self.CG.merge_many, paths, output_path, mode)
+
+    def replace_audio_async(self, video_path, new_audio_path, output_path=None):
+        return self.submit(self.CG.replace_audio, video_path, new_audio_path, output_path)
+
+    def split_video_by_time_async(self, video_path, split_time, output_path1=None,
+                                  output_path2=None, mode="smart"):
+        return self.submit(
+            self.CG.split_video_by_time, video_path, split_time, output_path1, output_path2, mode
+        )
+
+    def split_video_at_times_async(self, video_path, times, output_paths=None, mode="smart"):
+        return self.submit(self.CG.split_video_at_times, video_path, times, output_paths, mode)
+
+    def mix_audio_with_video_async(self, video_path, new_audio_path, output_path=None,
+                                   gains=(1.0, 1.0)):
+        return self.submit(self.CG.mix_audio_with_video, video_path, new_audio_path, output_path, gains)
+
+    def transform_frames_async(self, video_path, transform, output_path=None, cache_key=None):
+        return self.submit(self.CG.transform_frames, video_path, transform, output_path, cache_key)
+
+    def render_timeline_async(self, timeline, output_path=None):
+        return self.submit(self.CG.render_timeline, timeline, output_path)
+
+    def close(self, wait=True):
+        """Dừng thread pool (job đang chạy vẫn chạy tiếp nếu ``wait``)."""
+        self._executor.shutdown(wait=wait)
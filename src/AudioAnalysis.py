@@ -0,0 +1,118 @@
+import numpy as np
+
+try:
+    from .AudioMixer import PcmReader
+    from .MediaProbe import get_probe_cache
+except ImportError:
+    from AudioMixer import PcmReader
+    from MediaProbe import get_probe_cache
+
+# Envelope chỉ cần năng lượng theo thời gian: decode mono 8kHz rẻ hơn nhiều
+# so với 44.1kHz stereo mà vẫn đủ để phân biệt lời nói/nhạc với im lặng.
+ANALYSIS_RATE = 8000
+WINDOW_SECONDS = 0.05
+SILENCE_DB = -40.0
+MIN_SILENCE_SECONDS = 0.25
+# Mức dB của cửa sổ hoàn toàn im lặng (tránh log10(0)).
+FLOOR_DB = -120.0
+# Số cửa sổ đọc mỗi lần từ ffmpeg (~25s audio).
+BLOCK_WINDOWS = 512
+
+
+def rms_db(samples, window_samples):
+    """RMS (dBFS) của từng cửa sổ ``window_samples`` mẫu int16; phần lẻ cuối là một cửa sổ ngắn."""
+    samples = np.asarray(samples).reshape(-1)
+    if not len(samples):
+        return np.zeros(0, dtype=np.float32)
+    full = len(samples) // window_samples * window_samples
+    x = samples.astype(np.float32) / 32768.0
+    power = np.square(x[:full]).reshape(-1, window_samples).mean(axis=1)
+    if full < len(samples):
+        power = np.append(power, np.square(x[full:]).mean())
+    return np.maximum(10.0 * np.log10(np.maximum(power, 1e-12)), FLOOR_DB).astype(np.float32)
+
+
+def compute_envelope(path, window=WINDOW_SECONDS, sample_rate=ANALYSIS_RATE,
+                     block_windows=BLOCK_WINDOWS):
+    """Envelope RMS (dBFS, mỗi phần tử là một cửa sổ ``window`` giây) của audio trong ``path``.
+
+    PCM mono được đọc từ ffmpeg theo từng block cố định, nên bộ nhớ không
+    phụ thuộc độ dài file.
+    """
+    window_samples = max(1, int(round(window * sample_rate)))
+    reader = PcmReader(path, None, window_samples * block_windows, sample_rate, 1)
+    parts = []
+    try:
+        while True:
+            block = reader.read_block()
+            if not len(block):
+                break
+            # Block đầy chia hết cho cửa sổ; chỉ block cuối có cửa sổ lẻ.
+            parts.append(rms_db(block, window_samples))
+    finally:
+        returncode, stderr = reader.close()
+    if returncode not in (0, -9):
+        raise IOError(f"Không decode được audio của '{path}': {stderr}")
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+
+
+def _envelope_record(path):
+    # Lưu trong ProbeCache dạng JSON, làm tròn 0.1 dB cho gọn.
+    return {
+        "window": WINDOW_SECONDS,
+        "db": np.round(compute_envelope(path), 1).tolist(),
+    }
+
+
+def load_envelope(path):
+    """Envelope (``WINDOW_SECONDS``) của ``path``, có cache theo file như kết quả probe."""
+    record = get_probe_cache().get_envelope(path, _envelope_record)
+    return np.asarray(record["db"], dtype=np.float32)
+
+
+def find_silences(envelope, window=WINDOW_SECONDS, threshold_db=SILENCE_DB,
+                  min_duration=MIN_SILENCE_SECONDS):
+    """Các khoảng im lặng (start, end) giây: cửa sổ dưới ``threshold_db`` liên tiếp đủ ``min_duration``."""
+    quiet = np.asarray(envelope) < threshold_db
+    if not quiet.any():
+        return []
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = (ends - starts) * window >= min_duration
+    return [(float(s * window), float(e * window)) for s, e in zip(starts[keep], ends[keep])]
+
+
+def silences(path, threshold_db=SILENCE_DB, min_duration=MIN_SILENCE_SECONDS):
+    """Các khoảng im lặng của ``path`` (dùng envelope đã cache)."""
+    return find_silences(load_envelope(path), WINDOW_SECONDS, threshold_db, min_duration)
+
+
+def average_loudness(envelope):
+    """Mức RMS trung bình (dBFS) theo năng lượng của cả envelope."""
+    envelope = np.asarray(envelope, dtype=np.float64)
+    if not len(envelope):
+        return FLOOR_DB
+    return float(10.0 * np.log10(np.mean(np.power(10.0, envelope / 10.0))))
+
+
+def nearest_silence(path, t, max_shift=1.0, forward_only=False, threshold_db=SILENCE_DB,
+                    min_duration=MIN_SILENCE_SECONDS):
+    """Điểm cắt gần ``t`` nhất nằm trong một khoảng im lặng của ``path``.
+
+    ``t`` đã nằm trong khoảng im lặng thì giữ nguyên; ngược lại lấy điểm
+    giữa khoảng im lặng gần nhất trong phạm vi ``max_shift`` giây (chỉ phía
+    sau ``t`` nếu ``forward_only``). Không có thì trả về ``t``.
+    """
+    best = t
+    best_shift = None
+    for start, end in silences(path, threshold_db, min_duration):
+        if start <= t <= end:
+            return t
+        middle = (start + end) / 2
+        shift = middle - t
+        if forward_only and shift < 0:
+            continue
+        if abs(shift) <= max_shift and (best_shift is None or abs(shift) < best_shift):
+            best, best_shift = middle, abs(shift)
+    return best
@@ -0,0 +1,171 @@
+import os
+import subprocess
+import numpy as np
+
+try:
+    from .FFmpegTools import FFMPEG_BINARY, check_cancelled
+except ImportError:
+    from FFmpegTools import FFMPEG_BINARY, check_cancelled
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+# Số mẫu (mỗi kênh) cho một block; bộ nhớ dùng tỉ lệ với giá trị này,
+# không phụ thuộc độ dài track.
+BLOCK_FRAMES = 32768
+
+AUDIO_CODECS_BY_EXT = {
+    ".mp3": "libmp3lame",
+    ".wav": "pcm_s16le",
+    ".ogg": "libvorbis",
+    ".opus": "libopus",
+    ".flac": "flac",
+}
+
+
+def audio_codec_for(path):
+    """Chọn encoder audio theo đuôi file ra (mặc định aac)."""
+    return AUDIO_CODECS_BY_EXT.get(os.path.splitext(path)[1].lower(), "aac")
+
+
+class PcmReader:
+    """Đọc PCM s16le từ ffmpeg theo từng block vào một buffer cấp phát sẵn."""
+
+    def __init__(self, path, duration=None, block_frames=BLOCK_FRAMES,
+                 sample_rate=SAMPLE_RATE, channels=CHANNELS):
+        cmd = [FFMPEG_BINARY, "-v", "error", "-i", path]
+        if duration is not None:
+            cmd += ["-t", f"{duration:.6f}"]
+        cmd += ["-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+                "-ar", str(sample_rate), "-ac", str(channels), "pipe:1"]
+        self.path = path
+        self.channels = channels
+        self.proc = subprocess.Popen(
+            cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, bufsize=0,
+        )
+        self.buffer = np.zeros((block_frames, channels), dtype=np.int16)
+        self._bytes = memoryview(self.buffer).cast("B")
+        self.finished = False
+
+    def read_block(self):
+        """Đọc một block; trả về view các mẫu đã đọc (rỗng khi hết dữ liệu)."""
+        if self.finished:
+            return self.buffer[:0]
+        filled = 0
+        while filled < len(self._bytes):
+            n = self.proc.stdout.readinto(self._bytes[filled:])
+            if not n:
+                self.finished = True
+                break
+            filled += n
+        return self.buffer[: filled // (2 * self.channels)]
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        stderr = self.proc.stderr.read().decode("utf8", errors="ignore").strip()
+        self.proc.stderr.close()
+        returncode = self.proc.wait()
+        return returncode, stderr
+
+
+class _Limiter:
+    """Giảm gain theo đỉnh của từng block để tổng các track không bị clip.
+
+    Gain giảm ngay khi có đỉnh vượt ngưỡng và hồi phục dần, nội suy tuyến
+    tính trong block để không tạo tiếng "lụp bụp".
+    """
+
+    def __init__(self, ceiling=32767.0, release_per_block=0.05):
+        self.ceiling = ceiling
+        self.release = release_per_block
+        self.gain = 1.0
+
+    def process(self, block):
+        peak = float(np.abs(block).max()) if len(block) else 0.0
+        target = min(1.0, self.ceiling / peak) if peak > 0 else 1.0
+        new_gain = target if target < self.gain else min(target, self.gain + self.release)
+        if new_gain != 1.0 or self.gain != 1.0:
+            ramp = np.linspace(self.gain, new_gain, len(block), dtype=np.float32)
+            block *= ramp[:, None]
+        self.gain = new_gain
+        np.clip(block, -self.ceiling - 1, self.ceiling, out=block)
+
+
+def mix_tracks(paths, output_path, gains=None, duration=None, video_path=None,
+               audio_codec=None, audio_bitrate=None, block_frames=BLOCK_FRAMES):
+    """Trộn N track audio theo từng block, bộ nhớ dùng không đổi theo độ dài.
+
+    Mỗi track được decode thành PCM qua một pipe ffmpeg, nhân ``gains``
+    tương ứng, cộng dồn và đi qua limiter chống clip, rồi được ghi thẳng
+    vào pipe của encoder. ``duration`` cắt mọi track; nếu có ``video_path``
+    thì luồng video của nó được giữ nguyên (``-c:v copy``) trong file ra.
+    """
+    gains = list(gains) if gains is not None else [1.0] * len(paths)
+    if len(gains) != len(paths):
+        raise ValueError("Số gains phải bằng số track.")
+    audio_codec = audio_codec or audio_codec_for(output_path)
+    encoder_cmd = [
+        FFMPEG_BINARY, "-y", "-v", "error",
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS), "-i", "pipe:0",
+    ]
+    if video_path:
+        encoder_cmd += ["-i", video_path, "-map", "1:v:0", "-map", "0:a:0", "-c:v", "copy"]
+    encoder_cmd += ["-c:a", audio_codec]
+    if audio_bitrate:
+        encoder_cmd += ["-b:a", audio_bitrate]
+    encoder_cmd.append(output_path)
+
+    readers = []
+    encoder = None
+    try:
+        readers = [PcmReader(p, duration, block_frames) for p in paths]
+        encoder = subprocess.Popen(
+            encoder_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        acc = np.zeros((block_frames, CHANNELS), dtype=np.float32)
+        scratch = np.zeros((block_frames, CHANNELS), dtype=np.float32)
+        out = np.zeros((block_frames, CHANNELS), dtype=np.int16)
+        limiter = _Limiter()
+        while True:
+            check_cancelled()
+            acc.fill(0.0)
+            n = 0
+            for reader, gain in zip(readers, gains):
+                block = reader.read_block()
+                m = len(block)
+                if m:
+                    np.multiply(block, np.float32(gain), out=scratch[:m])
+                    acc[:m] += scratch[:m]
+                    n = max(n, m)
+            if n == 0:
+                break
+            limiter.process(acc[:n])
+            np.rint(acc[:n], out=acc[:n])
+            out[:n] = acc[:n]
+            try:
+                encoder.stdin.write(memoryview(out[:n]).cast("B"))
+            except BrokenPipeError:
+                break
+        try:
+            encoder.stdin.close()
+        except BrokenPipeError:
+            pass
+        errors = encoder.stderr.read().decode("utf8", errors="ignore").strip()
+        if encoder.wait() != 0:
+            raise IOError(f"ffmpeg encode audio lỗi: {errors}")
+    finally:
+        if encoder and encoder.poll() is None:
+            encoder.kill()
+            encoder.wait()
+        failed = []
+        for reader in readers:
+            returncode, stderr = reader.close()
+            # -9 là do chính ta kill khi dừng sớm.
+            if returncode not in (0, -9):
+                failed.append(f"{reader.path}: {stderr}")
+    if failed:
+        raise IOError("Không decode được audio: " + "; ".join(failed))
+    return output_path
@@ -0,0 +1,206 @@
+import os
+import time
+import logging
+from multiprocessing.util import Finalize
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+
+@dataclass
+class MergeJob:
+    """Một cặp (video, audio) cần ghép."""
+
+    video_path: str
+    audio_path: str
+    output_filename: str = None
+    job_id: int = None  # id trong JobQueue, nếu job đến từ hàng đợi
+
+
+@dataclass
+class JobResult:
+    """Kết quả và số đo thời gian của một job."""
+
+    job: MergeJob
+    output_path: str = None
+    error: str = None
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    output_bytes: int = 0
+    live_readers: int = 0
+
+    @property
+    def ok(self):
+        return self.output_path is not None and self.error is None
+
+
+def build_cross_product_jobs(video_paths, audio_paths):
+    """Tạo danh sách job cho mọi cặp (video, audio).
+
+    Tên file ra gồm cả tên video và tên audio để các cặp không ghi đè nhau.
+    """
+    jobs = []
+    for video_path in video_paths:
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        for audio_path in audio_paths:
+            audio_name = os.path.splitext(os.path.basename(audio_path))[0]
+            jobs.append(
+                MergeJob(video_path, audio_path, f"{video_name}_{audio_name}.mp4")
+            )
+    return jobs
+
+
+def _cpu_time():
+    # Tính cả CPU của các tiến trình ffmpeg con đã kết thúc.
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+_worker_processor = None
+
+
+def _init_worker(processor_kwargs):
+    """Khởi tạo một VideoProcessor cho mỗi tiến trình worker."""
+    global _worker_processor
+    try:
+        from .VideoMerger import VideoProcessor
+    except ImportError:
+        from VideoMerger import VideoProcessor
+    _worker_processor = VideoProcessor(**processor_kwargs)
+    # Worker thoát bằng os._exit nên không có GC dọn reader; đóng chúng khi
+    # multiprocessing kết thúc worker.
+    Finalize(_worker_processor, _worker_processor.CG.clips.close_all, exitpriority=10)
+
+
+def _run_job(job):
+    """Chạy một job trong worker, không bao giờ ném lỗi ra ngoài."""
+    start = time.perf_counter()
+    cpu_start = _cpu_time()
+    output_path = None
+    error = None
+    try:
+        output_path = _worker_processor.merge_with_audio_swap_at_start(
+            job.video_path, job.audio_path, job.output_filename
+        )
+        if output_path is None:
+            error = "merge_with_audio_swap_at_start không tạo được file"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    output_bytes = 0
+    if output_path and os.path.exists(output_path):
+        output_bytes = os.path.getsize(output_path)
+    return JobResult(
+        job=job,
+        output_path=output_path,
+        error=error,
+        wall_time=time.perf_counter() - start,
+        cpu_time=_cpu_time() - cpu_start,
+        output_bytes=output_bytes,
+        live_readers=_worker_processor.CG.clips.live_readers(),
+    )
+
+
+class BatchMerger:
+    """Chạy song song danh sách MergeJob trên một process pool.
+
+    Mỗi worker giữ một VideoProcessor riêng; ``ffmpeg_threads`` là số luồng
+    encoder cho mỗi job, nên tổng số luồng xấp xỉ ``max_workers * ffmpeg_threads``.
+    """
+
+    def __init__(self, processor_kwargs=None, max_workers=None, ffmpeg_threads=None):
+        cpu_count = os.cpu_count() or 1
+        if ffmpeg_threads is None:
+            ffmpeg_threads = 2 if max_workers is None else max(1, cpu_count // max_workers)
+        if max_workers is None:
+            max_workers = max(1, cpu_count // ffmpeg_threads)
+        self.max_workers = max_workers
+        self.ffmpeg_threads = ffmpeg_threads
+        self.processor_kwargs = dict(processor_kwargs or {})
+        self.processor_kwargs["threads"] = ffmpeg_threads
+        self.wall_time = 0.0
+
+    def run(self, jobs, on_result=None, order=None):
+        """Chạy tất cả job, trả về danh sách JobResult theo thứ tự của ``jobs``.
+
+        ``order`` (chỉ số trong ``jobs``, ví dụ từ ``JobPlanner.plan``) là thứ
+        tự job được giao cho worker; mặc định theo thứ tự của ``jobs``.
+
+        Lỗi của một job chỉ được ghi vào JobResult của job đó. Nếu một worker
+        chết (BrokenProcessPool), các job chưa xong được chạy lại một lần trên
+        pool mới.
+        """
+        jobs = list(jobs)
+        order = list(range(len(jobs))) if order is None else list(order)
+        results = [None] * len(jobs)
+        start = time.perf_counter()
+        if self.max_workers == 1:
+            _init_worker(self.processor_kwargs)
+            try:
+                for i in order:
+                    results[i] = _run_job(jobs[i])
+                    self._report(results[i], on_result)
+            finally:
+                _worker_processor.CG.clips.close_all()
+        else:
+            pending = order
+            for attempt in range(2):
+                pending = self._run_pool(jobs, pending, results, on_result)
+                if not pending:
+                    break
+                logging.warning(
+                    f"Process pool bị hỏng, chạy lại {len(pending)} job chưa hoàn thành."
+                )
+            for i in pending:
+                results[i] = JobResult(job=jobs[i], error="BrokenProcessPool")
+                self._report(results[i], on_result)
+        self.wall_time = time.perf_counter() - start
+        return results
+
+    def _run_pool(self, jobs, indices, results, on_result):
+        broken = set()
+        with ProcessPoolExecutor(
+            max_workers=min(self.max_workers, len(indices)) or 1,
+            initializer=_init_worker,
+            initargs=(self.processor_kwargs,),
+        ) as pool:
+            futures = {pool.submit(_run_job, jobs[i]): i for i in indices}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except BrokenProcessPool:
+                    broken.add(i)
+                    continue
+                except Exception as e:
+                    results[i] = JobResult(job=jobs[i], error=f"{type(e).__name__}: {e}")
+                self._report(results[i], on_result)
+        return [i for i in indices if i in broken]
+
+    @staticmethod
+    def _report(result, on_result):
+        name = os.path.basename(result.job.output_filename or result.job.video_path)
+        if result.ok:
+            logging.info(f"Xong job '{name}' trong {result.wall_time:.1f}s.")
+        else:
+            logging.error(f"Job '{name}' thất bại: {result.error}")
+        if on_result:
+            on_result(result)
+
+
+def summarize_results(results, wall_time):
+    """Tính số liệu thông lượng tổng hợp cho một loạt JobResult."""
+    done = [r for r in results if r.ok]
+    total_bytes = sum(r.output_bytes for r in done)
+    job_time = sum(r.wall_time for r in results)
+    return {
+        "jobs": len(results),
+        "succeeded": len(done),
+        "failed": len(results) - len(done),
+        "wall_time": wall_time,
+        "cpu_time": sum(r.cpu_time for r in results),
+        "output_bytes": total_bytes,
+        "jobs_per_minute": len(done) * 60 / wall_time if wall_time else 0.0,
+        "output_mb_per_second": total_bytes / 1e6 / wall_time if wall_time else 0.0,
+        "parallel_speedup": job_time / wall_time if wall_time else 0.0,
+        "max_live_readers": max((r.live_readers for r in results), default=0),
+    }
@@ -1,10 +1,48 @@
 import os
-from moviepy import (
-    VideoFileClip,
-    AudioFileClip,
-    CompositeAudioClip,
-    concatenate_videoclips,
-)
+import hashlib
+import logging
+import dataclasses
+
+try:
+    from .LazyImport import lazy_callable
+    from .MediaProbe import probe_media
+    from .FFmpegTools import (
+        ENCODER_CODEC_NAMES, atomic_output, concat_copy, current_ffmpeg_runner,
+        replace_audio_copy,
+    )
+    from .SmartCut import split_at_times
+    from .AudioMixer import mix_tracks
+    from .Timeline import Timeline
+    from .EncodeProfile import get_encode_profile
+    from .Instrumentation import Instrumentation
+    from .ClipPool import ClipPool
+    from .SegmentEncoder import MIN_SEGMENT_SECONDS, encode_file
+    from .AudioAnalysis import nearest_silence
+    from .FramePipeline import run_frame_pipeline
+    from .ScratchSpace import ScratchSpace
+except ImportError:
+    from LazyImport import lazy_callable
+    from MediaProbe import probe_media
+    from FFmpegTools import (
+        ENCODER_CODEC_NAMES, atomic_output, concat_copy, current_ffmpeg_runner,
+        replace_audio_copy,
+    )
+    from SmartCut import split_at_times
+    from AudioMixer import mix_tracks
+    from Timeline import Timeline
+    from EncodeProfile import get_encode_profile
+    from Instrumentation import Instrumentation
+    from ClipPool import ClipPool
+    from SegmentEncoder import MIN_SEGMENT_SECONDS, encode_file
+    from AudioAnalysis import nearest_silence
+    from FramePipeline import run_frame_pipeline
+    from ScratchSpace import ScratchSpace
+
+VideoFileClip = lazy_callable("moviepy", "VideoFileClip")
+concatenate_videoclips = lazy_callable("moviepy", "concatenate_videoclips")
+
+# Tần số mẫu audio của file mezzanine (xem ``normalize_source``).
+NORMALIZED_AUDIO_RATE = 44100
 
 class CatGhepCoBan:
     def __init__(
@@ -13,151 +51,566 @@ class CatGhepCoBan:
         target_resolution=(720, 1280),
         target_fps=30,
         video_codec="libx264",
+        result_cache=None,
+        encode_profile=None,
+        instrumentation=None,
+        clip_pool=None,
+        normalize_cache=None,
+        segment_workers=None,
+        scratch=None,
     ):
-        self.temp_folder = temp_folder or "temp"
-        os.makedirs(self.temp_folder, exist_ok=True)
+        self.temp_folder = temp_folder or (scratch.root if scratch else "temp")
+        # Intermediate của mỗi thao tác nằm trong thư mục job riêng (xem ScratchSpace).
+        self.scratch = scratch or ScratchSpace(self.temp_folder)
         self.target_resolution = target_resolution
         self.target_fps = target_fps
         self.video_codec = video_codec
+        self.result_cache = result_cache
+        self.encode_profile = get_encode_profile(encode_profile)
+        self.instr = instrumentation or Instrumentation()
+        self.clips = clip_pool if clip_pool is not None else ClipPool()
+        self.normalize_cache = normalize_cache
+        self.segment_workers = segment_workers
+
+    def probe(self, path):
+        """probe_media có đo thời gian (stage "probe")."""
+        with self.instr.stage("probe", input=path):
+            return probe_media(path)
+
+    def write_kwargs(self, fps=None):
+        """Tham số ``write_videofile`` theo codec, fps và encode profile."""
+        kwargs = dict(
+            codec=self.video_codec,
+            fps=fps or self.target_fps,
+            **self.encode_profile.moviepy_kwargs(self.video_codec),
+        )
+        runner = current_ffmpeg_runner()
+        if runner is not None:
+            # Chạy từ AsyncProcessor: báo tiến trình qua runner và dừng được giữa chừng.
+            kwargs["logger"] = runner.moviepy_logger()
+        return kwargs
+
+    def cached_render(self, operation, inputs, params, output_paths, render, cache=None):
+        """Chạy ``render()`` qua ``cache`` (mặc định ``result_cache``, nếu có).
+
+        Khóa cache gồm định danh các file ``inputs``, tên thao tác, ``params``
+        và cấu hình encode của instance; trùng khóa thì trả ngay kết quả cũ.
+        Intermediate tạo trong lúc render nằm trong thư mục job của
+        ``scratch`` và bị xóa khi thao tác kết thúc; các ``inputs`` là file
+        chung trong ``scratch`` được giữ, không bị dọn theo quota giữa chừng.
+        """
+        cache = cache or self.result_cache
+        inputs = list(inputs)
+        with self.instr.operation(operation, inputs=inputs), self.scratch.job(operation, inputs):
+            if cache is None:
+                return render()
+            return cache.fetch_or_render(
+                operation, inputs, self.encode_params(params), output_paths, render
+            )
+
+    def encode_params(self, params=None):
+        """``params`` cộng cấu hình encode của instance (dùng làm khóa cache/hàng đợi)."""
+        return dict(
+            params or {},
+            target_resolution=list(self.target_resolution),
+            target_fps=self.target_fps,
+            video_codec=self.video_codec,
+            encode_profile=dataclasses.asdict(self.encode_profile),
+        )
 
     def clear_temp_folder(self):
-        """Xóa tất cả các file trong thư mục tạm."""
-        for filename in os.listdir(self.temp_folder):
-            file_path = os.path.join(self.temp_folder, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                print(f"Lỗi khi xóa file tạm {file_path}: {e}")
-
-    def merge_videos(self, link1, link2, output_path=None):
-        """Ghép hai video lại với nhau."""
-        c1 = (
-            VideoFileClip(link1).resize(self.target_resolution).set_fps(self.target_fps)
-        )
-        c2 = (
-            VideoFileClip(link2).resize(self.target_resolution).set_fps(self.target_fps)
-        )
-        out = concatenate_videoclips([c1, c2])
+        """Xóa các file trong thư mục tạm; thư mục của job đang chạy được giữ nguyên."""
+        self.scratch.clear()
+
+    def can_stream_copy(self, paths):
+        """Kiểm tra các file có thể nối bằng stream copy hay không.
+
+        Điều kiện: cùng codec với ``video_codec``, đúng ``target_resolution`` và
+        ``target_fps``, cùng pixel format và cùng thông số audio (hoặc cùng
+        không có audio).
+        """
+        try:
+            infos = [self.probe(p) for p in paths]
+        except Exception as e:
+            logging.warning(f"Không probe được input, dùng encode lại: {e}")
+            return False
+        codec = ENCODER_CODEC_NAMES.get(self.video_codec, self.video_codec)
+        first = infos[0]
+        for info in infos:
+            if not info["has_video"] or info["video_codec"] != codec:
+                return False
+            if (info["width"], info["height"]) != tuple(self.target_resolution):
+                return False
+            if not info["fps"] or abs(info["fps"] - self.target_fps) > 0.01:
+                return False
+            if info["pix_fmt"] != first["pix_fmt"]:
+                return False
+            audio = (info["has_audio"], info["audio_codec"], info["audio_rate"], info["audio_channels"])
+            if audio != (first["has_audio"], first["audio_codec"], first["audio_rate"], first["audio_channels"]):
+                return False
+        return True
+
+    def segment_profile(self):
+        """Encode profile cho encode theo đoạn: mỗi encoder dùng một phần số luồng."""
+        profile = self.encode_profile
+        if self.segment_workers and not profile.threads:
+            profile = profile.with_threads(max(1, (os.cpu_count() or 1) // self.segment_workers))
+        return profile
+
+    def encode_file(self, src, output_path, duration, video_args, audio_input=None, audio_args=()):
+        """Encode toàn bộ ``src`` bằng ffmpeg với ``video_codec`` và encode profile.
+
+        ``video_args`` là filter video thêm vào (ví dụ ``["-vf", ...]``); xem
+        ``SegmentEncoder.encode_file``. Khi có ``segment_workers``, nguồn dài
+        được chia đoạn và encode song song, mỗi encoder dùng một phần số luồng.
+        """
+        profile = self.segment_profile()
+        return encode_file(
+            src, output_path, duration,
+            [*video_args, "-c:v", self.video_codec, *profile.video_args(self.video_codec)],
+            audio_input, audio_args, self.segment_workers, self.scratch.work_folder(),
+        )
+
+    def is_normalized(self, info):
+        """File (theo kết quả probe) đã đúng định dạng mezzanine của instance chưa."""
+        return (
+            info["has_video"]
+            and info["video_codec"] == ENCODER_CODEC_NAMES.get(self.video_codec, self.video_codec)
+            and (info["width"], info["height"]) == tuple(self.target_resolution)
+            and bool(info["fps"]) and abs(info["fps"] - self.target_fps) <= 0.01
+            and info["pix_fmt"] == self.encode_profile.pix_fmt
+            and info["has_audio"] and info["audio_codec"] == "aac"
+            and info["audio_rate"] == NORMALIZED_AUDIO_RATE and info["audio_channels"] == "stereo"
+        )
+
+    def normalize_source(self, path):
+        """Đưa ``path`` về định dạng mezzanine, trả về đường dẫn cần dùng.
+
+        Mezzanine: ``target_resolution``, ``target_fps``, ``video_codec`` và
+        encode profile của instance, audio aac 44.1kHz stereo (thêm im lặng nếu
+        nguồn không có audio). Các mezzanine luôn nối được bằng stream copy.
+        Kết quả được lưu trong ``normalize_cache`` (hoặc ``result_cache``) theo
+        định danh nguồn và cấu hình đích, nên mỗi nguồn chỉ encode một lần.
+        """
+        info = self.probe(path)
+        if self.is_normalized(info):
+            return path
+        name = os.path.splitext(os.path.basename(path))[0]
+        digest = hashlib.sha1(os.path.abspath(path).encode("utf8")).hexdigest()[:8]
+        output_path = os.path.join(self.temp_folder, f"{name}_norm_{digest}.mp4")
+        width, height = self.target_resolution
+        codec = self.video_codec
+
+        def render():
+            # Cả hai luồng được kéo dài (lặp frame cuối / thêm im lặng) rồi cắt
+            # đúng ``duration``: concat demuxer đặt clip sau ở cuối luồng dài hơn,
+            # lệch độ dài sẽ tạo khoảng trống trong luồng kia.
+            duration = info["duration"]
+            video_filter = f"scale={width}:{height},setsar=1,fps={self.target_fps}"
+            if duration:
+                video_filter += ",tpad=stop=-1:stop_mode=clone"
+            if info["has_audio"]:
+                audio_input = ["-i", path]
+            else:
+                audio_input = ["-f", "lavfi", "-i", f"anullsrc=r={NORMALIZED_AUDIO_RATE}:cl=stereo"]
+            with self.instr.stage("encode", path=output_path, method="normalize"):
+                self.encode_file(
+                    path, output_path, duration, ["-vf", video_filter], audio_input,
+                    ["-af", "apad", "-c:a", "aac", "-ar", str(NORMALIZED_AUDIO_RATE), "-ac", "2",
+                     *self.encode_profile.audio_args()],
+                )
+            return output_path
+
+        return self.cached_render(
+            "normalize_source", [path], {}, output_path, render, cache=self.normalize_cache
+        )
+
+    def merge_videos(self, link1, link2, output_path=None, mode="auto"):
+        """Ghép hai video lại với nhau.
+
+        ``mode``: "auto" nối bằng stream copy khi hai input đã cùng thông số,
+        ngược lại chuẩn hóa từng input (nếu có ``normalize_cache``) hoặc encode
+        lại; "copy" bắt buộc stream copy; "normalize" đưa từng input về
+        mezzanine (xem ``normalize_source``) rồi stream copy; "reencode" luôn
+        decode, resize và encode lại.
+        """
+        if mode not in ("auto", "copy", "normalize", "reencode"):
+            raise ValueError(f"mode không hợp lệ: {mode}")
         default_name = f"{os.path.splitext(os.path.basename(link1))[0]}_{os.path.splitext(os.path.basename(link2))[0]}.mp4"
         final_path = output_path or os.path.join(self.temp_folder, default_name)
-        out.write_videofile(final_path, codec=self.video_codec, fps=self.target_fps)
-        c1.close()
-        c2.close()
-        out.close()
+        return self.cached_render(
+            "merge_videos", [link1, link2], {"mode": mode}, final_path,
+            lambda: self._merge_videos(link1, link2, final_path, mode),
+        )
+
+    def _merge_videos(self, link1, link2, final_path, mode):
+        # Không có normalize_cache thì "auto" giữ cách cũ: encode lại bằng moviepy.
+        fallback = "normalize" if self.normalize_cache is not None else "reencode"
+        return self._merge_many([link1, link2], final_path, mode, fallback)
+
+    def merge_many(self, paths, output_path=None, mode="auto"):
+        """Nối ``paths`` theo thứ tự trong một lần ghi.
+
+        ``mode`` như ``merge_videos``, trừ "auto": nếu cả danh sách không nối
+        được bằng stream copy thì từng clip được xét riêng, clip đã đúng định
+        dạng mezzanine giữ nguyên, clip còn lại được ``normalize_source``
+        (có cache), rồi tất cả được nối bằng stream copy. Chi phí vì thế tỉ lệ
+        với số clip cần chuẩn hóa, không phải tổng độ dài đã nối.
+        """
+        paths = list(paths)
+        if not paths:
+            raise ValueError("Cần ít nhất một video để nối.")
+        if mode not in ("auto", "copy", "normalize", "reencode"):
+            raise ValueError(f"mode không hợp lệ: {mode}")
+        first = os.path.splitext(os.path.basename(paths[0]))[0]
+        final_path = output_path or os.path.join(
+            self.temp_folder, f"{first}_merged_{len(paths)}.mp4"
+        )
+        return self.cached_render(
+            "merge_many", paths, {"mode": mode}, final_path,
+            lambda: self._merge_many(paths, final_path, mode),
+        )
+
+    def _merge_many(self, paths, final_path, mode, fallback="normalize"):
+        if mode != "reencode":
+            if self.can_stream_copy(paths):
+                with self.instr.stage("mux", path=final_path, method="concat_copy"):
+                    return concat_copy(paths, final_path, self.scratch.work_folder(0))
+            if mode == "copy":
+                raise ValueError("Các input không cùng thông số luồng, không thể stream copy.")
+            if mode == "auto":
+                mode = fallback
+        if mode == "normalize":
+            # Clip lặp lại (intro/outro) chỉ chuẩn hóa một lần.
+            normalized = {p: self.normalize_source(p) for p in dict.fromkeys(paths)}
+            parts = [normalized[p] for p in paths]
+            # Mezzanine dùng chung giữa các job: giữ tới lúc nối xong.
+            self.scratch.retain(normalized.values())
+            copied = sum(1 for part, path in zip(parts, paths) if part == path)
+            logging.info(
+                f"Nối {len(paths)} clip: {copied} giữ nguyên, {len(paths) - copied} đã chuẩn hóa."
+            )
+            with self.instr.stage("mux", path=final_path, method="concat_normalized"):
+                return concat_copy(parts, final_path, self.scratch.work_folder(0))
+        with self.clips.session() as clips:
+            with self.instr.stage("open", input=paths):
+                sources = [
+                    clips.open(VideoFileClip, p)
+                    .resized(self.target_resolution).with_fps(self.target_fps)
+                    for p in paths
+                ]
+                out = concatenate_videoclips(sources)
+            self.instr.write_videofile(out, final_path, sources, **self.write_kwargs())
         return final_path
 
     def extract_audio(self, video_path, output_path=None):
-        with VideoFileClip(video_path) as clip:
-            if clip.audio:
-                name = os.path.splitext(os.path.basename(video_path))[0]
-                final_audio_output = output_path or os.path.join(
-                    self.temp_folder, f"{name}_audio_only.mp3"
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        final_audio_output = output_path or os.path.join(
+            self.temp_folder, f"{name}_audio_only.mp3"
+        )
+
+        def render():
+            with self.clips.session() as clips:
+                with self.instr.stage("open", input=video_path):
+                    clip = clips.open(VideoFileClip, video_path)
+                if clip.audio:
+                    with self.instr.stage("encode", path=final_audio_output):
+                        clip.audio.write_audiofile(
+                            final_audio_output, bitrate=self.encode_profile.audio_bitrate
+                        )
+                    return final_audio_output
+            return None
+
+        return self.cached_render(
+            "extract_audio", [video_path], {}, final_audio_output, render
+        )
+
+    def _swap_audio(self, video_path, audio_path, final_output_path):
+        """Thay audio bằng remux (giữ nguyên luồng video), encode lại nếu không remux được."""
+        return self.cached_render(
+            "swap_audio", [video_path, audio_path], {}, final_output_path,
+            lambda: self._render_swap_audio(video_path, audio_path, final_output_path),
+        )
+
+    def _render_swap_audio(self, video_path, audio_path, final_output_path):
+        try:
+            video_duration = self.probe(video_path)["duration"]
+            with self.instr.stage("mux", path=final_output_path, method="remux"):
+                return replace_audio_copy(
+                    video_path, audio_path, final_output_path, duration=video_duration,
+                    audio_bitrate=self.encode_profile.audio_bitrate,
                 )
-                clip.audio.write_audiofile(final_audio_output)
-                return final_audio_output
-        return None
+        except IOError as e:
+            logging.warning(f"Không remux được '{video_path}', encode lại video: {e}")
+        with self.clips.session() as clips:
+            with self.instr.stage("open", input=[video_path, audio_path]):
+                video = clips.open(VideoFileClip, video_path)
+                audio = clips.open(VideoFileClip, audio_path).audio
+                if audio.duration > video.duration:
+                    audio = audio.subclipped(0, video.duration)
+                video_with_new_audio = video.with_audio(audio)
+            self.instr.write_videofile(
+                video_with_new_audio, final_output_path, [video], **self.write_kwargs()
+            )
+        return final_output_path
 
     def set_audio_video(self, video_link, audio_link, output_path=None):
-        video = VideoFileClip(video_link)
-        audio_temp_clip = VideoFileClip(audio_link)
-        audio = audio_temp_clip.audio
-        if audio.duration > video.duration:
-            audio = audio.subclip(0, video.duration)
-        video_with_new_audio = video.set_audio(audio)
         name = os.path.splitext(os.path.basename(video_link))[0]
         final_output_path = output_path or os.path.join(
             self.temp_folder, f"{name}_new_audio.mp4"
         )
-        video_with_new_audio.write_videofile(
-            final_output_path, codec=self.video_codec, fps=self.target_fps
-        )
-        video.close()
-        audio_temp_clip.close()
-        video_with_new_audio.close()
-        return final_output_path
+        return self._swap_audio(video_link, audio_link, final_output_path)
 
     def replace_audio(self, video_path, new_audio_path, output_path=None):
-        video_clip = VideoFileClip(video_path)
-        audio_temp_clip = VideoFileClip(new_audio_path)
-        audio_clip = audio_temp_clip.audio
-        if audio_clip.duration > video_clip.duration:
-            audio_clip = audio_clip.subclip(0, video_clip.duration)
-        final_clip = video_clip.set_audio(audio_clip)
         base_name = os.path.splitext(os.path.basename(video_path))[0]
         default_output_name = f"{base_name}_audio_replaced.mp4"
         final_output_path = output_path or os.path.join(
             self.temp_folder, default_output_name
         )
-        final_clip.write_videofile(
-            final_output_path, codec=self.video_codec, fps=self.target_fps
-        )
-        video_clip.close()
-        audio_temp_clip.close()
-        final_clip.close()
-        return final_output_path
+        return self._swap_audio(video_path, new_audio_path, final_output_path)
 
     def split_video_by_time(
-        self, video_path, split_time, output_path1=None, output_path2=None
+        self, video_path, split_time, output_path1=None, output_path2=None, mode="smart",
+        snap_to_silence=None,
     ):
-        with VideoFileClip(video_path) as clip:
+        """Chia video thành hai phần tại ``split_time`` (giây).
+
+        ``mode``: "smart" stream copy phần thẳng hàng với keyframe và chỉ encode
+        lại đoạn GOP chứa điểm cắt (giữ fps gốc); "reencode" encode lại toàn bộ
+        bằng moviepy ở ``target_fps``. ``snap_to_silence`` (giây) dời điểm cắt
+        tới khoảng im lặng gần nhất trong phạm vi đó (xem AudioAnalysis).
+        """
+        if snap_to_silence:
+            split_time = self.snap_to_silence(video_path, split_time, snap_to_silence)
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        final_output1 = output_path1 or os.path.join(
+            self.temp_folder, f"{name}_part1.mp4"
+        )
+        final_output2 = output_path2 or os.path.join(
+            self.temp_folder, f"{name}_part2.mp4"
+        )
+        if mode not in ("smart", "reencode"):
+            raise ValueError(f"mode không hợp lệ: {mode}")
+        self.cached_render(
+            "split", [video_path], {"times": [split_time], "mode": mode},
+            [final_output1, final_output2],
+            lambda: self._split_video_by_time(
+                video_path, split_time, final_output1, final_output2, mode
+            ),
+        )
+        return final_output1, final_output2
+
+    def _split_video_by_time(self, video_path, split_time, final_output1, final_output2, mode):
+        if mode == "smart":
+            paths = [final_output1, final_output2]
+            with self.instr.stage("encode", paths=paths, method="smart_cut"):
+                return split_at_times(
+                    video_path, [split_time], paths,
+                    self.smart_cut_folder(video_path), self.video_codec, self.encode_profile,
+                )
+        with self.clips.session() as clips:
+            with self.instr.stage("open", input=video_path):
+                clip = clips.open(VideoFileClip, video_path)
             split_time = min(split_time, clip.duration)
             clip1 = clip.subclipped(0, split_time)
             clip2 = clip.subclipped(split_time)
-            name = os.path.splitext(os.path.basename(video_path))[0]
-            final_output1 = output_path1 or os.path.join(
-                self.temp_folder, f"{name}_part1.mp4"
-            )
-            final_output2 = output_path2 or os.path.join(
-                self.temp_folder, f"{name}_part2.mp4"
-            )
-            clip1.write_videofile(
-                final_output1, codec=self.video_codec, fps=self.target_fps
-            )
-            clip2.write_videofile(
-                final_output2, codec=self.video_codec, fps=self.target_fps
-            )
+            self.instr.write_videofile(clip1, final_output1, [clip], **self.write_kwargs())
+            self.instr.write_videofile(clip2, final_output2, [clip], **self.write_kwargs())
             return final_output1, final_output2
 
+    def smart_cut_folder(self, video_path):
+        """Thư mục tạm cho smart cut: mỗi đoạn cắt stream copy lại tối đa cỡ cả file nguồn."""
+        try:
+            expected = os.path.getsize(video_path)
+        except OSError:
+            expected = None
+        return self.scratch.work_folder(expected)
+
+    def snap_to_silence(self, path, t, max_shift, forward_only=False):
+        """``nearest_silence`` có đo thời gian; lỗi đọc audio thì giữ nguyên ``t``."""
+        try:
+            with self.instr.stage("analyze", input=path):
+                snapped = nearest_silence(path, t, max_shift, forward_only)
+        except Exception as e:
+            logging.warning(f"Không phân tích được audio của '{path}', giữ điểm cắt {t}s: {e}")
+            return t
+        if snapped != t:
+            logging.info(f"Dời điểm cắt {t:.2f}s tới khoảng im lặng ở {snapped:.2f}s.")
+        return snapped
+
+    def split_video_at_times(self, video_path, times, output_paths=None, mode="smart",
+                             snap_to_silence=None):
+        """Chia video thành ``len(times) + 1`` phần (ví dụ tách chương).
+
+        Mặc định các phần được đặt tên ``<tên>_part1.mp4``, ``<tên>_part2.mp4``...
+        ``snap_to_silence`` như ``split_video_by_time``.
+        """
+        if snap_to_silence:
+            times = [self.snap_to_silence(video_path, t, snap_to_silence) for t in times]
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        output_paths = output_paths or [
+            os.path.join(self.temp_folder, f"{name}_part{i + 1}.mp4")
+            for i in range(len(times) + 1)
+        ]
+        if mode not in ("smart", "reencode"):
+            raise ValueError(f"mode không hợp lệ: {mode}")
+        return self.cached_render(
+            "split", [video_path], {"times": sorted(times), "mode": mode}, output_paths,
+            lambda: self._split_video_at_times(video_path, times, output_paths, mode),
+        )
+
+    def _split_video_at_times(self, video_path, times, output_paths, mode):
+        if mode == "smart":
+            with self.instr.stage("encode", paths=output_paths, method="smart_cut"):
+                return split_at_times(
+                    video_path, times, output_paths, self.smart_cut_folder(video_path),
+                    self.video_codec, self.encode_profile,
+                )
+        with self.clips.session() as clips:
+            with self.instr.stage("open", input=video_path):
+                clip = clips.open(VideoFileClip, video_path)
+            bounds = [0] + sorted(min(t, clip.duration) for t in times) + [clip.duration]
+            for (start, end), path in zip(zip(bounds, bounds[1:]), output_paths):
+                self.instr.write_videofile(
+                    clip.subclipped(start, end), path, [clip], **self.write_kwargs()
+                )
+        return output_paths
+
+    def mix_audios(self, audio_paths, output_path=None, gains=None, duration_limit=None):
+        """Trộn N file audio thành một file, decode và trộn theo từng block.
+
+        ``gains`` là hệ số âm lượng cho từng track (mặc định 1.0); đỉnh vượt
+        ngưỡng được limiter giảm xuống thay vì bị clip.
+        """
+        names = [os.path.splitext(os.path.basename(p))[0] for p in audio_paths]
+        default_name = "_".join(names) + "_mixed.mp3"
+        final_output_path = output_path or os.path.join(self.temp_folder, default_name)
+
+        def render():
+            with self.instr.stage("encode", path=final_output_path, method="pcm_mix"):
+                return mix_tracks(
+                    audio_paths, final_output_path, gains, duration=duration_limit,
+                    audio_bitrate=self.encode_profile.audio_bitrate,
+                )
+
+        return self.cached_render(
+            "mix_audios", audio_paths,
+            {"gains": gains, "duration_limit": duration_limit}, final_output_path, render,
+        )
+
     def mix_two_audios(
         self, audio_path1, audio_path2, output_path=None, duration_limit=None
     ):
-        audio1 = AudioFileClip(audio_path1)
-        audio2 = AudioFileClip(audio_path2)
-        clips_to_mix = []
-        for aud in [audio1, audio2]:
-            if duration_limit and aud.duration > duration_limit:
-                clips_to_mix.append(aud.subclip(0, duration_limit))
-            else:
-                clips_to_mix.append(aud)
-        combined_audio = CompositeAudioClip(clips_to_mix)
-        name1 = os.path.splitext(os.path.basename(audio_path1))[0]
-        name2 = os.path.splitext(os.path.basename(audio_path2))[0]
-        default_name = f"{name1}_{name2}_mixed.mp3"
-        final_output_path = output_path or os.path.join(self.temp_folder, default_name)
-        combined_audio.write_audiofile(final_output_path, codec='mp3')
-        return final_output_path
+        return self.mix_audios(
+            [audio_path1, audio_path2], output_path, duration_limit=duration_limit
+        )
+
+    def mix_audio_with_video(self, video_path, new_audio_path, output_path=None, gains=(1.0, 1.0)):
+        """Trộn thêm ``new_audio_path`` vào audio gốc của video.
 
-    def mix_audio_with_video(self, video_path, new_audio_path, output_path=None):
-        video_clip = VideoFileClip(video_path)
-        new_audio_clip = AudioFileClip(new_audio_path)
-        if new_audio_clip.duration > video_clip.duration:
-            new_audio_clip = new_audio_clip.subclipped(0, video_clip.duration)
-        if video_clip.audio:
-            final_audio = CompositeAudioClip([video_clip.audio, new_audio_clip])
+        ``gains`` là (gain audio gốc, gain audio mới). Audio mới bị cắt theo
+        thời lượng video; luồng video được giữ nguyên.
+        """
+        info = self.probe(video_path)
+        if info["has_audio"]:
+            tracks, gains = [video_path, new_audio_path], list(gains)
         else:
-            final_audio = new_audio_clip
-        final_clip = video_clip.with_audio(final_audio)
+            tracks, gains = [new_audio_path], [gains[1]]
         name = os.path.splitext(os.path.basename(video_path))[0]
         final_output_path = output_path or os.path.join(
             self.temp_folder, f"{name}_da_tron_am_thanh.mp4"
         )
-        final_clip.write_videofile(
-            final_output_path, codec="libx264", audio_codec="aac"
+
+        def render():
+            with self.instr.stage("encode", path=final_output_path, method="pcm_mix"):
+                return mix_tracks(
+                    tracks, final_output_path, gains,
+                    duration=info["duration"], video_path=video_path, audio_codec="aac",
+                    audio_bitrate=self.encode_profile.audio_bitrate,
+                )
+
+        return self.cached_render(
+            "mix_audio_with_video", [video_path, new_audio_path], {"gains": gains},
+            final_output_path, render,
+        )
+
+    def transform_frames(self, video_path, transform, output_path=None, cache_key=None):
+        """Encode lại video với ``transform(frame, t)`` áp lên từng frame (xem FramePipeline).
+
+        Frame có kích thước ``target_resolution`` và fps ``target_fps``,
+        ``transform`` sửa mảng uint8 tại chỗ; audio gốc được encode lại theo
+        profile. Chỉ dùng cache kết quả khi có ``cache_key`` mô tả transform.
+        """
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        final_output_path = output_path or os.path.join(self.temp_folder, f"{name}_fx.mp4")
+        width, height = self.target_resolution
+        video_args = ["-c:v", self.video_codec, *self.encode_profile.video_args(self.video_codec)]
+        audio_args = ["-c:a", "aac", *self.encode_profile.audio_args()]
+
+        def render():
+            info = self.probe(video_path)
+            with self.instr.stage(
+                "encode", path=final_output_path, method="frame_pipeline"
+            ) as record:
+                with atomic_output(final_output_path) as tmp_path:
+                    record["frames"] = run_frame_pipeline(
+                        video_path, tmp_path, transform, width, height, self.target_fps,
+                        video_args, audio_args, duration=info["duration"],
+                    )
+            return final_output_path
+
+        if cache_key is None:
+            with self.instr.operation("transform_frames", inputs=[video_path]):
+                return render()
+        return self.cached_render(
+            "transform_frames", [video_path], {"transform": cache_key}, final_output_path, render
+        )
+
+    def new_timeline(self):
+        """Tạo Timeline rỗng theo ``target_resolution``/``target_fps``.
+
+        Dùng thay cho chuỗi split -> merge -> replace_audio -> mix để cả chuỗi
+        chỉ encode một lần, ví dụ::
+
+            tl = cg.new_timeline()
+            tl.add_clip("a.mp4", 0, 12).add_clip("b.mp4")
+            tl.add_audio("nhac.mp3", replace=True)
+            cg.render_timeline(tl, "out.mp4")
+        """
+        return Timeline(self.target_resolution, self.target_fps)
+
+    def render_timeline(self, timeline, output_path=None):
+        """Render timeline thành một file bằng một lần encode.
+
+        Có ``segment_workers`` và timeline đủ dài thì video được encode song
+        song theo phần (xem ``Timeline.render_segmented``).
+        """
+        if output_path is None:
+            name = os.path.splitext(os.path.basename(timeline.segments[0].source))[0]
+            output_path = os.path.join(self.temp_folder, f"{name}_timeline.mp4")
+        sources = sorted({item.source for item in timeline.segments + timeline.overlays})
+
+        def render():
+            if self.segment_workers and self.segment_workers > 1 and (
+                timeline.duration() >= 2 * MIN_SEGMENT_SECONDS
+            ):
+                profile = self.segment_profile()
+                with self.instr.stage("encode", path=output_path, method="filter_graph_segmented"):
+                    return timeline.render_segmented(
+                        output_path, self.segment_workers, self.scratch.work_folder(),
+                        self.video_codec, video_args=profile.video_args(self.video_codec),
+                        audio_args=profile.audio_args(),
+                    )
+            with self.instr.stage("encode", path=output_path, method="filter_graph"):
+                return timeline.render(
+                    output_path, self.video_codec,
+                    encode_args=self.encode_profile.video_args(self.video_codec)
+                    + self.encode_profile.audio_args(),
+                )
+
+        return self.cached_render(
+            "timeline", sources, dataclasses.asdict(timeline), output_path, render,
         )
-        video_clip.close()
-        final_clip.close()
-        return final_output_path
 
 if __name__ == "__main__":
     cg = CatGhepCoBan()
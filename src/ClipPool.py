@@ -0,0 +1,169 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def _source_key(path):
+    """Định danh nguồn: đổi nội dung file (size/mtime) thì không dùng lại reader cũ."""
+    try:
+        st = os.stat(path)
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    except (OSError, TypeError):
+        return (path,)
+
+
+class _Entry:
+    __slots__ = ("clip", "refs")
+
+    def __init__(self, clip):
+        self.clip = clip
+        self.refs = 1
+
+
+class ClipPool:
+    """Quản lý vòng đời các clip moviepy (VideoFileClip, AudioFileClip...).
+
+    Clip được mở qua ``session()``; khi session kết thúc clip được trả về
+    pool và giữ mở (tối đa ``max_idle`` clip rảnh, LRU) để job sau cùng
+    nguồn dùng lại reader thay vì mở ffmpeg mới. Nếu session kết thúc bằng
+    exception, các clip của nó bị đóng ngay vì reader có thể đang ở trạng
+    thái hỏng.
+
+    Clip phái sinh (``subclipped``, ``resized``, ``with_audio``...) dùng
+    chung reader với clip gốc nên không được ``close()`` riêng; pool là nơi
+    duy nhất đóng reader. Mỗi clip chỉ thuộc một session tại một thời điểm;
+    session khác cần cùng nguồn thì được mở reader mới.
+    """
+
+    def __init__(self, max_idle=2):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+
+    def __getstate__(self):
+        # Clip đang mở không pickle được; worker nhận một pool rỗng.
+        return {"max_idle": self.max_idle}
+
+    def __setstate__(self, state):
+        self.__init__(state["max_idle"])
+
+    def acquire(self, factory, path, *args, **kwargs):
+        """Mở ``factory(path, ...)`` hoặc dùng lại clip rảnh cùng nguồn.
+
+        Clip đang được session khác dùng không bao giờ được trao lần nữa: hai
+        thread đọc chung một reader sẽ seek lẫn nhau.
+        """
+        key = (factory, _source_key(path), args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            for k, entry in self._entries.items():
+                if k[:4] == key and entry.refs == 0:
+                    entry.refs = 1
+                    self._entries.move_to_end(k)
+                    self.reused += 1
+                    return entry.clip
+        clip = factory(path, *args, **kwargs)
+        with self._lock:
+            if key in self._entries:
+                # Cùng nguồn đang được dùng; giữ cả hai dưới khóa riêng.
+                key = key + (id(clip),)
+            self._entries[key] = _Entry(clip)
+            self.opened += 1
+        return clip
+
+    def _find(self, clip):
+        for key, entry in self._entries.items():
+            if entry.clip is clip:
+                return key, entry
+        return None, None
+
+    def release(self, clip):
+        """Trả clip về pool; đóng bớt clip rảnh vượt quá ``max_idle``."""
+        with self._lock:
+            key, entry = self._find(clip)
+            if entry is None:
+                return
+            entry.refs = max(0, entry.refs - 1)
+            idle = [k for k, e in self._entries.items() if e.refs == 0]
+            to_close = idle[: max(0, len(idle) - self.max_idle)]
+            clips = [self._entries.pop(k).clip for k in to_close]
+        for c in clips:
+            self._close(c)
+
+    def discard(self, clip):
+        """Đóng clip ngay và bỏ khỏi pool."""
+        with self._lock:
+            key, entry = self._find(clip)
+            if entry is not None:
+                del self._entries[key]
+        self._close(clip)
+
+    def _close(self, clip):
+        try:
+            clip.close()
+        except Exception as e:
+            logging.warning(f"Lỗi khi đóng clip: {e}")
+        self.closed += 1
+
+    def close_all(self):
+        """Đóng mọi clip còn giữ (kể cả clip đang được dùng)."""
+        with self._lock:
+            clips = [e.clip for e in self._entries.values()]
+            self._entries.clear()
+        for clip in clips:
+            self._close(clip)
+
+    @contextmanager
+    def session(self):
+        """Phạm vi dùng clip: ``with pool.session() as s: clip = s.open(VideoFileClip, path)``."""
+        session = ClipSession(self)
+        try:
+            yield session
+        except BaseException:
+            for clip in session.clips:
+                self.discard(clip)
+            raise
+        else:
+            for clip in session.clips:
+                self.release(clip)
+
+    def live_readers(self):
+        """Số clip (reader ffmpeg) đang mở trong pool."""
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            in_use = sum(1 for e in self._entries.values() if e.refs > 0)
+            live = len(self._entries)
+        return {
+            "live": live,
+            "in_use": in_use,
+            "idle": live - in_use,
+            "opened": self.opened,
+            "reused": self.reused,
+            "closed": self.closed,
+        }
+
+    def __del__(self):
+        try:
+            self.close_all()
+        except Exception:
+            pass
+
+
+class ClipSession:
+    """Các clip mở trong một ``ClipPool.session()``."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.clips = []
+
+    def open(self, factory, path, *args, **kwargs):
+        clip = self.pool.acquire(factory, path, *args, **kwargs)
+        self.clips.append(clip)
+        return clip
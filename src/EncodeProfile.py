@@ -0,0 +1,83 @@
+import dataclasses
+from dataclasses import dataclass
+
+# Encoder nhận -preset/-crf theo kiểu x264; encoder khác chỉ dùng phần còn lại.
+PRESET_ENCODERS = {"libx264", "libx265"}
+CRF_ENCODERS = {"libx264", "libx265", "libvpx", "libvpx-vp9"}
+
+
+@dataclass(frozen=True)
+class EncodeProfile:
+    """Bộ tham số encode dùng chung cho mọi đường ghi file.
+
+    ``threads=None`` để ffmpeg tự chọn; ``crf``/``preset`` bị bỏ qua với
+    encoder không hỗ trợ.
+    """
+
+    name: str
+    preset: str = "medium"
+    crf: int = 23
+    threads: int = None
+    pix_fmt: str = "yuv420p"
+    audio_bitrate: str = "128k"
+
+    def with_threads(self, threads):
+        return self if threads is None else dataclasses.replace(self, threads=threads)
+
+    def video_args(self, video_codec, pix_fmt=None):
+        """Tham số ffmpeg cho luồng video (đặt sau ``-c:v``)."""
+        args = []
+        if video_codec in PRESET_ENCODERS and self.preset:
+            args += ["-preset", self.preset]
+        if video_codec in CRF_ENCODERS and self.crf is not None:
+            args += ["-crf", str(self.crf)]
+            if video_codec.startswith("libvpx"):
+                # libvpx chỉ chạy chế độ chất lượng cố định khi bitrate = 0.
+                args += ["-b:v", "0"]
+        if pix_fmt or self.pix_fmt:
+            args += ["-pix_fmt", pix_fmt or self.pix_fmt]
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+        return args
+
+    def audio_args(self):
+        return ["-b:a", self.audio_bitrate] if self.audio_bitrate else []
+
+    def moviepy_kwargs(self, video_codec):
+        """Tham số tương ứng cho ``write_videofile`` của moviepy."""
+        params = []
+        if video_codec in CRF_ENCODERS and self.crf is not None:
+            params += ["-crf", str(self.crf)]
+            if video_codec.startswith("libvpx"):
+                params += ["-b:v", "0"]
+        kwargs = {
+            "threads": self.threads,
+            "ffmpeg_params": params or None,
+            "pixel_format": self.pix_fmt,
+            "audio_bitrate": self.audio_bitrate,
+        }
+        if video_codec in PRESET_ENCODERS and self.preset:
+            kwargs["preset"] = self.preset
+        return kwargs
+
+
+ENCODE_PROFILES = {
+    "fast-draft": EncodeProfile("fast-draft", preset="ultrafast", crf=28, audio_bitrate="96k"),
+    "balanced": EncodeProfile("balanced", preset="medium", crf=23, audio_bitrate="128k"),
+    "archive": EncodeProfile("archive", preset="slow", crf=18, audio_bitrate="192k"),
+}
+DEFAULT_PROFILE = "balanced"
+
+
+def get_encode_profile(profile=None):
+    """Trả về EncodeProfile từ tên trong ENCODE_PROFILES, instance, hoặc mặc định."""
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, EncodeProfile):
+        return profile
+    try:
+        return ENCODE_PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"Không có encode profile '{profile}', chọn một trong: {', '.join(ENCODE_PROFILES)}"
+        ) from None
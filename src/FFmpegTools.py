@@ -0,0 +1,198 @@
+import os
+import uuid
+import shutil
+import subprocess
+import tempfile
+import contextvars
+from contextlib import contextmanager
+
+
+def _find_ffmpeg_binary():
+    # Cùng quy ước với moviepy.config (biến môi trường FFMPEG_BINARY) nhưng
+    # không import moviepy: import nó tốn hơn 1s chỉ để lấy đường dẫn ffmpeg.
+    binary = os.environ.get("FFMPEG_BINARY", "ffmpeg-imageio")
+    if binary == "ffmpeg-imageio":
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    if binary == "auto-detect":
+        return shutil.which("ffmpeg") or "ffmpeg"
+    return binary
+
+
+FFMPEG_BINARY = _find_ffmpeg_binary()
+
+# Tên codec mà ffmpeg báo khi đọc file do từng encoder tạo ra.
+ENCODER_CODEC_NAMES = {
+    "libx264": "h264",
+    "libx265": "hevc",
+    "mpeg4": "mpeg4",
+    "libvpx": "vp8",
+    "libvpx-vp9": "vp9",
+}
+
+# Runner chạy ffmpeg thay cho subprocess của ngữ cảnh hiện tại (xem AsyncProcessor).
+_ffmpeg_runner = contextvars.ContextVar("tudongghep_ffmpeg_runner", default=None)
+
+
+def ffmpeg_command(args):
+    """Tạo dòng lệnh ffmpeg đầy đủ từ danh sách tham số."""
+    return [FFMPEG_BINARY, "-y", "-hide_banner", "-loglevel", "error", *args]
+
+
+@contextmanager
+def use_ffmpeg_runner(runner):
+    """Trong khối này ``run_ffmpeg`` gọi ``runner.run(args)`` và ``check_cancelled``
+    gọi ``runner.check_cancelled()``, chỉ trong thread/task hiện tại."""
+    token = _ffmpeg_runner.set(runner)
+    try:
+        yield runner
+    finally:
+        _ffmpeg_runner.reset(token)
+
+
+def current_ffmpeg_runner():
+    return _ffmpeg_runner.get()
+
+
+def check_cancelled():
+    """Dừng công việc hiện tại (ném exception) nếu runner của nó đã bị hủy."""
+    runner = _ffmpeg_runner.get()
+    if runner is not None:
+        runner.check_cancelled()
+
+
+def run_ffmpeg(args):
+    """Chạy ffmpeg với ``args``, ném IOError kèm stderr nếu thất bại."""
+    runner = _ffmpeg_runner.get()
+    if runner is not None:
+        return runner.run(args)
+    proc = subprocess.run(
+        ffmpeg_command(args), stdin=subprocess.DEVNULL, capture_output=True
+    )
+    if proc.returncode != 0:
+        error = proc.stderr.decode("utf8", errors="ignore").strip()
+        raise IOError(f"ffmpeg lỗi (mã {proc.returncode}): {error}")
+
+
+@contextmanager
+def atomic_output(path):
+    """Ghi vào file tạm cạnh ``path`` rồi đổi tên khi xong.
+
+    File tạm giữ nguyên đuôi (để ffmpeg/moviepy chọn đúng định dạng) và bị
+    xóa nếu có lỗi, nên ``path`` chỉ tồn tại khi đã ghi trọn vẹn. Tên file
+    tạm riêng cho mỗi lần ghi (pid + token ngẫu nhiên): hai tiến trình cùng
+    ghi một ``path`` không ghi chung file tạm, và không bên nào đổi tên file
+    dở dang của bên kia.
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    stem, ext = os.path.splitext(name)
+    tmp_path = os.path.join(folder, f".{stem}.{os.getpid()}-{uuid.uuid4().hex[:12]}.part{ext}")
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_concat_list(paths, folder):
+    """Ghi file danh sách cho concat demuxer, trả về đường dẫn file đó."""
+    fd, list_path = tempfile.mkstemp(suffix=".txt", prefix="concat_", dir=folder)
+    with os.fdopen(fd, "w", encoding="utf8") as f:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    return list_path
+
+
+def concat_copy_args(list_path, output_path):
+    return [
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-map", "0", "-c", "copy", "-movflags", "+faststart",
+        output_path,
+    ]
+
+
+def concat_copy(paths, output_path, list_folder=None):
+    """Nối các file có cùng thông số luồng bằng stream copy (không encode lại)."""
+    list_path = write_concat_list(paths, list_folder)
+    try:
+        run_ffmpeg(concat_copy_args(list_path, output_path))
+    finally:
+        os.remove(list_path)
+    return output_path
+
+
+def replace_audio_args(video_path, audio_path, output_path, duration=None, audio_codec="aac",
+                       audio_bitrate=None):
+    args = [
+        "-i", video_path, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy", "-c:a", audio_codec,
+    ]
+    if audio_bitrate:
+        args += ["-b:a", audio_bitrate]
+    if duration is not None:
+        args += ["-t", f"{duration:.3f}"]
+    return args + ["-movflags", "+faststart", output_path]
+
+
+def replace_audio_copy(video_path, audio_path, output_path, duration=None, audio_codec="aac",
+                       audio_bitrate=None):
+    """Thay audio của video, giữ nguyên luồng video (``-c:v copy``).
+
+    Chỉ audio được encode lại; ``duration`` (thường là thời lượng video)
+    dùng để cắt audio dài hơn video.
+    """
+    run_ffmpeg(replace_audio_args(
+        video_path, audio_path, output_path, duration, audio_codec, audio_bitrate
+    ))
+    return output_path
+
+
+# Codec video ghi được vào mp4 bằng stream copy.
+MP4_COPY_CODECS = {"h264", "hevc", "mpeg4", "av1", "vp9"}
+
+
+def swap_audio_at_start_args(video_path, audio_path, output_path, audio_duration,
+                             video_duration, video_has_audio=True, audio_codec="aac",
+                             audio_bitrate=None, sample_rate=44100, switch_time=None):
+    """Audio ra = ``audio_path`` trong ``audio_duration`` giây đầu, sau đó là
+    audio gốc của video (hoặc im lặng nếu video không có audio).
+
+    ``switch_time`` (>= ``audio_duration``) là lúc audio gốc được phát tiếp,
+    khoảng giữa là im lặng; mặc định bằng ``audio_duration``.
+    """
+    switch_time = audio_duration if switch_time is None else max(switch_time, audio_duration)
+    fmt = f"aformat=sample_rates={sample_rate}:channel_layouts=stereo"
+    head = f"[1:a:0]atrim=end={audio_duration:.6f},asetpts=PTS-STARTPTS,{fmt}"
+    if switch_time > audio_duration:
+        head += f",apad=whole_dur={switch_time:.6f}"
+    if video_has_audio:
+        graph = (
+            f"{head}[a0];"
+            f"[0:a:0]atrim=start={switch_time:.6f},asetpts=PTS-STARTPTS,{fmt}[a1];"
+            f"[a0][a1]concat=n=2:v=0:a=1[aout]"
+        )
+    else:
+        graph = f"{head},apad=whole_dur={video_duration:.6f}[aout]"
+    args = [
+        "-i", video_path, "-i", audio_path,
+        "-filter_complex", graph,
+        "-map", "0:v:0", "-map", "[aout]",
+        "-c:v", "copy", "-c:a", audio_codec,
+    ]
+    if audio_bitrate:
+        args += ["-b:a", audio_bitrate]
+    return args + ["-t", f"{video_duration:.6f}", "-movflags", "+faststart", output_path]
+
+
+def swap_audio_at_start_copy(video_path, audio_path, output_path, audio_duration,
+                             video_duration, video_has_audio=True, audio_codec="aac",
+                             audio_bitrate=None, switch_time=None):
+    """Thay audio ở đoạn đầu video mà không decode/encode luồng video."""
+    run_ffmpeg(swap_audio_at_start_args(
+        video_path, audio_path, output_path, audio_duration, video_duration,
+        video_has_audio, audio_codec, audio_bitrate, switch_time=switch_time,
+    ))
+    return output_path
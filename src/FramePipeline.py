@@ -0,0 +1,260 @@
+import queue
+import threading
+import subprocess
+import numpy as np
+
+try:
+    from .FFmpegTools import FFMPEG_BINARY, check_cancelled
+except ImportError:
+    from FFmpegTools import FFMPEG_BINARY, check_cancelled
+
+# Số buffer frame trong vòng: đủ để decoder, transform và encoder cùng chạy
+# mà không buffer nào phải cấp phát lại.
+RING_SIZE = 4
+
+
+class FrameReader:
+    """Đọc frame rgb24 đã scale/đổi fps từ ffmpeg, ghi thẳng vào buffer của người gọi."""
+
+    def __init__(self, path, width, height, fps=None, duration=None):
+        vf = f"scale={width}:{height}"
+        if fps:
+            vf += f",fps={fps}"
+        cmd = [FFMPEG_BINARY, "-v", "error", "-i", path]
+        if duration is not None:
+            cmd += ["-t", f"{duration:.6f}"]
+        cmd += ["-map", "0:v:0", "-vf", vf, "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+        self.path = path
+        self.proc = subprocess.Popen(
+            cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE, bufsize=0,
+        )
+
+    def read_into(self, frame):
+        """Đọc một frame vào ``frame`` (uint8 HxWx3); False khi hết dữ liệu."""
+        view = memoryview(frame).cast("B")
+        filled = 0
+        while filled < len(view):
+            n = self.proc.stdout.readinto(view[filled:])
+            if not n:
+                return False
+            filled += n
+        return True
+
+    def kill(self):
+        """Dừng decoder; thread đang đọc sẽ gặp hết dữ liệu."""
+        if self.proc.poll() is None:
+            self.proc.kill()
+
+    def close(self):
+        self.kill()
+        self.proc.stdout.close()
+        stderr = self.proc.stderr.read().decode("utf8", errors="ignore").strip()
+        self.proc.stderr.close()
+        returncode = self.proc.wait()
+        return returncode, stderr
+
+
+class FrameWriter:
+    """Encoder ffmpeg nhận frame rgb24 qua stdin (không copy qua bytes)."""
+
+    def __init__(self, output_path, width, height, fps, video_args, audio_input=None,
+                 audio_args=()):
+        cmd = [
+            FFMPEG_BINARY, "-y", "-v", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+            "-i", "pipe:0",
+        ]
+        if audio_input:
+            cmd += ["-i", audio_input, "-map", "0:v:0", "-map", "1:a:0?", *audio_args, "-shortest"]
+        cmd += [*video_args, "-movflags", "+faststart", output_path]
+        self.proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE, bufsize=0,
+        )
+
+    def write(self, frame):
+        self.proc.stdin.write(memoryview(frame).cast("B"))
+
+    def close(self):
+        """Đóng stdin và chờ encoder xong, ném IOError nếu encoder lỗi."""
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = self.proc.stderr.read().decode("utf8", errors="ignore").strip()
+        self.proc.stderr.close()
+        if self.proc.wait() != 0:
+            raise IOError(f"ffmpeg encode frame lỗi: {stderr}")
+
+    def kill(self):
+        """Dừng encoder; thread đang ghi sẽ gặp BrokenPipeError."""
+        if self.proc.poll() is None:
+            self.proc.kill()
+
+    def abort(self):
+        """Dừng encoder (file ra dở dang), trả về stderr của nó."""
+        self.kill()
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = self.proc.stderr.read().decode("utf8", errors="ignore").strip()
+        self.proc.stderr.close()
+        self.proc.wait()
+        return stderr
+
+
+def run_frame_pipeline(src, output_path, transform, width, height, fps, video_args,
+                       audio_args=("-c:a", "aac"), duration=None, ring_size=RING_SIZE):
+    """Decode ``src``, gọi ``transform(frame, t)`` trên từng frame rồi encode ra ``output_path``.
+
+    Frame được đọc bằng ``readinto`` vào một vòng ``ring_size`` buffer numpy
+    cấp phát sẵn; ``transform`` sửa frame tại chỗ (uint8 ``height`` x
+    ``width`` x 3, ``t`` là giây) và buffer được ghi thẳng vào stdin của
+    encoder, rồi quay lại vòng. Decode, transform và encode chạy trên ba
+    thread nên tốc độ bị giới hạn bởi codec. Audio của ``src`` (nếu có) được
+    encode bằng ``audio_args``. Trả về số frame đã xử lý.
+    """
+    ring = np.empty((ring_size, height, width, 3), dtype=np.uint8)
+    free, decoded, transformed = queue.Queue(), queue.Queue(), queue.Queue()
+    for i in range(ring_size):
+        free.put(i)
+    errors = []
+    stop = threading.Event()
+    reader = FrameReader(src, width, height, fps, duration)
+    writer = FrameWriter(output_path, width, height, fps, video_args, src, audio_args)
+
+    def decode():
+        try:
+            while not stop.is_set():
+                i = free.get()
+                if i is None or not reader.read_into(ring[i]):
+                    break
+                decoded.put(i)
+        except BaseException as e:
+            errors.append(e)
+        finally:
+            decoded.put(None)
+
+    def encode():
+        try:
+            while True:
+                i = transformed.get()
+                if i is None:
+                    break
+                writer.write(ring[i])
+                free.put(i)
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+            # Cho thread decode thoát nếu nó đang chờ buffer rảnh.
+            free.put(None)
+
+    threads = [
+        threading.Thread(target=decode, daemon=True),
+        threading.Thread(target=encode, daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    frames = 0
+    encoder_error = None
+    try:
+        while not stop.is_set():
+            i = decoded.get()
+            if i is None:
+                break
+            check_cancelled()
+            transform(ring[i], frames / fps)
+            transformed.put(i)
+            frames += 1
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        transformed.put(None)
+        if stop.is_set():
+            # Dừng giữa chừng: kill cả hai tiến trình để thread không bị kẹt ở pipe.
+            writer.kill()
+            reader.kill()
+            free.put(None)
+        for thread in threads:
+            thread.join()
+        returncode, stderr = reader.close()
+        if stop.is_set() or errors or returncode != 0:
+            encoder_error = writer.abort()
+        else:
+            writer.close()
+    if errors:
+        raise IOError(f"Xử lý frame lỗi: {encoder_error or errors[0]}") from errors[0]
+    if returncode != 0:
+        raise IOError(f"Không decode được video '{src}': {stderr}")
+    return frames
+
+
+def chain(*transforms):
+    """Ghép nhiều transform thành một, chạy theo thứ tự."""
+    def apply(frame, t):
+        for transform in transforms:
+            transform(frame, t)
+    return apply
+
+
+class Overlay:
+    """Transform chồng ảnh ``image`` (uint8 HxWx3 hoặc HxWx4 có alpha) lên frame tại (x, y).
+
+    Ảnh nhân alpha và ``1 - alpha`` được tính sẵn một lần; mỗi frame chỉ
+    dùng các phép numpy có ``out=`` trên một buffer float32 cố định.
+    """
+
+    def __init__(self, image, x=0, y=0, opacity=1.0, start=0.0, end=None):
+        image = np.asarray(image, dtype=np.float32)
+        if image.shape[-1] == 4:
+            alpha = image[..., 3:4] / 255.0
+        else:
+            alpha = np.ones(image.shape[:2] + (1,), dtype=np.float32)
+        alpha = alpha * np.float32(opacity)
+        # +0.5 để ép kiểu về uint8 là làm tròn thay vì cắt.
+        self.premultiplied = image[..., :3] * alpha + np.float32(0.5)
+        self.inverse_alpha = (1.0 - alpha).astype(np.float32)
+        self.scratch = np.empty(self.premultiplied.shape, dtype=np.float32)
+        self.x, self.y = x, y
+        self.start, self.end = start, end
+
+    def __call__(self, frame, t):
+        if t < self.start or (self.end is not None and t >= self.end):
+            return
+        h, w = self.premultiplied.shape[:2]
+        # Ảnh có thể nằm một phần ngoài frame (x/y âm hoặc tràn cạnh phải/dưới):
+        # chỉ trộn phần giao, tránh chỉ số âm của numpy đếm từ cuối frame.
+        top, left = max(self.y, 0), max(self.x, 0)
+        bottom = min(self.y + h, frame.shape[0])
+        right = min(self.x + w, frame.shape[1])
+        if bottom <= top or right <= left:
+            return
+        region = frame[top:bottom, left:right]
+        src = (slice(top - self.y, bottom - self.y), slice(left - self.x, right - self.x))
+        scratch = self.scratch[src]
+        np.multiply(region, self.inverse_alpha[src], out=scratch)
+        scratch += self.premultiplied[src]
+        np.copyto(region, scratch, casting="unsafe")
+
+
+class Fade:
+    """Transform fade-in ``fade_in`` giây đầu và fade-out ``fade_out`` giây cuối (về đen)."""
+
+    def __init__(self, width, height, duration, fade_in=0.0, fade_out=0.0):
+        self.duration = duration
+        self.fade_in, self.fade_out = fade_in, fade_out
+        self.scratch = np.empty((height, width, 3), dtype=np.float32)
+
+    def __call__(self, frame, t):
+        gain = 1.0
+        if self.fade_in and t < self.fade_in:
+            gain = t / self.fade_in
+        if self.fade_out and t > self.duration - self.fade_out:
+            gain = min(gain, max(0.0, (self.duration - t) / self.fade_out))
+        if gain >= 1.0:
+            return
+        np.multiply(frame, np.float32(gain), out=self.scratch)
+        np.copyto(frame, self.scratch, casting="unsafe")
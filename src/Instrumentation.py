@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import logging
+import contextvars
+from contextlib import contextmanager
+
+import proglog
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Chuỗi thao tác đang chạy (ngoài cùng trước), riêng cho từng thread/task.
+_operations = contextvars.ContextVar("tudongghep_operations", default=())
+
+
+def _cpu_time():
+    """CPU của tiến trình này cộng các tiến trình con (ffmpeg) đã kết thúc."""
+    total = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        total += children.ru_utime + children.ru_stime
+    return total
+
+
+def logging_sink(event):
+    """Sink ghi mỗi event ra logging ở mức INFO."""
+    fields = " ".join(
+        f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}"
+        for k, v in event.items()
+        if k not in ("event", "operation", "stage", "ts", "pid")
+    )
+    name = event.get("stage") or event["event"]
+    logging.info(f"[{event.get('operation') or '-'}] {name}: {fields}")
+
+
+class JsonLinesSink:
+    """Sink ghi mỗi event thành một dòng JSON, an toàn khi nhiều tiến trình cùng ghi.
+
+    File được mở ở chế độ append cho từng event và ghi bằng một lần ``write``,
+    nên các worker của BatchMerger có thể dùng chung một file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, event):
+        line = (json.dumps(event, ensure_ascii=False, default=str) + "\n").encode("utf8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+class Instrumentation:
+    """Phát event thời gian theo từng giai đoạn (probe, open, decode, transform, encode, mux).
+
+    ``sinks`` là các callable nhận một dict event: ``logging_sink``,
+    ``JsonLinesSink(path)`` hoặc callback bất kỳ. Khi chạy batch song song,
+    instance được pickle sang worker nên sink cũng phải pickle được.
+    Không có sink thì mọi thao tác đo đều bị bỏ qua.
+    """
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+
+    @property
+    def enabled(self):
+        return bool(self.sinks)
+
+    def emit(self, event):
+        if not self.sinks:
+            return
+        operations = _operations.get()
+        event = dict(
+            event, ts=time.time(), pid=os.getpid(),
+            operation=event.get("operation") or (operations[-1] if operations else None),
+        )
+        if len(operations) > 1:
+            event.setdefault("parent", operations[-2])
+        for sink in self.sinks:
+            try:
+                sink(event)
+            except Exception as e:
+                logging.warning(f"Sink instrumentation lỗi: {e}")
+
+    @contextmanager
+    def operation(self, name, **fields):
+        """Bao một thao tác; event của các stage bên trong mang tên thao tác này.
+
+        Gọi lồng với cùng tên (ví dụ hàm public gọi hàm đã được đo) chỉ tính một lần.
+        """
+        operations = _operations.get()
+        if not self.sinks or (operations and operations[-1] == name):
+            yield
+            return
+        token = _operations.set(operations + (name,))
+        wall, cpu = time.perf_counter(), _cpu_time()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.emit(dict(
+                fields, event="operation", status=status,
+                wall_time=time.perf_counter() - wall, cpu_time=_cpu_time() - cpu,
+            ))
+            _operations.reset(token)
+
+    @contextmanager
+    def stage(self, name, **fields):
+        """Đo một stage; trả về dict để bên trong ghi thêm (ví dụ ``frames``).
+
+        Nếu có ``path`` (hoặc ``paths``), ``bytes_written`` là kích thước file ra.
+        """
+        record = dict(fields)
+        if not self.sinks:
+            yield record
+            return
+        wall, cpu = time.perf_counter(), _cpu_time()
+        status = "ok"
+        try:
+            yield record
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.emit_stage(
+                name, time.perf_counter() - wall, cpu_time=_cpu_time() - cpu,
+                status=status, **record,
+            )
+
+    def emit_stage(self, name, wall_time, **fields):
+        if not self.sinks:
+            return
+        paths = fields.get("paths") or ([fields["path"]] if fields.get("path") else [])
+        if paths and "bytes_written" not in fields:
+            fields["bytes_written"] = sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
+        if fields.get("frames") and wall_time > 0:
+            fields["fps"] = fields["frames"] / wall_time
+        self.emit(dict(fields, event="stage", stage=name, wall_time=wall_time))
+
+    def write_videofile(self, clip, path, sources=(), **kwargs):
+        """``clip.write_videofile`` có tách thời gian decode / transform / encode.
+
+        Thời gian decode là tổng thời gian đọc frame từ reader của ``sources``
+        (các VideoFileClip gốc); transform là phần còn lại của việc tạo frame
+        (resize, compose...); encode là phần còn lại của cả lần ghi (ghi pipe
+        ffmpeg, audio và mux). Khi bật, thanh tiến trình proglog được thay
+        bằng event ``progress``.
+        """
+        if not self.sinks:
+            clip.write_videofile(path, **kwargs)
+            return path
+        timing = {"decode": 0.0, "frame": 0.0, "frames": 0}
+        patched = []
+
+        def timed(obj, attr, key, count=False):
+            original = getattr(obj, attr)
+
+            def wrapper(*args, **kw):
+                start = time.perf_counter()
+                try:
+                    return original(*args, **kw)
+                finally:
+                    timing[key] += time.perf_counter() - start
+                    if count:
+                        timing["frames"] += 1
+
+            setattr(obj, attr, wrapper)
+            patched.append((obj, attr))
+
+        readers = {id(s.reader): s.reader for s in sources if getattr(s, "reader", None)}
+        for reader in readers.values():
+            timed(reader, "get_frame", "decode")
+        timed(clip, "get_frame", "frame", count=True)
+        kwargs.setdefault("logger", _ProgressEvents(self, path))
+        wall, cpu = time.perf_counter(), _cpu_time()
+        status = "ok"
+        try:
+            clip.write_videofile(path, **kwargs)
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            for obj, attr in patched:
+                try:
+                    delattr(obj, attr)
+                except AttributeError:
+                    pass
+            total = time.perf_counter() - wall
+            frames = timing["frames"]
+            self.emit_stage("decode", timing["decode"], frames=frames, status=status)
+            self.emit_stage(
+                "transform", max(0.0, timing["frame"] - timing["decode"]),
+                frames=frames, status=status,
+            )
+            self.emit_stage(
+                "encode", max(0.0, total - timing["frame"]), frames=frames,
+                cpu_time=_cpu_time() - cpu, status=status, path=path,
+            )
+        return path
+
+
+class _ProgressEvents(proglog.ProgressBarLogger):
+    """Logger proglog phát event ``progress`` mỗi 10% thay cho thanh tiến trình."""
+
+    def __init__(self, instrumentation, path, step=0.1):
+        super().__init__()
+        self.instrumentation = instrumentation
+        self.path = path
+        self.step = step
+        self._next = {}
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        if attr != "index":
+            return
+        total = self.bars[bar].get("total")
+        if not total:
+            return
+        done = (value + 1) / total
+        if done >= self._next.get(bar, self.step) or value + 1 == total:
+            self._next[bar] = done + self.step
+            self.instrumentation.emit({
+                "event": "progress", "bar": bar, "path": self.path,
+                "index": value + 1, "total": total, "fraction": min(1.0, done),
+            })
@@ -0,0 +1,170 @@
+import heapq
+import logging
+import time
+from dataclasses import dataclass
+
+try:
+    from .MediaProbe import probe_media
+    from .FFmpegTools import MP4_COPY_CODECS
+except ImportError:
+    from MediaProbe import probe_media
+    from FFmpegTools import MP4_COPY_CODECS
+
+# Giá trị khởi đầu của mô hình (đo trên một nhân CPU, profile balanced);
+# được hiệu chỉnh theo thời gian thực tế của các job đã chạy.
+JOB_OVERHEAD = 0.3
+# Giây chạy cho mỗi đơn vị công việc theo loại job: "copy" tính theo giây
+# video (luồng video stream copy, chỉ audio được encode), "encode" theo
+# megapixel-frame (rộng × cao × số frame / 1e6) vì video phải encode lại.
+DEFAULT_RATES = {"copy": 0.04, "encode": 0.045, "unknown": 0.0}
+# Trọng số (giây) của giá trị khởi đầu: vài job đầu chưa kéo mô hình lệch nhiều.
+PRIOR_SECONDS = 30.0
+
+
+@dataclass
+class JobEstimate:
+    """Ước lượng chi phí của một MergeJob."""
+
+    job: object
+    kind: str  # "copy", "encode" hoặc "unknown" (không probe được)
+    work: float
+    cost: float = 0.0
+
+
+class CostModel:
+    """Mô hình thời gian chạy job: ``overhead + rate[kind] * work * scale[kind]``.
+
+    ``scale`` của mỗi loại là tỉ số giữa tổng thời gian đo được và tổng thời
+    gian mô hình gốc dự đoán cho các job đã xong (cộng ``prior_seconds`` vào
+    cả hai vế), nên mô hình tự khớp với máy, profile và số worker đang dùng.
+    """
+
+    def __init__(self, overhead=JOB_OVERHEAD, rates=None, prior_seconds=PRIOR_SECONDS):
+        self.overhead = overhead
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.prior_seconds = prior_seconds
+        # kind -> [tổng giây đo được, tổng giây theo rate gốc]
+        self.observed = {}
+
+    @staticmethod
+    def features(info):
+        """(kind, work) của job ghép audio vào video có thông số ``info`` (``probe_media``)."""
+        duration = info["duration"] or 0.0
+        if info["video_codec"] in MP4_COPY_CODECS:
+            return "copy", duration
+        frames = duration * (info["fps"] or 30)
+        return "encode", info["width"] * info["height"] * frames / 1e6
+
+    def scale(self, kind):
+        measured, predicted = self.observed.get(kind, (0.0, 0.0))
+        return (self.prior_seconds + measured) / (self.prior_seconds + predicted)
+
+    def estimate(self, kind, work):
+        return self.overhead + self.rates[kind] * work * self.scale(kind)
+
+    def observe(self, kind, work, wall_time):
+        """Ghi nhận một job ``kind`` khối lượng ``work`` đã chạy hết ``wall_time`` giây."""
+        base = self.rates[kind] * work
+        if base <= 0:
+            return
+        measured, predicted = self.observed.get(kind, (0.0, 0.0))
+        self.observed[kind] = (
+            measured + max(0.0, wall_time - self.overhead), predicted + base
+        )
+
+
+def makespan(costs, workers, busy=()):
+    """Thời gian chạy xong ``costs`` trên ``workers`` worker, mỗi job vào worker rảnh sớm nhất.
+
+    ``busy`` là số giây mỗi worker còn bận với job đang chạy dở.
+    """
+    loads = sorted(busy) + [0.0] * max(0, min(workers, len(costs)) - len(busy))
+    loads = loads or [0.0]
+    for cost in costs:
+        heapq.heapreplace(loads, loads[0] + cost)
+    return max(loads)
+
+
+class JobPlanner:
+    """Sắp xếp job của một batch theo chi phí ước lượng và theo dõi ETA.
+
+    Chi phí được ước lượng từ thông số probe của video (thời lượng, độ phân
+    giải, fps, codec) qua ``CostModel``. Job dài nhất chạy trước (longest
+    processing time first): các job ngắn lấp chỗ trống ở cuối batch thay vì
+    một job dài bắt đầu muộn kéo dài cả batch. Mỗi job xong được đưa vào
+    ``CostModel`` để ETA của phần còn lại sát thực tế hơn.
+
+    Worker nhận job theo đúng thứ tự ``plan``, nên sau ``start`` planner biết
+    job nào đang chạy và từ lúc nào: ETA chỉ tính phần còn lại của các job
+    đó, không xếp lại chúng như chưa chạy.
+    """
+
+    def __init__(self, cost_model=None, workers=1, clock=time.perf_counter):
+        self.model = cost_model or CostModel()
+        self.workers = workers
+        self.clock = clock
+        self.remaining = {}
+        # key -> thời điểm bắt đầu của các job đang chạy.
+        self.running = {}
+        self.queued = []
+
+    @staticmethod
+    def _key(job):
+        # Kết quả từ process pool mang bản sao của job, không phải cùng object.
+        return (job.video_path, job.audio_path, job.output_filename)
+
+    def estimate(self, job):
+        try:
+            kind, work = self.model.features(probe_media(job.video_path))
+        except Exception as e:
+            logging.warning(f"Không probe được '{job.video_path}', không ước lượng được job: {e}")
+            kind, work = "unknown", 0.0
+        return JobEstimate(job, kind, work, self.model.estimate(kind, work))
+
+    def plan(self, jobs):
+        """Trả về (thứ tự chạy theo chỉ số trong ``jobs``, danh sách JobEstimate)."""
+        estimates = [self.estimate(job) for job in jobs]
+        order = sorted(range(len(jobs)), key=lambda i: -estimates[i].cost)
+        self.remaining = {self._key(e.job): e for e in estimates}
+        self.queued = list(dict.fromkeys(self._key(jobs[i]) for i in order))
+        self.running = {}
+        return order, estimates
+
+    def start(self):
+        """Ghi nhận batch bắt đầu chạy: ``workers`` job đầu tiên theo thứ tự được giao cho worker."""
+        self._dispatch(self.clock())
+
+    def _dispatch(self, now):
+        while self.queued and len(self.running) < self.workers:
+            self.running[self.queued.pop(0)] = now
+
+    def _cost(self, key):
+        estimate = self.remaining[key]
+        return self.model.estimate(estimate.kind, estimate.work)
+
+    def eta(self):
+        """Thời gian (giây) dự kiến để chạy hết các job chưa xong, theo mô hình hiện tại.
+
+        Job đang chạy chỉ còn ``ước lượng - thời gian đã chạy`` (không âm);
+        job đang chờ được xếp vào worker rảnh sớm nhất theo thứ tự giao việc.
+        """
+        now = self.clock()
+        busy = [max(0.0, self._cost(key) - (now - started)) for key, started in self.running.items()]
+        costs = [self._cost(key) for key in self.queued]
+        if not busy and not costs:
+            return 0.0
+        return makespan(costs, self.workers, busy)
+
+    def observe(self, result):
+        """Cập nhật mô hình theo JobResult vừa xong; job lỗi không được dùng để hiệu chỉnh."""
+        key = self._key(result.job)
+        estimate = self.remaining.pop(key, None)
+        if estimate is not None and result.ok:
+            self.model.observe(estimate.kind, estimate.work, result.wall_time)
+        if key in self.running:
+            # Worker vừa rảnh nhận job kế tiếp.
+            del self.running[key]
+            self._dispatch(self.clock())
+        elif key in self.queued:
+            self.queued.remove(key)
+        return estimate
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+try:
+    from .BatchMerger import MergeJob
+except ImportError:
+    from BatchMerger import MergeJob
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """Hàng đợi job (video, audio, tham số) lưu trong sqlite để chạy tiếp được.
+
+    Mỗi job có trạng thái ``pending`` → ``running`` → ``done``/``failed``
+    cùng file ra và thời gian chạy. Job lỗi được thử lại sau ``backoff``
+    giây, nhân đôi mỗi lần (tối đa ``max_backoff``), tới ``max_attempts``
+    lần thì dừng ở ``failed``. Job còn ``running`` khi mở lại hàng đợi là
+    job của lần chạy bị chết giữa chừng và được đưa về ``pending``.
+    """
+
+    def __init__(self, db_path, max_attempts=3, backoff=30.0, max_backoff=3600.0, clock=time.time):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT UNIQUE, "
+            "video_path TEXT, audio_path TEXT, output_filename TEXT, params TEXT, "
+            "status TEXT, attempts INTEGER DEFAULT 0, next_attempt_at REAL DEFAULT 0, "
+            "output_path TEXT, error TEXT, wall_time REAL, cpu_time REAL, "
+            "output_bytes INTEGER, updated_at REAL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def job_key(job, params=None):
+        payload = [
+            os.path.abspath(job.video_path), os.path.abspath(job.audio_path),
+            job.output_filename, params or {},
+        ]
+        data = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+    def _execute(self, sql, args=()):
+        with self._lock:
+            cur = self._conn.execute(sql, args)
+            self._conn.commit()
+            return cur
+
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
+
+    def add(self, jobs, params=None):
+        """Thêm job chưa có (cùng video, audio, tên file ra và ``params``); trả về số job mới."""
+        rows = [
+            (self.job_key(job, params), job.video_path, job.audio_path, job.output_filename,
+             json.dumps(params or {}, sort_keys=True, default=str), PENDING, self.clock())
+            for job in jobs
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (key, video_path, audio_path, output_filename, "
+                "params, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def recover(self):
+        """Chuẩn bị chạy tiếp sau khi bị dừng đột ngột.
+
+        Job ``running`` quay về ``pending``; job ``done`` mà file ra đã mất
+        cũng được chạy lại. Trả về số job được đưa về ``pending``.
+        """
+        count = self._execute(
+            "UPDATE jobs SET status = ? WHERE status = ?", (PENDING, RUNNING)
+        ).rowcount
+        for job_id, output_path in self._query(
+            "SELECT id, output_path FROM jobs WHERE status = ?", (DONE,)
+        ):
+            if not output_path or not os.path.exists(output_path):
+                self._execute("UPDATE jobs SET status = ? WHERE id = ?", (PENDING, job_id))
+                count += 1
+        return count
+
+    def claim(self, limit=None):
+        """Lấy các job ``pending`` đã tới lượt, đánh dấu ``running``; trả về list MergeJob."""
+        now = self.clock()
+        sql = (
+            "SELECT id, video_path, audio_path, output_filename FROM jobs "
+            "WHERE status = ? AND next_attempt_at <= ? ORDER BY id"
+        )
+        args = [PENDING, now]
+        if limit:
+            sql += " LIMIT ?"
+            args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+            self._conn.executemany(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                [(RUNNING, now, row[0]) for row in rows],
+            )
+            self._conn.commit()
+        return [MergeJob(video, audio, name, job_id) for job_id, video, audio, name in rows]
+
+    def record(self, result):
+        """Ghi JobResult của một job đã ``claim``; lỗi thì hẹn lần thử lại."""
+        job_id = result.job.job_id
+        (attempts,) = self._query("SELECT attempts FROM jobs WHERE id = ?", (job_id,))[0]
+        attempts += 1
+        now = self.clock()
+        if result.ok:
+            status, next_attempt_at = DONE, 0
+        elif attempts >= self.max_attempts:
+            status, next_attempt_at = FAILED, 0
+        else:
+            delay = min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+            status, next_attempt_at = PENDING, now + delay
+        self._execute(
+            "UPDATE jobs SET status = ?, attempts = ?, next_attempt_at = ?, output_path = ?, "
+            "error = ?, wall_time = ?, cpu_time = ?, output_bytes = ?, updated_at = ? "
+            "WHERE id = ?",
+            (status, attempts, next_attempt_at, result.output_path, result.error,
+             result.wall_time, result.cpu_time, result.output_bytes, now, job_id),
+        )
+        return status
+
+    def next_retry_in(self):
+        """Số giây tới job ``pending`` sớm nhất (0 nếu có job chạy được ngay), None nếu hết job."""
+        (earliest,) = self._query(
+            "SELECT MIN(next_attempt_at) FROM jobs WHERE status = ?", (PENDING,)
+        )[0]
+        if earliest is None:
+            return None
+        return max(0.0, earliest - self.clock())
+
+    def retry_failed(self):
+        """Cho các job ``failed`` chạy lại từ đầu (đếm lại số lần thử)."""
+        return self._execute(
+            "UPDATE jobs SET status = ?, attempts = 0, next_attempt_at = 0 WHERE status = ?",
+            (PENDING, FAILED),
+        ).rowcount
+
+    def counts(self):
+        counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for status, n in self._query("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = n
+        return counts
+
+    def created_files(self):
+        """Các file ra của job đã xong, theo thứ tự thêm job."""
+        return [
+            row[0] for row in self._query(
+                "SELECT output_path FROM jobs WHERE status = ? ORDER BY id", (DONE,)
+            )
+        ]
+
+    def failures(self):
+        """(video, audio, lỗi) của các job đã hết lượt thử."""
+        return self._query(
+            "SELECT video_path, audio_path, error FROM jobs WHERE status = ? ORDER BY id",
+            (FAILED,),
+        )
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,18 @@
+import importlib
+
+
+def lazy_callable(module, name):
+    """Thay cho ``from module import name`` khi ``name`` là class hoặc hàm.
+
+    Trả về hàm gọi tới ``module.name``; ``module`` chỉ được import ở lần
+    gọi đầu tiên. Dùng cho moviepy (kéo theo numpy, imageio, PIL, IPython...)
+    để các lệnh không render như ``--help`` hay probe khởi động nhanh. Kết
+    quả được gán làm biến module như import thường nên ``patch`` trong test
+    vẫn thay được nó.
+    """
+    def call(*args, **kwargs):
+        return getattr(importlib.import_module(module), name)(*args, **kwargs)
+
+    call.__name__ = call.__qualname__ = name
+    call.__doc__ = f"Gọi ``{module}.{name}`` (import ở lần dùng đầu)."
+    return call
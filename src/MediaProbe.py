@@ -0,0 +1,271 @@
+import os
+import re
+import copy
+import json
+import sqlite3
+import threading
+import subprocess
+
+try:
+    from .FFmpegTools import FFMPEG_BINARY
+except ImportError:
+    from FFmpegTools import FFMPEG_BINARY
+
+# Đặt biến môi trường này thành chuỗi rỗng để chỉ cache trong bộ nhớ.
+DEFAULT_CACHE_PATH = os.environ.get(
+    "TUDONGGHEP_PROBE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "tudongghepvideo", "probe.sqlite"),
+)
+
+
+def _split_fields(text):
+    """Tách chuỗi mô tả stream theo dấu phẩy, bỏ qua dấu phẩy trong ngoặc."""
+    fields, depth, current = [], 0, ""
+    for ch in text:
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        if ch == "," and depth == 0:
+            fields.append(current.strip())
+            current = ""
+        else:
+            current += ch
+    fields.append(current.strip())
+    return fields
+
+
+_DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+_SIZE_RE = re.compile(r" (\d+)x(\d+)[,\s]")
+_FPS_RE = re.compile(r" (\d+\.?\d*) fps")
+_TBR_RE = re.compile(r" (\d+\.?\d*)(k?) tbr")
+_HZ_RE = re.compile(r" (\d+) Hz")
+
+
+def _parse_fps(line):
+    # Giống moviepy: ưu tiên "fps", không có thì "tbr"; 29.97 được hiểu là 30000/1001.
+    match = _FPS_RE.search(line)
+    if match:
+        fps = float(match.group(1))
+    else:
+        match = _TBR_RE.search(line)
+        if not match:
+            return None
+        fps = float(match.group(1)) * (1000 if match.group(2) else 1)
+    for x in (23, 24, 25, 30, 50):
+        if fps != x and abs(fps - x * 1000 / 1001) < 0.01:
+            fps = x * 1000 / 1001
+    return fps
+
+
+def _parse_infos(infos, result):
+    # Chỉ lấy stream video/audio đầu tiên, giống cách moviepy chọn stream mặc định.
+    for line in infos.splitlines():
+        line = line.strip()
+        if line.startswith("Duration:") and result["duration"] is None:
+            match = _DURATION_RE.match(line)
+            if match:
+                h, m, sec = match.groups()
+                result["duration"] = int(h) * 3600 + int(m) * 60 + float(sec)
+            continue
+        if not line.startswith("Stream #"):
+            continue
+        if ": Video: " in line and not result["has_video"]:
+            result["has_video"] = True
+            fields = _split_fields(line.split(": Video: ", 1)[1])
+            result["video_codec"] = fields[0].split()[0]
+            if len(fields) > 1:
+                result["pix_fmt"] = fields[1].split("(")[0].strip()
+            size = _SIZE_RE.search(line)
+            if size:
+                result["width"], result["height"] = int(size.group(1)), int(size.group(2))
+            result["fps"] = _parse_fps(line)
+        elif ": Audio: " in line and not result["has_audio"]:
+            result["has_audio"] = True
+            fields = _split_fields(line.split(": Audio: ", 1)[1])
+            result["audio_codec"] = fields[0].split()[0]
+            rate = _HZ_RE.search(line)
+            if rate:
+                result["audio_rate"] = int(rate.group(1))
+            if len(fields) > 2:
+                result["audio_channels"] = fields[2]
+
+
+def _probe_uncached(path):
+    proc = subprocess.run(
+        [FFMPEG_BINARY, "-hide_banner", "-i", path],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+    )
+    infos = proc.stderr.decode("utf8", errors="ignore")
+    result = {
+        "duration": None,
+        "has_video": False,
+        "video_codec": None,
+        "pix_fmt": None,
+        "width": None,
+        "height": None,
+        "fps": None,
+        "has_audio": False,
+        "audio_codec": None,
+        "audio_rate": None,
+        "audio_channels": None,
+    }
+    _parse_infos(infos, result)
+    if result["duration"] is None and not (result["has_video"] or result["has_audio"]):
+        raise IOError(f"Không đọc được thông tin media của '{path}'")
+    return result
+
+
+_PTS_TIME_RE = re.compile(r"pts_time:\s*(-?[\d.]+)")
+
+
+def _scan_keyframes(path):
+    """Quét các keyframe bằng ffmpeg, chỉ decode keyframe (``-skip_frame nokey``)."""
+    proc = subprocess.run(
+        [
+            FFMPEG_BINARY, "-hide_banner", "-nostats", "-skip_frame", "nokey",
+            "-i", path, "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-",
+        ],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+    )
+    if proc.returncode != 0:
+        raise IOError(f"Không quét được keyframe của '{path}'")
+    infos = proc.stderr.decode("utf8", errors="ignore")
+    times = [
+        float(m.group(1))
+        for line in infos.splitlines()
+        if "Parsed_showinfo" in line
+        for m in [_PTS_TIME_RE.search(line)]
+        if m
+    ]
+    return sorted(times)
+
+
+class ProbeCache:
+    """Cache kết quả probe trong bộ nhớ và trong file sqlite.
+
+    Mỗi bản ghi gắn với (đường dẫn tuyệt đối, kích thước, mtime); file bị sửa
+    sẽ được probe lại. ``db_path=None`` hoặc rỗng thì chỉ cache trong bộ nhớ.
+    Bảng ``probes`` chứa thông số luồng, bảng ``keyframes`` chứa chỉ mục
+    keyframe của luồng video, bảng ``envelopes`` chứa envelope âm lượng
+    (xem AudioAnalysis).
+    """
+
+    TABLES = ("probes", "keyframes", "envelopes")
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH):
+        self.db_path = db_path or None
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        self._conn_pid = None
+
+    def _connection(self):
+        # Kết nối sqlite không dùng chung được giữa các tiến trình (fork).
+        if self._conn is None or self._conn_pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            for table in self.TABLES:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, info TEXT)"
+                )
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def get(self, path):
+        """Thông số luồng của ``path`` (xem ``probe_media``)."""
+        return self._get("probes", path, _probe_uncached)
+
+    def get_keyframes(self, path):
+        """Danh sách thời điểm (giây) các keyframe video của ``path``."""
+        return self._get("keyframes", path, _scan_keyframes)
+
+    def get_envelope(self, path, compute):
+        """Envelope âm lượng của ``path``; ``compute(path)`` tạo bản ghi nếu chưa có."""
+        return self._get("envelopes", path, compute)
+
+    def _get(self, table, path, compute):
+        try:
+            st = os.stat(path)
+        except OSError:
+            # Không có file để làm khóa cache; để ffmpeg báo lỗi như bình thường.
+            return compute(path)
+        abs_path = os.path.abspath(path)
+        key = (table, abs_path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if key in self._memory:
+                return copy.copy(self._memory[key])
+            value = self._load(table, abs_path, st) if self.db_path else None
+        if value is None:
+            value = compute(path)
+            if self.db_path:
+                self._store(table, abs_path, st, value)
+        with self._lock:
+            self._memory[key] = value
+        return copy.copy(value)
+
+    def _load(self, table, abs_path, st):
+        try:
+            row = self._connection().execute(
+                f"SELECT size, mtime_ns, info FROM {table} WHERE path = ?", (abs_path,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return json.loads(row[2])
+        return None
+
+    def _store(self, table, abs_path, st, value):
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?)",
+                    (abs_path, st.st_size, st.st_mtime_ns, json.dumps(value)),
+                )
+                conn.commit()
+            except sqlite3.Error:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.db_path and os.path.exists(self.db_path):
+                conn = self._connection()
+                for table in self.TABLES:
+                    conn.execute(f"DELETE FROM {table}")
+                conn.commit()
+
+
+_default_cache = None
+
+
+def get_probe_cache():
+    """Trả về ProbeCache dùng chung của tiến trình."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ProbeCache()
+    return _default_cache
+
+
+def probe_media(path, cache=None):
+    """Đọc thông số của file media bằng một lệnh ``ffmpeg -i`` (không decode).
+
+    Trả về dict gồm: duration, has_video, video_codec, pix_fmt, width, height,
+    fps, has_audio, audio_codec, audio_rate, audio_channels. Kết quả được cache
+    theo (đường dẫn, kích thước, mtime) qua ``cache`` hoặc cache mặc định.
+    """
+    return (cache or get_probe_cache()).get(path)
+
+
+def get_duration(path):
+    """Thời lượng (giây) của file media, lấy từ cache probe."""
+    return probe_media(path)["duration"]
+
+
+def get_keyframes(path):
+    """Chỉ mục keyframe (giây, tăng dần) của file video, có cache."""
+    return get_probe_cache().get_keyframes(path)
@@ -0,0 +1,204 @@
+import os
+import math
+import hashlib
+import shutil
+import logging
+import tempfile
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .MediaProbe import probe_media, get_keyframes
+    from .FFmpegTools import run_ffmpeg, atomic_output
+except ImportError:
+    from MediaProbe import probe_media, get_keyframes
+    from FFmpegTools import run_ffmpeg, atomic_output
+
+THUMBNAIL_WIDTH = 320
+# Chất lượng ảnh ra: 0-100 cho WebP; JPEG được đổi sang thang -q:v 2-31 của ffmpeg.
+IMAGE_QUALITY = 80
+# Dời -ss qua keyframe một chút để làm tròn số không rơi về keyframe trước.
+_SEEK_EPSILON = 0.001
+
+
+def preview_times(duration, count, keyframes=None, max_drift=None):
+    """Các mốc (giây, có phải keyframe) cho ``count`` ảnh cách đều trên [0, duration).
+
+    Mỗi mốc nằm giữa một khoảng đều nhau và được dời về keyframe gần nhất
+    nếu lệch không quá ``max_drift`` (mặc định nửa khoảng cách giữa hai
+    ảnh) và keyframe đó chưa được ảnh khác dùng; ảnh ở keyframe chỉ cần
+    decode đúng một frame. Các mốc còn lại phải seek chính xác.
+    """
+    if not duration or count < 1:
+        return []
+    step = duration / count
+    if max_drift is None:
+        max_drift = step / 2
+    used = set()
+    times = []
+    for i in range(count):
+        target = step * (i + 0.5)
+        if keyframes:
+            nearest = min(keyframes, key=lambda k: abs(k - target))
+            if abs(nearest - target) <= max_drift and nearest not in used:
+                used.add(nearest)
+                times.append((nearest, True))
+                continue
+        times.append((target, False))
+    return times
+
+
+def _image_args(path, quality):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".jpg", ".jpeg"):
+        return ["-q:v", str(max(2, min(31, round(31 - quality * 29 / 100))))]
+    if ext == ".webp":
+        return ["-c:v", "libwebp", "-quality", str(quality)]
+    return []
+
+
+def output_stem(path):
+    """Tên gốc cho ảnh preview của ``path``: tên file kèm hash đường dẫn.
+
+    Hai video cùng tên ở hai thư mục (``a/clip.mp4``, ``b/clip.mp4``) nhờ vậy
+    không ghi đè ảnh của nhau.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf8")).hexdigest()[:8]
+    return f"{name}_{digest}"
+
+
+def frame_args(src, t, keyframe, output_path, width=THUMBNAIL_WIDTH, quality=IMAGE_QUALITY):
+    """Tham số ffmpeg xuất một frame của ``src`` tại ``t`` thành ảnh ``output_path``.
+
+    Với keyframe, decoder bỏ qua mọi frame không phải keyframe
+    (``-skip_frame nokey``) và seek không chính xác tới đúng keyframe đó,
+    nên chỉ một frame được decode. Mốc khác được seek chính xác: decode từ
+    keyframe trước đó tới ``t``, không phải từ đầu file.
+    """
+    if keyframe:
+        args = ["-skip_frame", "nokey", "-noaccurate_seek", "-ss", f"{t + _SEEK_EPSILON:.6f}"]
+    else:
+        args = ["-ss", f"{t:.6f}"]
+    return args + [
+        "-i", src, "-map", "0:v:0", "-frames:v", "1", "-vf", f"scale={width}:-2",
+        *_image_args(output_path, quality), "-update", "1", output_path,
+    ]
+
+
+class PreviewGenerator:
+    """Tạo ảnh thumbnail và sprite sheet xem trước cho file video.
+
+    Mốc ảnh được chọn theo chỉ mục keyframe của file (``get_keyframes``, có
+    cache cùng kết quả probe); mỗi ảnh là một ffmpeg riêng chạy trong thread
+    pool ``workers`` luồng, kể cả khi tạo preview cho nhiều file cùng lúc.
+    """
+
+    def __init__(self, temp_folder=None, width=THUMBNAIL_WIDTH, workers=None,
+                 quality=IMAGE_QUALITY):
+        self.temp_folder = temp_folder or "temp"
+        os.makedirs(self.temp_folder, exist_ok=True)
+        self.width = width
+        self.workers = workers or os.cpu_count() or 1
+        self.quality = quality
+
+    def seek_index(self, path):
+        """Chỉ mục keyframe (giây) của ``path``; rỗng nếu không đọc được."""
+        try:
+            return get_keyframes(path)
+        except IOError as e:
+            logging.warning(f"Không đọc được keyframe của '{path}', seek chính xác mọi ảnh: {e}")
+            return []
+
+    def plan(self, path, count):
+        """Các mốc (giây, có phải keyframe) của ``count`` ảnh preview cho ``path``."""
+        return preview_times(probe_media(path)["duration"], count, self.seek_index(path))
+
+    def _extract(self, frames):
+        """Xuất song song các ảnh ``(src, t, keyframe, output_path)``."""
+        jobs = [
+            frame_args(src, t, keyframe, out, self.width, self.quality)
+            for src, t, keyframe, out in frames
+        ]
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(jobs)))) as pool:
+            # Mỗi job mang ngữ cảnh của thread gọi (runner ffmpeg của AsyncProcessor).
+            futures = [
+                pool.submit(contextvars.copy_context().run, run_ffmpeg, args) for args in jobs
+            ]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def thumbnails_many(self, paths, count=10, output_folder=None, fmt="jpg"):
+        """Tạo ``count`` thumbnail cho mỗi file trong ``paths``, trả về {path: [ảnh]}.
+
+        Ảnh của ``video.mp4`` nằm trong ``<output_folder>/video_<hash>_thumbs``
+        (xem ``output_stem``; mặc định trong ``temp_folder``), tên
+        ``thumb_0001.<fmt>``...
+        """
+        output_folder = output_folder or self.temp_folder
+        frames, results = [], {}
+        for path in paths:
+            folder = os.path.join(output_folder, f"{output_stem(path)}_thumbs")
+            os.makedirs(folder, exist_ok=True)
+            outputs = []
+            for i, (t, keyframe) in enumerate(self.plan(path, count), 1):
+                out = os.path.join(folder, f"thumb_{i:04d}.{fmt}")
+                frames.append((path, t, keyframe, out))
+                outputs.append(out)
+            results[path] = outputs
+        logging.info(f"Xuất {len(frames)} thumbnail cho {len(results)} file.")
+        self._extract(frames)
+        return results
+
+    def thumbnails(self, path, count=10, output_folder=None, fmt="jpg"):
+        """Tạo ``count`` thumbnail cách đều của ``path``, trả về danh sách ảnh."""
+        return self.thumbnails_many([path], count, output_folder, fmt)[path]
+
+    def _sprite_sheets(self, targets, count, columns):
+        # targets: [(video, sprite)]; các ô của mọi file được xuất chung một pool.
+        work = tempfile.mkdtemp(prefix="sprites_", dir=self.temp_folder)
+        try:
+            tiles = self.thumbnails_many([path for path, _ in targets], count, work, "png")
+            results = {}
+            for path, sprite in targets:
+                frames = tiles[path]
+                if not frames:
+                    continue
+                cols = min(columns, len(frames))
+                rows = math.ceil(len(frames) / cols)
+                pattern = os.path.join(os.path.dirname(frames[0]), "thumb_%04d.png")
+                with atomic_output(sprite) as tmp_path:
+                    run_ffmpeg([
+                        "-framerate", "1", "-i", pattern, "-vf", f"tile={cols}x{rows}",
+                        "-frames:v", "1", *_image_args(sprite, self.quality), "-update", "1",
+                        tmp_path,
+                    ])
+                results[path] = sprite
+            return results
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+    def sprite_sheets(self, paths, count=16, columns=4, output_folder=None, fmt="jpg"):
+        """Tạo sprite sheet ``count`` ảnh (``columns`` cột) cho mỗi file, trả về {path: sprite}.
+
+        Sprite của ``video.mp4`` là ``<output_folder>/video_<hash>_sprite.<fmt>``.
+        Các ô được xuất song song ra file tạm rồi ghép bằng filter ``tile``.
+        """
+        output_folder = output_folder or self.temp_folder
+        os.makedirs(output_folder, exist_ok=True)
+        targets = [
+            (path, os.path.join(output_folder, f"{output_stem(path)}_sprite.{fmt}"))
+            for path in paths
+        ]
+        return self._sprite_sheets(targets, count, columns)
+
+    def sprite_sheet(self, path, count=16, columns=4, output_path=None):
+        """Sprite sheet ``count`` ảnh của ``path``; đuôi ``output_path`` chọn định dạng ảnh."""
+        if output_path is None:
+            return self.sprite_sheets([path], count, columns).get(path)
+        return self._sprite_sheets([(path, output_path)], count, columns).get(path)
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+
+# Tăng khi thay đổi cách render để các kết quả cũ không còn khớp khóa.
+CACHE_VERSION = 1
+
+
+def file_identity(path, hash_content=False):
+    """Định danh của file input: (đường dẫn, kích thước, mtime) hoặc sha256 nội dung."""
+    if hash_content:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return ["sha256", digest.hexdigest()]
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
+def _touch(path):
+    """Ghi lần dùng cuối vào atime, giữ nguyên mtime.
+
+    Artifact được hard link tới file ra (chung inode): đổi mtime sẽ đổi
+    ``file_identity`` của mọi file ra đó và làm mất hiệu lực các kết quả
+    cache, khóa probe dựa trên chúng.
+    """
+    st = os.stat(path)
+    os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+
+
+def _link_or_copy(src, dst):
+    """Hard link ``src`` tới ``dst`` (thay thế nguyên tử), copy nếu không link được."""
+    folder = os.path.dirname(os.path.abspath(dst))
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".cache_", suffix=os.path.splitext(dst)[1], dir=folder)
+    os.close(fd)
+    os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+
+
+class ResultCache:
+    """Cache kết quả render theo nội dung input, tên thao tác và tham số.
+
+    Mỗi artifact nằm ở ``cache_dir/<2 ký tự đầu khóa>/<khóa>-<i><đuôi>``; lần
+    chạy sau với cùng input/tham số chỉ cần link (hoặc copy) file ra.
+    ``max_bytes`` và ``max_age`` (giây) giới hạn dung lượng và tuổi; entry dùng
+    lâu nhất bị xóa trước.
+    """
+
+    def __init__(self, cache_dir, max_bytes=None, max_age=None, hash_content=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hash_content = hash_content
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, operation, inputs, params=None):
+        payload = {
+            "version": CACHE_VERSION,
+            "operation": operation,
+            "inputs": [file_identity(p, self.hash_content) for p in inputs],
+            "params": params or {},
+        }
+        data = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+    def _artifact(self, key, index, output_path):
+        ext = os.path.splitext(output_path)[1]
+        return os.path.join(self.cache_dir, key[:2], f"{key}-{index}{ext}")
+
+    def get(self, key, output_paths):
+        """Đưa artifact ra ``output_paths`` nếu có đủ trong cache; trả về True/False."""
+        artifacts = [self._artifact(key, i, p) for i, p in enumerate(output_paths)]
+        if not all(os.path.exists(a) for a in artifacts):
+            return False
+        for artifact, output_path in zip(artifacts, output_paths):
+            _touch(artifact)
+            if os.path.abspath(artifact) != os.path.abspath(output_path):
+                _link_or_copy(artifact, output_path)
+        return True
+
+    def put(self, key, output_paths):
+        for i, output_path in enumerate(output_paths):
+            _link_or_copy(output_path, self._artifact(key, i, output_path))
+        self.evict()
+
+    def fetch_or_render(self, operation, inputs, params, output_paths, render):
+        """Trả kết quả từ cache, hoặc gọi ``render()`` rồi lưu kết quả vào cache.
+
+        ``output_paths`` có thể là một đường dẫn hoặc danh sách; ``render()``
+        trả về None nghĩa là thất bại và không được cache.
+        """
+        single = isinstance(output_paths, str)
+        paths = [output_paths] if single else list(output_paths)
+        try:
+            key = self.make_key(operation, inputs, params)
+        except OSError:
+            # Input không tồn tại: để render báo lỗi như bình thường.
+            return render()
+        if self.get(key, paths):
+            self.hits += 1
+            logging.info(f"Dùng kết quả cache cho {operation}: {', '.join(paths)}")
+            return paths[0] if single else paths
+        self.misses += 1
+        for path in paths:
+            # File ra cũ có thể là hard link tới artifact khác; ffmpeg ghi đè
+            # tại chỗ sẽ làm hỏng artifact đó, nên gỡ link trước khi render.
+            if os.path.exists(path):
+                os.remove(path)
+        result = render()
+        if result is not None:
+            try:
+                self.put(key, paths)
+            except OSError as e:
+                logging.warning(f"Không lưu được kết quả vào cache: {e}")
+        return result
+
+    def entries(self):
+        """Danh sách (đường dẫn, kích thước, lần dùng cuối) của các artifact."""
+        found = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith(".cache_"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                # Lần dùng cuối: ghi (mtime) hoặc lấy ra từ cache (atime).
+                found.append((path, st.st_size, max(st.st_atime, st.st_mtime)))
+        return found
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Xóa artifact quá ``max_age`` rồi xóa LRU tới khi dưới ``max_bytes``."""
+        entries = sorted(self.entries(), key=lambda e: e[2])
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, last_used in entries:
+            too_old = self.max_age is not None and now - last_used > self.max_age
+            too_big = self.max_bytes is not None and total > self.max_bytes
+            if not (too_old or too_big):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
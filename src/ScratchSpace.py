@@ -0,0 +1,343 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import itertools
+import contextvars
+from contextlib import contextmanager
+
+# Thư mục con (ẩn) của root chứa thư mục tạm của từng job.
+JOBS_DIR = ".jobs"
+_OWNER_FILE = ".owner"
+# File chung ghi trong khoảng này (giây) chưa bị dọn: có thể vẫn đang được dùng.
+MIN_AGE = 60.0
+# Intermediate ước lượng nhỏ hơn mức này mới được đặt trên tmpfs.
+SMALL_FILE_BYTES = 32 * 1024**2
+TMPFS_QUOTA_BYTES = 256 * 1024**2
+
+# Job đang chạy trong thread/task hiện tại (xem ``ScratchSpace.job``).
+_current_job = contextvars.ContextVar("tudongghep_scratch_job", default=None)
+_job_counter = itertools.count(1)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _tree_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class ScratchJob:
+    """Thư mục tạm riêng của một job; bị xóa cùng mọi thứ bên trong khi job kết thúc.
+
+    File ``.owner`` trong thư mục ghi pid của job và các file chung đang được
+    job giữ (``lease``), để ``enforce_quota`` của mọi tiến trình bỏ qua chúng.
+    """
+
+    def __init__(self, space, path, fast_path=None):
+        self.space = space
+        self.path = path
+        self.fast_path = fast_path
+        self.created = time.time()
+        self.leases = []
+
+    def lease(self, paths):
+        """Giữ các file chung trong ``paths`` tới khi job kết thúc (file khác bị bỏ qua)."""
+        added = False
+        for path in paths:
+            if not self.space.is_shared(path):
+                continue
+            path = os.path.abspath(path)
+            self.space.touch(path)
+            if path not in self.leases:
+                self.leases.append(path)
+                added = True
+        if added or not os.path.exists(os.path.join(self.path, _OWNER_FILE)):
+            self._write_owner()
+
+    def _write_owner(self):
+        # Ghi rồi đổi tên: tiến trình khác không bao giờ đọc phải file dở dang.
+        owner = os.path.join(self.path, _OWNER_FILE)
+        tmp = f"{owner}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"pid": os.getpid(), "created": self.created, "leases": self.leases}, f)
+        os.replace(tmp, owner)
+
+    def folder(self, expected_bytes=None):
+        """Thư mục cho một intermediate ước lượng ``expected_bytes`` byte.
+
+        Intermediate nhỏ được đặt trên tmpfs (nếu có và còn chỗ trong quota
+        tmpfs), còn lại nằm trong thư mục job trên đĩa.
+        """
+        if self.fast_path and self.space.can_stage(expected_bytes):
+            os.makedirs(self.fast_path, exist_ok=True)
+            return self.fast_path
+        return self.path
+
+    def bytes_used(self):
+        return _tree_bytes(self.path) + (_tree_bytes(self.fast_path) if self.fast_path else 0)
+
+    def cleanup(self):
+        for path in (self.path, self.fast_path):
+            if path:
+                shutil.rmtree(path, ignore_errors=True)
+        if self.fast_path:
+            # Không để lại thư mục rỗng trên tmpfs; còn job khác thì giữ nguyên.
+            try:
+                os.rmdir(os.path.dirname(self.fast_path))
+            except OSError:
+                pass
+
+
+class ScratchSpace:
+    """Quản lý thư mục tạm ``root`` dùng chung giữa nhiều job và tiến trình.
+
+    Mỗi job (``with space.job(name)``) có thư mục riêng ``root/.jobs/<pid>-<n>-<name>``
+    và chỉ job đó xóa nó khi xong (kể cả khi lỗi); thư mục của tiến trình đã
+    chết được dọn ở lần tạo ScratchSpace sau (``recover``). File nằm thẳng
+    trong ``root`` (output mặc định, bản mezzanine...) là file chung: khi tổng
+    dung lượng vượt ``quota_bytes``, file dùng lâu nhất bị xóa trước, trừ file
+    mới ghi trong ``min_age`` giây. ``tmpfs_root`` (ví dụ ``/dev/shm``) là nơi
+    đặt các intermediate nhỏ, tối đa ``tmpfs_quota_bytes``.
+    """
+
+    def __init__(self, root, quota_bytes=None, tmpfs_root=None,
+                 tmpfs_quota_bytes=TMPFS_QUOTA_BYTES, small_file_bytes=SMALL_FILE_BYTES,
+                 min_age=MIN_AGE):
+        self.root = root
+        self.quota_bytes = quota_bytes
+        self.tmpfs_root = tmpfs_root if tmpfs_root and os.path.isdir(tmpfs_root) else None
+        if tmpfs_root and not self.tmpfs_root:
+            logging.warning(f"Không có thư mục tmpfs '{tmpfs_root}', intermediate sẽ nằm trên đĩa.")
+        self.tmpfs_quota_bytes = tmpfs_quota_bytes
+        self.small_file_bytes = small_file_bytes
+        self.min_age = min_age
+        self.evicted = 0
+        os.makedirs(self.root, exist_ok=True)
+        self.recover()
+
+    @property
+    def jobs_dir(self):
+        return os.path.join(self.root, JOBS_DIR)
+
+    @property
+    def tmpfs_jobs_dir(self):
+        if not self.tmpfs_root:
+            return None
+        # Nhiều root có thể dùng chung một tmpfs.
+        digest = hashlib.sha1(os.path.abspath(self.root).encode("utf8")).hexdigest()[:8]
+        return os.path.join(self.tmpfs_root, f"tudongghep-{digest}")
+
+    def _new_job(self, name, leases=()):
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)[:40]
+        job_name = f"{os.getpid()}-{next(_job_counter)}-{safe}"
+        path = os.path.join(self.jobs_dir, job_name)
+        os.makedirs(path)
+        fast_path = os.path.join(self.tmpfs_jobs_dir, job_name) if self.tmpfs_root else None
+        job = ScratchJob(self, path, fast_path)
+        job.lease(leases)
+        return job
+
+    @contextmanager
+    def job(self, name="job", inputs=()):
+        """Phạm vi một job; trả về ScratchJob. Gọi lồng trong cùng ngữ cảnh thì dùng lại job ngoài.
+
+        File chung trong ``inputs`` được giữ (``ScratchJob.lease``) trước khi
+        dọn theo quota, nên không bị xóa trong lúc job dùng.
+        """
+        current = _current_job.get()
+        if current is not None and current.space is self:
+            current.lease(inputs)
+            yield current
+            return
+        job = self._new_job(name, inputs)
+        token = _current_job.set(job)
+        try:
+            self.enforce_quota()
+            yield job
+        finally:
+            _current_job.reset(token)
+            job.cleanup()
+
+    @contextmanager
+    def lease(self, paths=(), name="lease"):
+        """Giữ các file chung ``paths`` trong suốt khối ``with`` (không phải job hiện tại).
+
+        Trả về ScratchJob; gọi ``.lease(...)`` để giữ thêm file, ví dụ các
+        nguồn dùng chung được chuẩn bị dần cho cả một batch.
+        """
+        job = self._new_job(name, paths)
+        try:
+            yield job
+        finally:
+            job.cleanup()
+
+    def retain(self, paths):
+        """Giữ ``paths`` tới khi job hiện tại kết thúc; ngoài job thì chỉ đánh dấu vừa dùng."""
+        job = self.current_job()
+        if job:
+            job.lease(paths)
+        else:
+            for path in paths:
+                if self.is_shared(path):
+                    self.touch(path)
+
+    def is_shared(self, path):
+        """``path`` có phải file chung (nằm thẳng trong ``root``) không."""
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.root)
+
+    def leased_paths(self):
+        """Các file chung đang được job còn sống (của mọi tiến trình) giữ."""
+        leased = set()
+        if not os.path.isdir(self.jobs_dir):
+            return leased
+        for name in os.listdir(self.jobs_dir):
+            try:
+                with open(os.path.join(self.jobs_dir, name, _OWNER_FILE)) as f:
+                    owner = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if owner["pid"] == os.getpid() or _pid_alive(owner["pid"]):
+                leased.update(owner.get("leases", ()))
+        return leased
+
+    def current_job(self):
+        job = _current_job.get()
+        return job if job is not None and job.space is self else None
+
+    def work_folder(self, expected_bytes=None):
+        """Thư mục cho intermediate: của job hiện tại (xem ``ScratchJob.folder``), ngoài job là ``root``."""
+        job = self.current_job()
+        return job.folder(expected_bytes) if job else self.root
+
+    def can_stage(self, expected_bytes):
+        """Intermediate ``expected_bytes`` byte có được đặt trên tmpfs không."""
+        if not self.tmpfs_root or expected_bytes is None or expected_bytes > self.small_file_bytes:
+            return False
+        used = _tree_bytes(self.tmpfs_jobs_dir) if os.path.isdir(self.tmpfs_jobs_dir) else 0
+        if used + expected_bytes > self.tmpfs_quota_bytes:
+            return False
+        return shutil.disk_usage(self.tmpfs_root).free > 2 * expected_bytes
+
+    def recover(self):
+        """Xóa thư mục job của các tiến trình không còn chạy; trả về số thư mục đã xóa."""
+        removed = 0
+        for folder in (self.jobs_dir, self.tmpfs_jobs_dir):
+            if not folder or not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                try:
+                    pid = int(name.split("-", 1)[0])
+                except ValueError:
+                    continue
+                if pid == os.getpid() or _pid_alive(pid):
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        if removed:
+            logging.info(f"Đã dọn {removed} thư mục tạm của job bị dừng đột ngột.")
+        return removed
+
+    def shared_entries(self):
+        """Danh sách (đường dẫn, kích thước, lần dùng cuối) các file chung trong ``root``."""
+        found = []
+        for name in os.listdir(self.root):
+            if name.startswith("."):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if os.path.isfile(path):
+                # Lần dùng cuối: ghi (mtime) hoặc ``touch`` (atime).
+                found.append((path, st.st_size, max(st.st_atime, st.st_mtime)))
+        return found
+
+    def usage(self):
+        """Dung lượng (byte) theo loại: ``shared``, ``jobs``, ``tmpfs`` và ``total`` (trên đĩa)."""
+        shared = sum(size for _, size, _ in self.shared_entries())
+        jobs = _tree_bytes(self.jobs_dir) if os.path.isdir(self.jobs_dir) else 0
+        tmpfs = 0
+        if self.tmpfs_root and os.path.isdir(self.tmpfs_jobs_dir):
+            tmpfs = _tree_bytes(self.tmpfs_jobs_dir)
+        return {"shared": shared, "jobs": jobs, "tmpfs": tmpfs, "total": shared + jobs}
+
+    @staticmethod
+    def touch(path):
+        """Đánh dấu file chung vừa được dùng (để LRU giữ lại lâu hơn).
+
+        Chỉ đổi atime: mtime là một phần định danh file của ResultCache và
+        cache probe, đổi nó sẽ làm mọi kết quả đã cache theo file này mất hiệu lực.
+        """
+        try:
+            st = os.stat(path)
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+        except OSError:
+            pass
+
+    def enforce_quota(self, extra_bytes=0):
+        """Xóa file chung dùng lâu nhất tới khi tổng (cộng ``extra_bytes``) dưới ``quota_bytes``.
+
+        File đang được job nào đó giữ (``leased_paths``) không bao giờ bị xóa.
+        """
+        if self.quota_bytes is None:
+            return 0
+        leased = self.leased_paths()
+        entries = sorted(
+            (e for e in self.shared_entries() if os.path.abspath(e[0]) not in leased),
+            key=lambda e: e[2],
+        )
+        total = self.usage()["total"] + extra_bytes
+        now = time.time()
+        removed = 0
+        for path, size, last_used in entries:
+            if total <= self.quota_bytes:
+                break
+            if now - last_used < self.min_age:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self.evicted += removed
+        if total > self.quota_bytes:
+            logging.warning(
+                f"Thư mục tạm '{self.root}' dùng {total / 1e6:.0f} MB, vượt quota "
+                f"{self.quota_bytes / 1e6:.0f} MB (phần còn lại đang được job dùng)."
+            )
+        return removed
+
+    def clear(self):
+        """Xóa mọi file chung và thư mục của job đã chết; job đang chạy không bị ảnh hưởng.
+
+        File chung đang được job nào đó giữ (``leased_paths``) cũng được giữ lại.
+        """
+        leased = self.leased_paths()
+        for path, _, _ in self.shared_entries():
+            if os.path.abspath(path) in leased:
+                continue
+            try:
+                os.remove(path)
+            except Exception as e:
+                logging.warning(f"Lỗi khi xóa file tạm {path}: {e}")
+        self.recover()
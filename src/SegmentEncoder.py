@@ -0,0 +1,139 @@
+import os
+import logging
+import tempfile
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .MediaProbe import get_keyframes
+    from .FFmpegTools import atomic_output, run_ffmpeg, write_concat_list
+except ImportError:
+    from MediaProbe import get_keyframes
+    from FFmpegTools import atomic_output, run_ffmpeg, write_concat_list
+
+# Đoạn ngắn hơn mức này không đáng tách: chi phí khởi động encoder và
+# keyframe thêm ở đầu đoạn lớn hơn phần lợi khi chạy song song.
+MIN_SEGMENT_SECONDS = 4.0
+
+
+def plan_segments(duration, count, keyframes=None, min_length=MIN_SEGMENT_SECONDS):
+    """Chia [0, duration) thành tối đa ``count`` đoạn (start, end) gần bằng nhau.
+
+    Ranh giới được dời về keyframe gần nhất của nguồn (nếu có ``keyframes``)
+    để mỗi đoạn bắt đầu decode ngay tại keyframe, không phải decode bỏ đi.
+    """
+    count = max(1, min(count, int(duration // min_length)))
+    bounds = [0.0]
+    for i in range(1, count):
+        target = duration * i / count
+        if keyframes:
+            target = min(keyframes, key=lambda k: abs(k - target))
+        if target - bounds[-1] >= min_length and duration - target >= min_length:
+            bounds.append(target)
+    bounds.append(duration)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def encode_file(src, output_path, duration, video_args, audio_input=None, audio_args=(),
+                workers=None, temp_folder=None):
+    """Encode luồng video của ``src`` (và một luồng audio) thành ``output_path``.
+
+    ``video_args`` là filter/codec/tham số encode video (không gồm input,
+    output); audio lấy từ input riêng ``audio_input`` (ví dụ ``["-i", src]``
+    hoặc một nguồn lavfi, None nếu không cần audio) với ``audio_args``. Cả
+    hai luồng được cắt ở ``duration``. Có ``workers`` > 1 và nguồn đủ dài thì
+    encode song song theo đoạn (xem ``encode_segmented``), ngược lại chạy một
+    tiến trình ffmpeg. ``output_path`` chỉ xuất hiện khi đã encode xong (xem
+    ``atomic_output``), kể cả khi bị hủy giữa chừng.
+    """
+    if workers and workers > 1 and duration and duration >= 2 * MIN_SEGMENT_SECONDS:
+        return encode_segmented(
+            src, output_path, duration, video_args, audio_input, audio_args, workers, temp_folder
+        )
+    args = ["-i", src]
+    if audio_input:
+        args += [*audio_input, "-map", "0:v:0", "-map", "1:a:0", *video_args, *audio_args]
+    else:
+        args += ["-map", "0:v:0", *video_args]
+    args += ["-t", f"{duration:.6f}"] if duration else ["-shortest"]
+    with atomic_output(output_path) as tmp_path:
+        run_ffmpeg(args + ["-movflags", "+faststart", tmp_path])
+    return output_path
+
+
+def encode_segmented(src, output_path, duration, video_args, audio_input=None, audio_args=(),
+                     workers=2, temp_folder=None):
+    """Như ``encode_file`` nhưng luồng video được encode bởi nhiều encoder song song.
+
+    Video được chia thành các đoạn thẳng hàng với keyframe (``plan_segments``),
+    mỗi đoạn là một tiến trình ffmpeg riêng; audio được encode một lần trong
+    một worker khác. Các đoạn bắt đầu bằng keyframe mới nên được nối bằng
+    stream copy rồi mux với audio, không encode lại lần nào nữa.
+    """
+    try:
+        keyframes = get_keyframes(src)
+    except Exception as e:
+        logging.warning(f"Không đọc được keyframe của '{src}', chia đoạn đều: {e}")
+        keyframes = None
+    segments = plan_segments(duration, workers, keyframes)
+    folder = tempfile.mkdtemp(prefix="segments_", dir=temp_folder)
+    parts = [os.path.join(folder, f"part{i:04d}.mp4") for i in range(len(segments))]
+    audio_path = os.path.join(folder, "audio.m4a")
+    jobs = [
+        [
+            "-ss", f"{start:.6f}", "-i", src, "-t", f"{end - start:.6f}",
+            "-map", "0:v:0", *video_args, part,
+        ]
+        for (start, end), part in zip(segments, parts)
+    ]
+    if audio_input:
+        jobs.insert(0, [
+            *audio_input, "-map", "0:a:0", *audio_args, "-t", f"{duration:.6f}", audio_path,
+        ])
+    logging.info(f"Encode '{src}' thành {len(segments)} đoạn song song.")
+    try:
+        run_parallel(jobs, workers + 1)
+        concat_parts(parts, output_path, folder, audio_path if audio_input else None)
+    finally:
+        for path in parts + [audio_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(folder)
+    return output_path
+
+
+def run_parallel(jobs, workers):
+    """Chạy các lệnh ffmpeg ``jobs`` trên tối đa ``workers`` luồng.
+
+    Một lệnh lỗi thì các lệnh chưa chạy bị hủy và lỗi được ném ra.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        # Mỗi job mang ngữ cảnh của thread gọi (runner ffmpeg, thao tác đang đo).
+        futures = [
+            pool.submit(contextvars.copy_context().run, run_ffmpeg, args) for args in jobs
+        ]
+        try:
+            for future in futures:
+                future.result()
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def concat_parts(parts, output_path, folder, audio_path=None):
+    """Nối các đoạn ``parts`` (mỗi đoạn bắt đầu bằng keyframe) bằng stream copy.
+
+    Có ``audio_path`` thì mux cùng luồng audio đó; file ra được ghi qua
+    ``atomic_output``.
+    """
+    list_path = write_concat_list(parts, folder)
+    try:
+        args = ["-f", "concat", "-safe", "0", "-i", list_path]
+        if audio_path:
+            args += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+        with atomic_output(output_path) as tmp_path:
+            run_ffmpeg(args + ["-c", "copy", "-movflags", "+faststart", tmp_path])
+    finally:
+        os.remove(list_path)
+    return output_path
@@ -0,0 +1,137 @@
+import os
+import logging
+import tempfile
+
+try:
+    from .MediaProbe import probe_media, get_keyframes
+    from .FFmpegTools import ENCODER_CODEC_NAMES, run_ffmpeg, write_concat_list
+    from .EncodeProfile import get_encode_profile
+except ImportError:
+    from MediaProbe import probe_media, get_keyframes
+    from FFmpegTools import ENCODER_CODEC_NAMES, run_ffmpeg, write_concat_list
+    from EncodeProfile import get_encode_profile
+
+# Codec smart cut được, kèm bitstream filter chèn SPS/PPS vào từng keyframe
+# để đoạn stream copy vẫn decode đúng sau đoạn encode lại (khác extradata).
+SMART_CUT_CODECS = {"h264": "h264_mp4toannexb", "hevc": "hevc_mp4toannexb"}
+
+
+def _first_keyframe_at_or_after(keyframes, t, tolerance):
+    for k in keyframes:
+        if k >= t - tolerance:
+            return k
+    return None
+
+
+def _last_keyframe_at_or_before(keyframes, t, tolerance):
+    found = None
+    for k in keyframes:
+        if k > t + tolerance:
+            break
+        found = k
+    return found
+
+
+def _reencode_video(src, start, end, output_path, video_codec, profile, pix_fmt):
+    run_ffmpeg([
+        "-ss", f"{start:.6f}", "-i", src, "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-an", "-c:v", video_codec,
+        # Giữ pix_fmt của nguồn để nối được với đoạn stream copy.
+        *profile.video_args(video_codec, pix_fmt=pix_fmt), output_path,
+    ])
+
+
+def _reencode_segment(src, start, end, output_path, video_codec, profile):
+    run_ffmpeg([
+        "-ss", f"{start:.6f}", "-i", src, "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c:v", video_codec, *profile.video_args(video_codec),
+        "-c:a", "aac", *profile.audio_args(),
+        "-movflags", "+faststart", output_path,
+    ])
+
+
+def cut_segment(src, start, end, output_path, temp_folder=None, video_codec="libx264",
+                profile=None):
+    """Cắt đoạn [start, end) của ``src`` theo kiểu "smart cut".
+
+    Phần video từ keyframe đầu tiên sau ``start`` tới keyframe cuối cùng
+    trước ``end`` được stream copy; chỉ hai đoạn GOP ngắn ở hai đầu được
+    encode lại. GOP chứa ``end`` không được copy vì frame B của nó (mux theo
+    thứ tự decode) sẽ lấn sang đoạn sau; đoạn kết thúc ở cuối file thì copy
+    tới hết. Audio của cả đoạn
+    được encode lại một lần (rẻ hơn nhiều so với video) để tránh lệch tiếng
+    tại điểm nối. Codec không hỗ trợ thì encode lại toàn bộ đoạn.
+    ``profile`` (EncodeProfile hoặc tên) quyết định preset/CRF của phần encode lại.
+    """
+    profile = get_encode_profile(profile)
+    info = probe_media(src)
+    duration = info["duration"]
+    end = duration if end is None else min(end, duration)
+    if end <= start:
+        raise ValueError(f"Đoạn cắt rỗng: [{start}, {end})")
+    codec = ENCODER_CODEC_NAMES.get(video_codec, video_codec)
+    if info["video_codec"] not in SMART_CUT_CODECS or info["video_codec"] != codec:
+        logging.info(f"Codec '{info['video_codec']}' không smart cut được, encode lại đoạn cắt.")
+        _reencode_segment(src, start, end, output_path, video_codec, profile)
+        return output_path
+
+    frame = 1.0 / (info["fps"] or 30)
+    keyframes = get_keyframes(src)
+    first = _first_keyframe_at_or_after(keyframes, start, frame / 2)
+    to_eof = end >= duration - frame / 2
+    last = end if to_eof else _last_keyframe_at_or_before(keyframes, end, frame / 2)
+    if first is None or last is None or last - first < frame / 2:
+        # Không có trọn một GOP trong đoạn: encode lại cả đoạn.
+        _reencode_segment(src, start, end, output_path, video_codec, profile)
+        return output_path
+
+    work_dir = tempfile.mkdtemp(prefix="smartcut_", dir=temp_folder)
+    parts = []
+    try:
+        if first - start > frame / 2:
+            head = os.path.join(work_dir, "head.mp4")
+            _reencode_video(src, start, first, head, video_codec, profile, info["pix_fmt"])
+            parts.append(head)
+        body = os.path.join(work_dir, "body.mp4")
+        args = ["-ss", f"{first:.6f}", "-i", src]
+        if not to_eof:
+            # ``-t`` khi stream copy xét theo dts nên lấn thêm vài frame sau
+            # ``last``; đếm frame (theo thứ tự decode) dừng đúng trước keyframe đó.
+            args += ["-frames:v", str(round((last - first) / frame))]
+        run_ffmpeg(args + [
+            "-map", "0:v:0", "-an", "-c:v", "copy",
+            "-bsf:v", SMART_CUT_CODECS[info["video_codec"]], body,
+        ])
+        parts.append(body)
+        if not to_eof and end - last > frame / 2:
+            tail = os.path.join(work_dir, "tail.mp4")
+            _reencode_video(src, last, end, tail, video_codec, profile, info["pix_fmt"])
+            parts.append(tail)
+        list_path = write_concat_list(parts, work_dir)
+        args = ["-f", "concat", "-safe", "0", "-i", list_path]
+        if info["has_audio"]:
+            args += [
+                "-ss", f"{start:.6f}", "-t", f"{end - start:.6f}", "-i", src,
+                "-map", "0:v:0", "-map", "1:a:0", "-c:a", "aac", *profile.audio_args(),
+            ]
+        else:
+            args += ["-map", "0:v:0"]
+        run_ffmpeg(args + ["-c:v", "copy", "-movflags", "+faststart", output_path])
+    finally:
+        for name in os.listdir(work_dir):
+            os.remove(os.path.join(work_dir, name))
+        os.rmdir(work_dir)
+    return output_path
+
+
+def split_at_times(src, times, output_paths, temp_folder=None, video_codec="libx264",
+                   profile=None):
+    """Chia ``src`` thành ``len(times) + 1`` đoạn tại các mốc ``times`` (giây)."""
+    duration = probe_media(src)["duration"]
+    bounds = [0.0] + sorted(min(t, duration) for t in times) + [duration]
+    if len(output_paths) != len(bounds) - 1:
+        raise ValueError("Số output_paths phải bằng số mốc thời gian + 1.")
+    for (start, end), output_path in zip(zip(bounds, bounds[1:]), output_paths):
+        cut_segment(src, start, end, output_path, temp_folder, video_codec, profile)
+    return output_paths
@@ -0,0 +1,225 @@
+import os
+import shutil
+import logging
+import tempfile
+from dataclasses import dataclass, field
+
+try:
+    from .MediaProbe import probe_media
+    from .FFmpegTools import run_ffmpeg
+    from .SegmentEncoder import MIN_SEGMENT_SECONDS, concat_parts, run_parallel
+except ImportError:
+    from MediaProbe import probe_media
+    from FFmpegTools import run_ffmpeg
+    from SegmentEncoder import MIN_SEGMENT_SECONDS, concat_parts, run_parallel
+
+SAMPLE_RATE = 44100
+
+
+@dataclass
+class Segment:
+    """Đoạn [start, end) của một video nguồn, đặt nối tiếp trên timeline."""
+
+    source: str
+    start: float = 0.0
+    end: float = None
+    keep_audio: bool = True
+
+
+@dataclass
+class AudioOverlay:
+    """Audio chèn vào timeline tại ``at`` giây.
+
+    ``replace=True`` tắt audio của các đoạn video trong khoảng overlay phát
+    (tương đương replace_audio), ngược lại trộn chung (tương đương mix).
+    """
+
+    source: str
+    at: float = 0.0
+    start: float = 0.0
+    end: float = None
+    gain: float = 1.0
+    replace: bool = False
+
+
+@dataclass
+class Timeline:
+    """Mô tả khai báo một chuỗi cắt/ghép/thay/trộn audio.
+
+    Cả timeline được biên dịch thành một filter graph ffmpeg và encode một
+    lần, không ghi file trung gian.
+    """
+
+    resolution: tuple = (720, 1280)
+    fps: float = 30
+    segments: list = field(default_factory=list)
+    overlays: list = field(default_factory=list)
+
+    def add_clip(self, source, start=0.0, end=None, keep_audio=True):
+        self.segments.append(Segment(source, start, end, keep_audio))
+        return self
+
+    def add_audio(self, source, at=0.0, start=0.0, end=None, gain=1.0, replace=False):
+        self.overlays.append(AudioOverlay(source, at, start, end, gain, replace))
+        return self
+
+    def _resolve(self):
+        """Điền ``end`` còn thiếu từ probe, trả về (infos theo nguồn, tổng thời lượng)."""
+        infos = {}
+        for item in self.segments + self.overlays:
+            if item.source not in infos:
+                infos[item.source] = probe_media(item.source)
+            info = infos[item.source]
+            if item.end is None or item.end > info["duration"]:
+                item.end = info["duration"]
+            if item.end <= item.start:
+                raise ValueError(f"Đoạn rỗng trong timeline: {item}")
+        return infos, sum(s.end - s.start for s in self.segments)
+
+    def duration(self):
+        return self._resolve()[1]
+
+    def _video_filter(self):
+        width, height = self.resolution
+        return f"scale={width}:{height},setsar=1,fps={self.fps},format=yuv420p"
+
+    def _filters(self, infos, index, video=True):
+        """Filter graph của timeline; ``video=False`` chỉ dựng phần audio (``[aout]``)."""
+        filters = []
+        concat_inputs = ""
+        for i, seg in enumerate(self.segments):
+            k = index[seg.source]
+            if video:
+                filters.append(
+                    f"[{k}:v:0]trim=start={seg.start:.6f}:end={seg.end:.6f},setpts=PTS-STARTPTS,"
+                    f"{self._video_filter()}[v{i}]"
+                )
+                concat_inputs += f"[v{i}]"
+            if seg.keep_audio and infos[seg.source]["has_audio"]:
+                filters.append(
+                    f"[{k}:a:0]atrim=start={seg.start:.6f}:end={seg.end:.6f},asetpts=PTS-STARTPTS,"
+                    f"aformat=sample_rates={SAMPLE_RATE}:channel_layouts=stereo[a{i}]"
+                )
+            else:
+                filters.append(
+                    f"anullsrc=r={SAMPLE_RATE}:cl=stereo,atrim=duration={seg.end - seg.start:.6f}[a{i}]"
+                )
+            concat_inputs += f"[a{i}]"
+        filters.append(
+            f"{concat_inputs}concat=n={len(self.segments)}:v={int(video)}:a=1"
+            f"{'[vout]' if video else ''}[abase]"
+        )
+
+        base = "abase"
+        muted = [o for o in self.overlays if o.replace]
+        if muted:
+            ranges = "+".join(
+                f"between(t,{o.at:.6f},{o.at + o.end - o.start:.6f})" for o in muted
+            )
+            filters.append(f"[abase]volume=0:enable='{ranges}'[amuted]")
+            base = "amuted"
+        mix_inputs = f"[{base}]"
+        for j, o in enumerate(self.overlays):
+            delay = int(round(o.at * 1000))
+            filters.append(
+                f"[{index[o.source]}:a:0]atrim=start={o.start:.6f}:end={o.end:.6f},"
+                f"asetpts=PTS-STARTPTS,volume={o.gain},adelay={delay}:all=1,"
+                f"aformat=sample_rates={SAMPLE_RATE}:channel_layouts=stereo[o{j}]"
+            )
+            mix_inputs += f"[o{j}]"
+        if self.overlays:
+            filters.append(
+                f"{mix_inputs}amix=inputs={len(self.overlays) + 1}:duration=first:normalize=0,"
+                f"alimiter=limit=1:level=0[aout]"
+            )
+        else:
+            filters.append(f"[{base}]anull[aout]")
+        return filters
+
+    def _inputs(self):
+        if not self.segments:
+            raise ValueError("Timeline chưa có đoạn video nào.")
+        infos, total = self._resolve()
+        index = {src: i for i, src in enumerate(infos)}
+        args = []
+        for src in infos:
+            args += ["-i", src]
+        return infos, index, total, args
+
+    def build_args(self, output_path, video_codec="libx264", audio_codec="aac", encode_args=()):
+        """Tạo tham số ffmpeg (không gồm binary) để render timeline."""
+        infos, index, total, args = self._inputs()
+        return args + [
+            "-filter_complex", ";".join(self._filters(infos, index)),
+            "-map", "[vout]", "-map", "[aout]",
+            "-c:v", video_codec, *encode_args, "-c:a", audio_codec,
+            "-t", f"{total:.6f}", "-movflags", "+faststart", output_path,
+        ]
+
+    def build_audio_args(self, output_path, audio_codec="aac", audio_args=()):
+        """Tham số ffmpeg chỉ render audio của cả timeline (không decode video)."""
+        infos, index, total, args = self._inputs()
+        return args + [
+            "-filter_complex", ";".join(self._filters(infos, index, video=False)),
+            "-map", "[aout]", "-c:a", audio_codec, *audio_args,
+            "-t", f"{total:.6f}", output_path,
+        ]
+
+    def video_chunks(self, target_length):
+        """Các phần (nguồn, start, end) của video timeline, mỗi phần dài khoảng ``target_length``.
+
+        Đoạn dài được chia đều; không phần nào ngắn hơn ``MIN_SEGMENT_SECONDS``
+        trừ khi cả đoạn đã ngắn hơn.
+        """
+        self._resolve()
+        target = max(target_length, MIN_SEGMENT_SECONDS)
+        chunks = []
+        for seg in self.segments:
+            count = max(1, int((seg.end - seg.start) // target))
+            step = (seg.end - seg.start) / count
+            for i in range(count):
+                end = seg.end if i == count - 1 else seg.start + (i + 1) * step
+                chunks.append((seg.source, seg.start + i * step, end))
+        return chunks
+
+    def render(self, output_path, video_codec="libx264", audio_codec="aac", encode_args=()):
+        """Render cả timeline bằng một lần chạy ffmpeg."""
+        args = self.build_args(output_path, video_codec, audio_codec, encode_args)
+        logging.info(
+            f"Render timeline {len(self.segments)} đoạn, {len(self.overlays)} audio -> {output_path}"
+        )
+        run_ffmpeg(args)
+        return output_path
+
+    def render_segmented(self, output_path, workers, temp_folder=None, video_codec="libx264",
+                         audio_codec="aac", video_args=(), audio_args=()):
+        """Như ``render`` nhưng video được encode song song trên ``workers`` encoder.
+
+        Mỗi phần của ``video_chunks`` là một ffmpeg riêng seek tới đoạn nguồn
+        và chỉ scale/đổi fps; audio của cả timeline (kể cả overlay) được
+        render một lần bằng filter graph chỉ có audio. Các phần được nối bằng
+        stream copy rồi mux với audio.
+        """
+        total = self.duration()
+        chunks = self.video_chunks(total / workers)
+        folder = tempfile.mkdtemp(prefix="timeline_", dir=temp_folder)
+        parts = [os.path.join(folder, f"part{i:04d}.mp4") for i in range(len(chunks))]
+        audio_path = os.path.join(folder, "audio.m4a")
+        jobs = [self.build_audio_args(audio_path, audio_codec, audio_args)] + [
+            [
+                "-ss", f"{start:.6f}", "-i", source, "-t", f"{end - start:.6f}",
+                "-map", "0:v:0", "-vf", self._video_filter(), "-an",
+                "-c:v", video_codec, *video_args, part,
+            ]
+            for (source, start, end), part in zip(chunks, parts)
+        ]
+        logging.info(
+            f"Render timeline {len(self.segments)} đoạn thành {len(chunks)} phần song song "
+            f"-> {output_path}"
+        )
+        try:
+            run_parallel(jobs, workers + 1)
+            concat_parts(parts, output_path, folder, audio_path)
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        return output_path
@@ -1,76 +1,114 @@
 import os
+import time
 import logging
-from moviepy import VideoFileClip, AudioFileClip, concatenate_videoclips
 
-# Thiết lập logging cơ bản để thấy output
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+try:
+    from .LazyImport import lazy_callable
+    from .CatGhepCoBan import CatGhepCoBan
+    from .MediaProbe import probe_media
+    from .BatchMerger import BatchMerger, build_cross_product_jobs, summarize_results
+    from .JobPlanner import CostModel, JobPlanner
+    from .EncodeProfile import get_encode_profile
+    from .FFmpegTools import MP4_COPY_CODECS, atomic_output, swap_audio_at_start_copy
+except ImportError:
+    from LazyImport import lazy_callable
+    from CatGhepCoBan import CatGhepCoBan
+    from MediaProbe import probe_media
+    from BatchMerger import BatchMerger, build_cross_product_jobs, summarize_results
+    from JobPlanner import CostModel, JobPlanner
+    from EncodeProfile import get_encode_profile
+    from FFmpegTools import MP4_COPY_CODECS, atomic_output, swap_audio_at_start_copy
+
+VideoFileClip = lazy_callable("moviepy", "VideoFileClip")
+AudioFileClip = lazy_callable("moviepy", "AudioFileClip")
+concatenate_videoclips = lazy_callable("moviepy", "concatenate_videoclips")
 
-# Class giả lập để code có thể chạy
 class VideoProcessor:
-    def __init__(self, output_folder="output"):
+    def __init__(
+        self,
+        output_folder="output",
+        target_resolution=(720, 1280),
+        target_fps=30,
+        video_codec="libx264",
+        temp_folder=None,
+        threads=None,
+        result_cache=None,
+        encode_profile=None,
+        instrumentation=None,
+        clip_pool=None,
+        normalize_cache=None,
+        segment_workers=None,
+        silence_snap=None,
+        scratch=None,
+    ):
         self.output_folder = output_folder
         self.created_files = []
+        self.job_results = []
+        self.batch_wall_time = 0.0
+        self.threads = threads
+        # Số giây tối đa được lùi điểm phát lại audio gốc tới khoảng lặng (None: tắt).
+        self.silence_snap = silence_snap
         os.makedirs(self.output_folder, exist_ok=True)
-        class Config:
-            video_codec = 'libx264'
-            target_fps = 30
-        self.CG = Config()
+        # ``threads`` (ví dụ do BatchMerger chia) ghi đè số luồng của profile.
+        profile = get_encode_profile(encode_profile).with_threads(threads)
+        self.CG = CatGhepCoBan(
+            temp_folder, target_resolution, target_fps, video_codec, result_cache, profile,
+            instrumentation, clip_pool, normalize_cache, segment_workers, scratch,
+        )
 
     def get_video_details(self, video_path):
-        with VideoFileClip(video_path) as clip:
-            return clip.size, clip.fps, clip.duration
-
-    def merge_with_audio_swap_at_start(self, video_path, new_audio_path, output_filename=None):
-        videoClip = None
-        audioClip = None
+        if not os.path.exists(video_path):
+            logging.error(f"Không tìm thấy file: {video_path}")
+            return None, None, None
         try:
-            is_audio_file = new_audio_path.lower().endswith(('.mp3', '.wav', '.aac'))
-            if is_audio_file:
-                audioClip = AudioFileClip(new_audio_path)
-            else:
-                temp_video_clip = VideoFileClip(new_audio_path)
-                audioClip = temp_video_clip.audio
-                temp_video_clip.close()
+            with self.CG.instr.stage("probe", input=video_path):
+                info = probe_media(video_path)
+            return (info["width"], info["height"]), info["fps"], info["duration"]
+        except Exception as e:
+            logging.error(f"Không đọc được thông tin video '{video_path}': {e}")
+            return None, None, None
 
-            videoClip = VideoFileClip(video_path)
+    def merge_with_audio_swap_at_start(self, video_path, new_audio_path, output_filename=None):
+        operation = self.CG.instr.operation(
+            "merge_with_audio_swap_at_start", video=video_path, audio=new_audio_path
+        )
+        with operation:
+            return self._merge_with_audio_swap_at_start(video_path, new_audio_path, output_filename)
 
+    def _merge_with_audio_swap_at_start(self, video_path, new_audio_path, output_filename):
+        try:
             video_resolution, video_fps, video_duration = self.get_video_details(video_path)
-            
-            if audioClip is None or getattr(audioClip, 'duration', None) is None:
+            if video_duration is None:
+                return None
+
+            with self.CG.instr.stage("probe", input=new_audio_path):
+                audio_info = probe_media(new_audio_path)
+            if not audio_info["has_audio"] or audio_info["duration"] is None:
                 logging.error(f"Không thể đọc được audio từ file: {new_audio_path}")
                 return None
-            audio_duration = audioClip.duration
+            audio_duration = audio_info["duration"]
 
             final_name = output_filename or f"swapped_{os.path.basename(video_path)}"
             final_output_path = os.path.join(self.output_folder, final_name)
 
-            final_clip = None
-
-            if audio_duration >= video_duration:
-                logging.info(f"Audio dài hơn video. Cắt audio cho khớp với thời lượng video ({video_duration}s).")
-                
-                # --- GIẢI PHÁP DUY NHẤT cho moviepy==2.2.1 mà không thêm import ---
-                # Thay đổi trực tiếp thuộc tính .end và .duration của đối tượng audioClip.
-                # Đây là một "cách lách" (workaround) cho phiên bản cũ này.
-                audioClip.end = video_duration
-                audioClip.duration = video_duration
-                
-                # Sử dụng trực tiếp đối tượng audioClip đã bị thay đổi thuộc tính
-                final_clip = videoClip.with_audio(audioClip)
-                
-            else:
-                logging.info("Audio ngắn hơn video. Chỉ thay thế audio ở đoạn đầu.")
-                part1 = videoClip.subclipped(0, audio_duration)
-                part2 = videoClip.subclipped(audio_duration)
-                part1_with_new_audio = part1.with_audio(audioClip)
-                final_clip = concatenate_videoclips([part1_with_new_audio, part2], method="compose")
+            switch_time = audio_duration
+            if (self.silence_snap and audio_duration < video_duration
+                    and probe_media(video_path)["has_audio"]):
+                # Audio gốc phát tiếp từ khoảng lặng ngay sau đó, không bắt đầu giữa câu.
+                switch_time = min(video_duration, self.CG.snap_to_silence(
+                    video_path, audio_duration, self.silence_snap, forward_only=True
+                ))
+            params = {"switch_time": switch_time} if switch_time != audio_duration else {}
 
-            final_clip.write_videofile(
+            self.CG.cached_render(
+                "merge_with_audio_swap_at_start",
+                [video_path, new_audio_path],
+                params,
                 final_output_path,
-                codec=self.CG.video_codec,
-                fps=video_fps or self.CG.target_fps,
-                audio_codec='aac',
-                size=video_resolution
+                lambda: self._render_atomically(
+                    final_output_path, self._swap_audio_at_start, video_path,
+                    new_audio_path, video_fps, video_duration, audio_duration, switch_time,
+                ),
             )
 
             logging.info(f"Tạo video thành công: {final_output_path}")
@@ -80,11 +118,250 @@ class VideoProcessor:
         except Exception as e:
             logging.error(f"Đã xảy ra lỗi nghiêm trọng khi xử lý '{os.path.basename(video_path)}': {e}", exc_info=True)
             return None
-        finally:
-            if videoClip:
-                videoClip.close()
-            if audioClip:
-                audioClip.close()
-                
-vp = VideoProcessor()
-vp.merge_with_audio_swap_at_start("video1.mp4", "audio1.mp3", "output_long_audio.mp4")
\ No newline at end of file
+
+    @staticmethod
+    def _render_atomically(final_output_path, render, *args):
+        # File dở dang (job bị dừng giữa chừng) không bao giờ mang tên file ra.
+        with atomic_output(final_output_path) as tmp_path:
+            render(*args, tmp_path)
+        return final_output_path
+
+    def _swap_audio_at_start(self, video_path, new_audio_path, video_fps,
+                             video_duration, audio_duration, switch_time, final_output_path):
+        if audio_duration >= video_duration:
+            logging.info(f"Audio dài hơn video. Cắt audio cho khớp với thời lượng video ({video_duration}s).")
+            # Chỉ audio thay đổi: giữ nguyên luồng video, chỉ encode audio đã cắt.
+            return self.CG.replace_audio(video_path, new_audio_path, final_output_path)
+
+        logging.info("Audio ngắn hơn video. Chỉ thay thế audio ở đoạn đầu.")
+        try:
+            # Luồng video giữ nguyên (-c:v copy), chỉ audio được ghép và encode lại.
+            with self.CG.instr.stage("mux", path=final_output_path, method="swap_audio_at_start"):
+                return swap_audio_at_start_copy(
+                    video_path, new_audio_path, final_output_path, audio_duration,
+                    video_duration, probe_media(video_path)["has_audio"],
+                    audio_bitrate=self.CG.encode_profile.audio_bitrate, switch_time=switch_time,
+                )
+        except IOError as e:
+            logging.warning(f"Không stream copy được '{video_path}', encode lại video: {e}")
+        # Mọi clip mở qua pool: reader được đóng cả khi có exception, và audio
+        # lấy từ file video vẫn mở cho tới khi ghi xong.
+        with self.CG.clips.session() as clips:
+            with self.CG.instr.stage("open", input=[video_path, new_audio_path]):
+                is_audio_file = new_audio_path.lower().endswith(('.mp3', '.wav', '.aac'))
+                if is_audio_file:
+                    audioClip = clips.open(AudioFileClip, new_audio_path)
+                else:
+                    audioClip = clips.open(VideoFileClip, new_audio_path).audio
+                videoClip = clips.open(VideoFileClip, video_path)
+                part1 = videoClip.subclipped(0, switch_time)
+                part2 = videoClip.subclipped(switch_time)
+                part1_with_new_audio = part1.with_audio(audioClip)
+                final_clip = concatenate_videoclips([part1_with_new_audio, part2], method="compose")
+            self.CG.instr.write_videofile(
+                final_clip,
+                final_output_path,
+                [videoClip],
+                audio_codec='aac',
+                **self.CG.write_kwargs(video_fps)
+            )
+        return final_output_path
+
+    def prepare_fan_out_source(self, video_path):
+        """Chuẩn bị video dùng chung cho nhiều audio, trả về đường dẫn cần dùng.
+
+        Video có codec ghi được vào mp4 được dùng nguyên (mọi output chỉ stream
+        copy luồng video); ngược lại video được encode một lần thành mp4 trong
+        ``temp_folder`` để các output sau chỉ còn phải mux.
+        """
+        info = probe_media(video_path)
+        if info["video_codec"] in MP4_COPY_CODECS:
+            return video_path
+        name = os.path.splitext(os.path.basename(video_path))[0]
+        output_path = os.path.join(self.CG.temp_folder, f"{name}_fanout.mp4")
+        audio_input = ["-i", video_path] if info["has_audio"] else None
+
+        def render():
+            logging.info(f"Encode '{video_path}' một lần để dùng chung cho nhiều audio.")
+            with self.CG.instr.stage("encode", path=output_path, method="fan_out_source"):
+                self.CG.encode_file(
+                    video_path, output_path, info["duration"], [], audio_input,
+                    ["-c:a", "aac", *self.CG.encode_profile.audio_args()],
+                )
+            return output_path
+
+        return self.CG.cached_render("fan_out_source", [video_path], {}, output_path, render)
+
+    def merge_fan_out(self, video_path, audio_paths, output_filenames=None):
+        """Ghép một video với nhiều audio, chi phí theo số video + số audio.
+
+        Video được chuẩn bị một lần (xem ``prepare_fan_out_source``); mỗi audio
+        sau đó chỉ tốn một lần encode audio và mux, luồng video không bị decode.
+        """
+        video_name = os.path.splitext(os.path.basename(video_path))[0]
+        output_filenames = output_filenames or [
+            f"{video_name}_{os.path.splitext(os.path.basename(a))[0]}.mp4" for a in audio_paths
+        ]
+        try:
+            source = self.prepare_fan_out_source(video_path)
+        except Exception as e:
+            logging.error(f"Không chuẩn bị được video '{video_path}': {e}")
+            return [None] * len(audio_paths)
+        return [
+            self.merge_with_audio_swap_at_start(source, audio_path, output_filename)
+            for audio_path, output_filename in zip(audio_paths, output_filenames)
+        ]
+
+    def stats(self):
+        """Ghi log các file đã tạo và thông lượng của batch gần nhất."""
+        logging.info(f"Tổng số video đã tạo: {len(self.created_files)}")
+        for path in self.created_files:
+            logging.info(f"- {path}")
+        clips = self.CG.clips.stats()
+        logging.info(
+            f"Reader đang mở: {clips['live']} ({clips['in_use']} đang dùng), "
+            f"đã mở {clips['opened']}, dùng lại {clips['reused']}, đã đóng {clips['closed']}"
+        )
+        if not self.job_results:
+            return None
+        for r in self.job_results:
+            status = "OK" if r.ok else f"LỖI ({r.error})"
+            logging.info(
+                f"[{status}] {os.path.basename(r.job.video_path)} + "
+                f"{os.path.basename(r.job.audio_path)}: {r.wall_time:.1f}s, "
+                f"CPU {r.cpu_time:.1f}s, {r.output_bytes / 1e6:.1f} MB"
+            )
+        summary = summarize_results(self.job_results, self.batch_wall_time)
+        logging.info(
+            f"Batch: {summary['succeeded']}/{summary['jobs']} job thành công "
+            f"trong {summary['wall_time']:.1f}s, "
+            f"{summary['jobs_per_minute']:.2f} job/phút, "
+            f"{summary['output_mb_per_second']:.2f} MB/s, "
+            f"tăng tốc song song x{summary['parallel_speedup']:.2f}"
+        )
+        return summary
+
+
+class VideoMerger(VideoProcessor):
+    """VideoProcessor có thêm chế độ chạy batch song song.
+
+    ``max_workers`` là số tiến trình chạy đồng thời, ``ffmpeg_threads`` là số
+    luồng encoder dành cho mỗi job. ``cost_model`` (CostModel) ước lượng thời
+    gian từng job để xếp job dài chạy trước và báo ETA; nó được hiệu chỉnh
+    qua mọi batch của instance.
+    """
+
+    def __init__(self, output_folder="output", max_workers=None, ffmpeg_threads=None,
+                 cost_model=None, **kwargs):
+        super().__init__(output_folder, **kwargs)
+        self.processor_kwargs = dict(kwargs, output_folder=output_folder)
+        self.max_workers = max_workers
+        self.ffmpeg_threads = ffmpeg_threads
+        self.cost_model = cost_model or CostModel()
+
+    def run_batch(self, jobs, on_result=None):
+        """Chạy danh sách MergeJob song song, job ước lượng lâu nhất trước; trả về list JobResult."""
+        batch = BatchMerger(self.processor_kwargs, self.max_workers, self.ffmpeg_threads)
+        planner = JobPlanner(self.cost_model, batch.max_workers)
+        order, estimates = planner.plan(jobs)
+        planned = planner.eta()
+        logging.info(
+            f"Chạy {len(jobs)} job với {batch.max_workers} worker, "
+            f"{batch.ffmpeg_threads} luồng ffmpeg mỗi job; "
+            f"tổng ước lượng {sum(e.cost for e in estimates):.0f}s, dự kiến xong sau {planned:.0f}s."
+        )
+
+        def record(result):
+            planner.observe(result)
+            if planner.remaining:
+                logging.info(
+                    f"Còn {len(planner.remaining)} job, dự kiến xong sau {planner.eta():.0f}s."
+                )
+            if on_result:
+                on_result(result)
+
+        planner.start()
+        results = batch.run(jobs, record, order)
+        logging.info(f"Batch chạy {batch.wall_time:.1f}s (dự kiến {planned:.1f}s).")
+        self.job_results.extend(results)
+        self.batch_wall_time += batch.wall_time
+        self.created_files.extend(r.output_path for r in results if r.ok)
+        return results
+
+    def _prepare_sources(self, jobs, lease):
+        """Chuẩn bị mỗi video một lần (fan-out) và trỏ các job vào nguồn đã chuẩn bị.
+
+        Nguồn đã chuẩn bị được giữ trong ``lease`` (``ScratchSpace.lease``) để
+        không bị dọn theo quota trước khi mọi job của batch dùng xong.
+        """
+        sources = {}
+        for job in jobs:
+            if job.video_path not in sources:
+                try:
+                    sources[job.video_path] = self.prepare_fan_out_source(job.video_path)
+                except Exception as e:
+                    # Để job tự báo lỗi cho video này.
+                    logging.error(f"Không chuẩn bị được video '{job.video_path}': {e}")
+                    sources[job.video_path] = job.video_path
+                lease.lease([sources[job.video_path]])
+            job.video_path = sources[job.video_path]
+        return jobs
+
+    def merge_cross_product(self, video_paths, audio_paths, on_result=None):
+        """Ghép mọi cặp (video, audio) song song.
+
+        Mỗi video được chuẩn bị đúng một lần trước khi chia job (fan-out),
+        các job sau đó chỉ encode audio và mux.
+        """
+        jobs = build_cross_product_jobs(video_paths, audio_paths)
+        with self.CG.scratch.lease(name="batch") as lease:
+            return self.run_batch(self._prepare_sources(jobs, lease), on_result)
+
+    def enqueue_cross_product(self, queue, video_paths, audio_paths):
+        """Thêm mọi cặp (video, audio) vào JobQueue; trả về số job mới.
+
+        Cấu hình encode là một phần của khóa job, nên đổi cấu hình sẽ tạo job mới.
+        """
+        jobs = build_cross_product_jobs(video_paths, audio_paths)
+        return queue.add(jobs, self.CG.encode_params())
+
+    def run_queue(self, queue, on_result=None, sleep=time.sleep):
+        """Chạy hết các job trong JobQueue, chạy tiếp được sau khi bị dừng.
+
+        Kết quả từng job được ghi ngay khi xong; job lỗi được chạy lại theo
+        backoff của hàng đợi. File ra của các lần chạy trước được đưa lại vào
+        ``created_files``.
+        """
+        recovered = queue.recover()
+        if recovered:
+            logging.info(f"Chạy lại {recovered} job bị dừng giữa chừng hoặc mất file ra.")
+        self.created_files.extend(queue.created_files())
+
+        def record(result):
+            status = queue.record(result)
+            if status == "pending":
+                logging.warning(f"Job '{result.job.output_filename}' sẽ được thử lại sau.")
+            if on_result:
+                on_result(result)
+
+        results = []
+        while True:
+            jobs = queue.claim()
+            if not jobs:
+                wait = queue.next_retry_in()
+                if wait is None:
+                    break
+                logging.info(f"Chờ {wait:.0f}s để thử lại các job lỗi.")
+                sleep(wait)
+                continue
+            with self.CG.scratch.lease(name="batch") as lease:
+                results.extend(self.run_batch(self._prepare_sources(jobs, lease), record))
+        # Job chạy lại sau khi mất file ra có thể xuất hiện hai lần.
+        self.created_files = list(dict.fromkeys(self.created_files))
+        counts = queue.counts()
+        logging.info(
+            f"Hàng đợi: {counts['done']} xong, {counts['failed']} thất bại, "
+            f"{counts['pending']} đang chờ."
+        )
+        return results
+
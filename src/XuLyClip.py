@@ -1,5 +1,13 @@
 import os
-from moviepy import concatenate_videoclips, VideoFileClip, AudioFileClip
+
+try:
+    from .LazyImport import lazy_callable
+except ImportError:
+    from LazyImport import lazy_callable
+
+concatenate_videoclips = lazy_callable("moviepy", "concatenate_videoclips")
+VideoFileClip = lazy_callable("moviepy", "VideoFileClip")
+AudioFileClip = lazy_callable("moviepy", "AudioFileClip")
 
 class ClipProccess:
     def __init__(
@@ -0,0 +1,228 @@
+"""Dòng lệnh cho các thao tác ghép/cắt video.
+
+Ví dụ::
+
+    python src/cli.py probe video1.mp4 --keyframes
+    python src/cli.py merge a.mp4 b.mp4 c.mp4 -o out.mp4
+    python src/cli.py split video.mp4 10 25.5 --snap 1.0
+    python src/cli.py swap-audio video.mp4 song.mp3 -o swapped.mp4
+    python src/cli.py batch videos1 videos2 -O output_videos
+    python src/cli.py preview output_videos/*.mp4 --sprite --count 16 -O previews
+
+Các module xử lý (và moviepy) chỉ được import trong lệnh cần tới chúng,
+nên ``--help`` và ``probe`` khởi động nhanh.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov")
+AUDIO_EXTENSIONS = VIDEO_EXTENSIONS + (".mp3", ".wav", ".aac", ".m4a")
+
+
+def _import(name):
+    # Chạy được cả khi là ``src.cli`` lẫn ``python src/cli.py``.
+    if __package__:
+        return __import__(f"{__package__}.{name}", fromlist=[name])
+    return __import__(name)
+
+
+def _resolution(text):
+    try:
+        width, height = (int(v) for v in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"độ phân giải phải có dạng RỘNGxCAO: {text}")
+    return (width, height)
+
+
+def _processor_kwargs(args):
+    kwargs = {
+        "target_resolution": args.resolution,
+        "target_fps": args.fps,
+        "temp_folder": args.temp_folder,
+        "encode_profile": args.profile,
+        "segment_workers": args.segment_workers,
+    }
+    if args.scratch_quota is not None or args.tmpfs:
+        kwargs["scratch"] = _import("ScratchSpace").ScratchSpace(
+            args.temp_folder or "temp",
+            quota_bytes=None if args.scratch_quota is None else int(args.scratch_quota * 1024**2),
+            tmpfs_root=args.tmpfs,
+        )
+    if args.cache:
+        kwargs["result_cache"] = _import("ResultCache").ResultCache(args.cache)
+    return kwargs
+
+
+def _list_media(folder, extensions):
+    return [
+        os.path.join(folder, f) for f in sorted(os.listdir(folder))
+        if f.lower().endswith(extensions)
+    ]
+
+
+def cmd_probe(args):
+    MediaProbe = _import("MediaProbe")
+    for path in args.paths:
+        info = dict(MediaProbe.probe_media(path), path=path)
+        if args.keyframes:
+            info["keyframes"] = MediaProbe.get_keyframes(path)
+        print(json.dumps(info, ensure_ascii=False))
+    return 0
+
+
+def cmd_merge(args):
+    CG = _import("CatGhepCoBan").CatGhepCoBan(**_processor_kwargs(args))
+    output = CG.merge_many(args.paths, args.output, args.mode)
+    if not output:
+        return 1
+    print(output)
+    return 0
+
+
+def cmd_split(args):
+    CG = _import("CatGhepCoBan").CatGhepCoBan(**_processor_kwargs(args))
+    outputs = CG.split_video_at_times(args.video, args.times, mode=args.mode, snap_to_silence=args.snap)
+    if not outputs:
+        return 1
+    print("\n".join(outputs))
+    return 0
+
+
+def cmd_swap_audio(args):
+    processor = _import("VideoMerger").VideoProcessor(
+        args.output_folder, silence_snap=args.snap, **_processor_kwargs(args)
+    )
+    output = processor.merge_with_audio_swap_at_start(args.video, args.audio, args.output)
+    if not output:
+        return 1
+    print(output)
+    return 0
+
+
+def cmd_batch(args):
+    merger = _import("VideoMerger").VideoMerger(
+        args.output_folder, max_workers=args.workers, ffmpeg_threads=args.ffmpeg_threads,
+        **_processor_kwargs(args),
+    )
+    videos = _list_media(args.video_folder, VIDEO_EXTENSIONS)
+    audios = _list_media(args.audio_folder, AUDIO_EXTENSIONS)
+    logging.info(f"Tìm thấy {len(videos)} video chính và {len(audios)} video audio.")
+    queue = _import("JobQueue").JobQueue(os.path.join(args.output_folder, "jobs.sqlite"))
+    try:
+        added = merger.enqueue_cross_product(queue, videos, audios)
+        logging.info(f"Thêm {added} job mới vào hàng đợi.")
+        merger.run_queue(queue)
+        failed = queue.counts()["failed"]
+    finally:
+        queue.close()
+    merger.stats()
+    return 1 if failed else 0
+
+
+def cmd_preview(args):
+    generator = _import("Preview").PreviewGenerator(
+        args.temp_folder, width=args.width, workers=args.workers
+    )
+    if args.sprite:
+        outputs = generator.sprite_sheets(
+            args.paths, args.count, args.columns, args.output_folder, args.format
+        )
+        print("\n".join(outputs.values()))
+    else:
+        outputs = generator.thumbnails_many(args.paths, args.count, args.output_folder, args.format)
+        print("\n".join(path for paths in outputs.values() for path in paths))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="tudongghep", description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="log chi tiết (DEBUG)")
+    sub = parser.add_subparsers(dest="command", metavar="LỆNH")
+    sub.required = True
+
+    render = argparse.ArgumentParser(add_help=False)
+    render.add_argument("--resolution", type=_resolution, default=(720, 1280),
+                        help="độ phân giải đích RỘNGxCAO (mặc định 720x1280)")
+    render.add_argument("--fps", type=float, default=30)
+    render.add_argument("--profile", default=None, help="encode profile: fast-draft | balanced | archive")
+    render.add_argument("--temp-folder", default=None)
+    render.add_argument("--segment-workers", type=int, default=None,
+                        help="số encoder song song cho mỗi file ra dài")
+    render.add_argument("--cache", default=None, help="thư mục cache kết quả đã render")
+    render.add_argument("--scratch-quota", type=float, default=None,
+                        help="giới hạn (MB) file tạm dùng chung, xóa file dùng lâu nhất trước")
+    render.add_argument("--tmpfs", default=None,
+                        help="RAM disk (ví dụ /dev/shm) cho các file tạm nhỏ")
+
+    p = sub.add_parser("probe", help="in thông số media dạng JSON")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("--keyframes", action="store_true", help="kèm danh sách keyframe")
+    p.set_defaults(func=cmd_probe)
+
+    p = sub.add_parser("merge", parents=[render], help="nối nhiều video")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-o", "--output", default=None)
+    p.add_argument("--mode", default="auto", choices=["auto", "copy", "normalize", "reencode"])
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("split", parents=[render], help="cắt video tại các mốc thời gian (giây)")
+    p.add_argument("video")
+    p.add_argument("times", nargs="+", type=float)
+    p.add_argument("--mode", default="smart", choices=["smart", "reencode"])
+    p.add_argument("--snap", type=float, default=None,
+                   help="dời điểm cắt tối đa SNAP giây tới khoảng lặng gần nhất")
+    p.set_defaults(func=cmd_split)
+
+    p = sub.add_parser("swap-audio", parents=[render], help="thay audio ở đầu video")
+    p.add_argument("video")
+    p.add_argument("audio")
+    p.add_argument("-o", "--output", default=None, help="tên file ra trong thư mục output")
+    p.add_argument("-O", "--output-folder", default="output")
+    p.add_argument("--snap", type=float, default=None,
+                   help="lùi điểm phát lại audio gốc tối đa SNAP giây tới khoảng lặng")
+    p.set_defaults(func=cmd_swap_audio)
+
+    p = sub.add_parser("batch", parents=[render], help="ghép mọi cặp video × audio qua hàng đợi")
+    p.add_argument("video_folder")
+    p.add_argument("audio_folder")
+    p.add_argument("-O", "--output-folder", default="output_videos")
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--ffmpeg-threads", type=int, default=None)
+    p.set_defaults(func=cmd_batch)
+
+    p = sub.add_parser("preview", help="xuất thumbnail hoặc sprite sheet xem trước")
+    p.add_argument("paths", nargs="+")
+    p.add_argument("-O", "--output-folder", default="previews")
+    p.add_argument("--count", type=int, default=10, help="số ảnh mỗi video")
+    p.add_argument("--sprite", action="store_true", help="ghép các ảnh thành một sprite sheet")
+    p.add_argument("--columns", type=int, default=4, help="số cột của sprite sheet")
+    p.add_argument("--width", type=int, default=320, help="chiều rộng mỗi ảnh")
+    p.add_argument("--format", default="jpg", choices=["jpg", "webp", "png"])
+    p.add_argument("--workers", type=int, default=None)
+    p.add_argument("--temp-folder", default=None)
+    p.set_defaults(func=cmd_preview)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    try:
+        return args.func(args)
+    except (IOError, ValueError) as e:
+        logging.error(str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
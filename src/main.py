@@ -1,6 +1,10 @@
 import os
 import logging
 from VideoMerger import VideoMerger 
+from ResultCache import ResultCache
+from Instrumentation import Instrumentation, JsonLinesSink
+from JobQueue import JobQueue
+from ScratchSpace import ScratchSpace
 
 def setup_logging():
     """Cấu hình hệ thống logging cơ bản."""
@@ -19,7 +23,20 @@ def main():
         "target_resolution": (720, 1280),
         "target_fps": 30,
         "video_codec": "libx264",
-        "temp_folder": "temp_files"
+        # Thư mục tạm: mỗi job một thư mục con, file chung giới hạn 10 GB (xóa
+        # file dùng lâu nhất trước), intermediate nhỏ đặt trên RAM disk nếu có.
+        "scratch": ScratchSpace(
+            "temp_files", quota_bytes=10 * 1024**3, tmpfs_root="/dev/shm"
+        ),
+        "max_workers": None,     # None = số CPU / ffmpeg_threads
+        "ffmpeg_threads": 2,     # số luồng encoder cho mỗi job
+        "encode_profile": "balanced",  # fast-draft | balanced | archive
+        # Thời gian từng stage (probe/open/decode/transform/encode/mux) của mọi job.
+        "instrumentation": Instrumentation([JsonLinesSink("profile_events.jsonl")]),
+        # Kết quả đã render được dùng lại khi input và tham số không đổi.
+        "result_cache": ResultCache(
+            "output_cache", max_bytes=20 * 1024**3, max_age=30 * 24 * 3600
+        ),
     }
 
     # Các thư mục chứa video
@@ -41,12 +58,16 @@ def main():
 
     logging.info(f"Tìm thấy {len(video_files)} video chính và {len(audio_files)} video audio.")
     
-    for video_file in video_files:  
-        for audio_file in audio_files:
-            video_path = os.path.join(video_folder, video_file)
-            audio_path = os.path.join(audio_folder, audio_file)
-            
-            merger.merge_with_audio_swap_at_start(audio_path, video_path)
+    # Hàng đợi lưu trong thư mục output: chạy lại main sẽ tiếp tục job còn dở.
+    queue = JobQueue(os.path.join(output_folder, "jobs.sqlite"))
+    added = merger.enqueue_cross_product(
+        queue,
+        [os.path.join(video_folder, f) for f in video_files],
+        [os.path.join(audio_folder, f) for f in audio_files],
+    )
+    logging.info(f"Thêm {added} job mới vào hàng đợi.")
+    merger.run_queue(queue)
+    queue.close()
 
     merger.stats()
 
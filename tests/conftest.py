@@ -0,0 +1,20 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+
+# Test (kể cả tiến trình con chạy cli/benchmark) không ghi vào cache probe
+# thật trong ~/.cache: chuỗi rỗng là chỉ cache trong bộ nhớ.
+os.environ["TUDONGGHEP_PROBE_CACHE"] = ""
+
+from src import MediaProbe
+
+@pytest.fixture(autouse=True)
+def probe_cache(monkeypatch):
+    """Mỗi test một ProbeCache trong bộ nhớ, không dùng lại kết quả của test khác."""
+    cache = MediaProbe.ProbeCache(None)
+    monkeypatch.setattr(MediaProbe, "_default_cache", cache)
+    # Module cũng có thể được import không qua package (``from MediaProbe import``).
+    if "MediaProbe" in sys.modules:
+        monkeypatch.setattr(sys.modules["MediaProbe"], "_default_cache", cache)
+    return cache
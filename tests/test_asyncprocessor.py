@@ -0,0 +1,118 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import time
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from src.AsyncProcessor import AsyncVideoProcessor, run_ffmpeg_async
+from src.FFmpegTools import run_ffmpeg
+
+def fake_ffmpeg(script):
+    """ffmpeg_command giả: chạy ``script`` bằng python thay cho ffmpeg."""
+    return patch("src.AsyncProcessor.ffmpeg_command", return_value=[sys.executable, "-c", script])
+
+PROGRESS = (
+    "print('out_time_us=1000000'); print('speed=2.0x'); print('progress=continue');"
+    "print('out_time_us=2000000'); print('progress=end')"
+)
+
+def test_run_ffmpeg_async_reports_progress():
+    events = []
+    with fake_ffmpeg(PROGRESS):
+        asyncio.run(run_ffmpeg_async(["-i", "in.mp4", "out.mp4"], events.append, duration=4))
+    assert [e["fraction"] for e in events] == [0.25, 1.0]
+    assert events[0]["speed"] == 2.0 and events[0]["path"] == "out.mp4"
+    assert events[-1]["done"]
+
+def test_run_ffmpeg_async_raises_on_error():
+    with fake_ffmpeg("import sys; sys.stderr.write('bad input'); sys.exit(1)"):
+        with pytest.raises(IOError, match="bad input"):
+            asyncio.run(run_ffmpeg_async(["out.mp4"]))
+
+def test_cancel_kills_ffmpeg(tmp_path):
+    pid_file = tmp_path / "pid"
+    script = f"import os, time; open({str(pid_file)!r}, 'w').write(str(os.getpid())); time.sleep(30)"
+
+    async def main():
+        task = asyncio.ensure_future(run_ffmpeg_async(["out.mp4"]))
+        while not pid_file.exists() or not pid_file.read_text():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.monotonic()
+    with fake_ffmpeg(script):
+        asyncio.run(main())
+    assert time.monotonic() - start < 10
+    with pytest.raises(ProcessLookupError):
+        os.kill(int(pid_file.read_text()), 0)
+
+def test_job_runs_ffmpeg_on_loop_and_streams_progress():
+    processor = MagicMock()
+    processor.merge_with_audio_swap_at_start.side_effect = (
+        lambda video, audio, name: run_ffmpeg(["-i", video, "-t", "2", name]) or name
+    )
+
+    async def main():
+        async_processor = AsyncVideoProcessor(processor)
+        job = async_processor.merge_with_audio_swap_at_start_async("v.mp4", "a.mp3", "out.mp4")
+        events = [e async for e in job.progress()]
+        result = await job
+        async_processor.close()
+        return events, result
+
+    with fake_ffmpeg(PROGRESS):
+        events, result = asyncio.run(main())
+    assert result == "out.mp4"
+    assert [e["fraction"] for e in events] == [0.5, 1.0]
+
+def test_cancel_job_stops_worker_and_ffmpeg():
+    processor = MagicMock()
+    finished = threading.Event()
+
+    def render(video, audio, name):
+        try:
+            run_ffmpeg(["out.mp4"])
+        finally:
+            finished.set()
+    processor.merge_with_audio_swap_at_start.side_effect = render
+
+    async def main():
+        async_processor = AsyncVideoProcessor(processor)
+        job = async_processor.merge_with_audio_swap_at_start_async("v.mp4", "a.mp3")
+        await asyncio.sleep(0.3)
+        job.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await job
+        # Job chỉ kết thúc khi worker đã dừng hẳn.
+        assert finished.is_set()
+        async_processor.close()
+
+    with fake_ffmpeg("import time; time.sleep(30)"):
+        asyncio.run(asyncio.wait_for(main(), 10))
+
+def test_semaphore_limits_concurrency():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def work(i):
+        with lock:
+            running.append(i)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(i)
+        return i
+
+    async def main():
+        async_processor = AsyncVideoProcessor(MagicMock(), max_concurrency=2)
+        results = await asyncio.gather(*(async_processor.submit(work, i) for i in range(6)))
+        async_processor.close()
+        return results
+
+    assert asyncio.run(main()) == list(range(6))
+    assert max(peak) == 2
@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from unittest.mock import patch
+from src.AudioAnalysis import (
+    rms_db, compute_envelope, find_silences, nearest_silence, average_loudness, FLOOR_DB,
+)
+
+def test_rms_db_per_window():
+    full_scale = np.full(100, 32767, dtype=np.int16)
+    silent = np.zeros(100, dtype=np.int16)
+    db = rms_db(np.concatenate([full_scale, silent, full_scale[:50]]), 100)
+    assert len(db) == 3
+    assert db[0] == pytest.approx(0.0, abs=0.01)
+    assert db[1] == FLOOR_DB
+    # Cửa sổ lẻ cuối vẫn được tính.
+    assert db[2] == pytest.approx(0.0, abs=0.01)
+
+class FakeReader:
+    def __init__(self, path, duration, block_frames, sample_rate, channels):
+        assert channels == 1
+        loud = np.full(sample_rate, 16384, dtype=np.int16)
+        signal = np.concatenate([loud, np.zeros(sample_rate, dtype=np.int16), loud])
+        self.blocks = [
+            signal[i:i + block_frames].reshape(-1, 1) for i in range(0, len(signal), block_frames)
+        ]
+
+    def read_block(self):
+        return self.blocks.pop(0) if self.blocks else np.zeros((0, 1), dtype=np.int16)
+
+    def close(self):
+        return 0, ""
+
+def test_compute_envelope_streams_blocks():
+    with patch("src.AudioAnalysis.PcmReader", FakeReader):
+        envelope = compute_envelope("a.mp3", window=0.1, sample_rate=1000, block_windows=7)
+    assert len(envelope) == 30
+    assert find_silences(envelope, 0.1) == [(pytest.approx(1.0), pytest.approx(2.0))]
+    assert average_loudness(envelope) < -6.0
+
+def test_find_silences_ignores_short_gaps():
+    envelope = np.array([-10, -60, -10, -60, -60, -60, -60, -60, -10], dtype=np.float32)
+    assert find_silences(envelope, window=0.1, min_duration=0.25) == [
+        (pytest.approx(0.3), pytest.approx(0.8))
+    ]
+    assert find_silences(np.full(5, -10.0)) == []
+
+@patch("src.AudioAnalysis.load_envelope")
+def test_nearest_silence(mock_envelope):
+    # Im lặng ở [2, 3) và [6, 7).
+    envelope = np.full(200, -10.0, dtype=np.float32)
+    envelope[40:60] = -80
+    envelope[120:140] = -80
+    mock_envelope.return_value = envelope
+    assert nearest_silence("a.mp3", 3.5, max_shift=1.0, threshold_db=-40, min_duration=0.5) == 2.5
+    assert nearest_silence("a.mp3", 2.2, max_shift=1.0, min_duration=0.5) == 2.2
+    assert nearest_silence("a.mp3", 4.5, max_shift=1.0, min_duration=0.5) == 4.5
+    assert nearest_silence("a.mp3", 3.5, max_shift=5.0, forward_only=True, min_duration=0.5) == 6.5
@@ -0,0 +1,70 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from unittest.mock import patch, MagicMock
+from src.AudioMixer import mix_tracks, audio_codec_for, _Limiter
+
+class FakeReader:
+    def __init__(self, blocks):
+        self.blocks = [np.asarray(b, dtype=np.int16) for b in blocks]
+        self.path = "fake"
+        self.finished = False
+
+    def read_block(self):
+        if not self.blocks:
+            self.finished = True
+            return np.zeros((0, 2), dtype=np.int16)
+        return self.blocks.pop(0)
+
+    def close(self):
+        return 0, ""
+
+def _run_mix(readers, **kwargs):
+    written = bytearray()
+    encoder = MagicMock()
+    encoder.stdin.write.side_effect = lambda data: written.extend(bytes(data))
+    encoder.stderr.read.return_value = b""
+    encoder.wait.return_value = 0
+    encoder.poll.return_value = 0
+    with patch("src.AudioMixer.PcmReader", side_effect=readers), \
+         patch("src.AudioMixer.subprocess.Popen", return_value=encoder) as mock_popen:
+        mix_tracks(["a", "b"][: len(readers)], "out.mp3", **kwargs)
+    return np.frombuffer(bytes(written), dtype=np.int16).reshape(-1, 2), mock_popen
+
+def test_mix_sums_with_gains_and_pads_shorter_track():
+    r1 = FakeReader([[[100, 100]] * 4, [[100, 100]] * 2])
+    r2 = FakeReader([[[1000, -1000]] * 4])
+    out, _ = _run_mix([r1, r2], gains=[1.0, 0.5])
+    assert out.shape == (6, 2)
+    assert out[0].tolist() == [600, -400]
+    assert out[5].tolist() == [100, 100]
+
+def test_mix_never_clips():
+    loud = [[[30000, -30000]] * 8]
+    out, _ = _run_mix([FakeReader(loud), FakeReader(loud)])
+    assert np.abs(out.astype(np.int32)).max() <= 32768
+
+def test_mix_video_keeps_video_stream():
+    _, mock_popen = _run_mix([FakeReader([])], video_path="v.mp4", audio_codec="aac")
+    cmd = mock_popen.call_args[0][0]
+    assert cmd[cmd.index("-c:v") + 1] == "copy"
+    assert cmd[cmd.index("-c:a") + 1] == "aac"
+
+def test_mix_rejects_gain_count_mismatch():
+    with pytest.raises(ValueError):
+        mix_tracks(["a", "b"], "out.mp3", gains=[1.0])
+
+def test_limiter_recovers_gain():
+    limiter = _Limiter()
+    block = np.full((4, 2), 65534.0, dtype=np.float32)
+    limiter.process(block)
+    assert limiter.gain == pytest.approx(0.5, rel=1e-3)
+    quiet = np.full((4, 2), 100.0, dtype=np.float32)
+    limiter.process(quiet)
+    assert limiter.gain > 0.5
+
+def test_audio_codec_for():
+    assert audio_codec_for("x.mp3") == "libmp3lame"
+    assert audio_codec_for("x.MP4") == "aac"
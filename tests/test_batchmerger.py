@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch, MagicMock
+from src import BatchMerger as bm
+from src.BatchMerger import BatchMerger, MergeJob, JobResult, build_cross_product_jobs, summarize_results
+
+def test_build_cross_product_jobs_unique_names():
+    jobs = build_cross_product_jobs(["v/a.mp4", "v/b.mp4"], ["x/s1.mp3", "x/s2.wav"])
+    assert len(jobs) == 4
+    names = [j.output_filename for j in jobs]
+    assert names == ["a_s1.mp4", "a_s2.mp4", "b_s1.mp4", "b_s2.mp4"]
+    assert jobs[1].video_path == "v/a.mp4" and jobs[1].audio_path == "x/s2.wav"
+
+def test_thread_budget_defaults():
+    with patch("src.BatchMerger.os.cpu_count", return_value=8):
+        b = BatchMerger()
+        assert (b.max_workers, b.ffmpeg_threads) == (4, 2)
+        b = BatchMerger(max_workers=2)
+        assert (b.max_workers, b.ffmpeg_threads) == (2, 4)
+        b = BatchMerger(ffmpeg_threads=1)
+        assert (b.max_workers, b.ffmpeg_threads) == (8, 1)
+    assert b.processor_kwargs["threads"] == 1
+
+def test_run_inline_survives_failures(tmp_path):
+    out = tmp_path / "ok.mp4"
+    out.write_bytes(b"x" * 10)
+    processor = MagicMock()
+    processor.merge_with_audio_swap_at_start.side_effect = [str(out), None, RuntimeError("boom")]
+    jobs = [MergeJob("a.mp4", "1.mp3", "a_1.mp4"), MergeJob("b.mp4", "1.mp3"), MergeJob("c.mp4", "1.mp3")]
+    seen = []
+    with patch("src.BatchMerger._init_worker"), patch.object(bm, "_worker_processor", processor):
+        results = BatchMerger(max_workers=1).run(jobs, on_result=seen.append)
+    assert [r.ok for r in results] == [True, False, False]
+    assert results[0].output_bytes == 10
+    assert "RuntimeError: boom" in results[2].error
+    assert len(seen) == 3
+
+def test_run_follows_order_but_returns_input_order():
+    processor = MagicMock()
+    processor.merge_with_audio_swap_at_start.side_effect = lambda video, audio, name: None
+    jobs = [MergeJob("a.mp4", "1.mp3"), MergeJob("b.mp4", "1.mp3"), MergeJob("c.mp4", "1.mp3")]
+    with patch("src.BatchMerger._init_worker"), patch.object(bm, "_worker_processor", processor):
+        results = BatchMerger(max_workers=1).run(jobs, order=[2, 0, 1])
+    started = [c.args[0] for c in processor.merge_with_audio_swap_at_start.call_args_list]
+    assert started == ["c.mp4", "a.mp4", "b.mp4"]
+    assert [r.job.video_path for r in results] == ["a.mp4", "b.mp4", "c.mp4"]
+
+def test_summarize_results():
+    job = MergeJob("a.mp4", "b.mp3")
+    results = [
+        JobResult(job, output_path="o.mp4", wall_time=4.0, cpu_time=6.0, output_bytes=2_000_000),
+        JobResult(job, error="fail", wall_time=2.0),
+    ]
+    summary = summarize_results(results, wall_time=3.0)
+    assert summary["succeeded"] == 1 and summary["failed"] == 1
+    assert summary["jobs_per_minute"] == pytest.approx(20.0)
+    assert summary["parallel_speedup"] == pytest.approx(2.0)
+    assert summary["output_mb_per_second"] == pytest.approx(2 / 3)
@@ -0,0 +1,39 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from benchmarks.run_benchmarks import compare_results, format_table, list_cases, measure_command
+
+def test_list_cases_skips_audio_fixtures():
+    fixtures = {"video1": {}, "lavfi_360p_5s": {}, "audio_short": {}}
+    cases = list_cases(fixtures, ["merge", "split"])
+    assert cases == [
+        "merge/video1", "merge/lavfi_360p_5s", "split/video1", "split/lavfi_360p_5s"
+    ]
+
+def test_compare_results_flags_regressions():
+    baseline = {
+        "merge/video1": {"wall_time": 1.0, "cpu_time": 1.0, "peak_rss_mb": 100.0},
+        "split/video1": {"wall_time": 2.0, "cpu_time": 2.0, "peak_rss_mb": 100.0},
+        "split/video2": {"error": "boom"},
+    }
+    results = {
+        "merge/video1": {"wall_time": 1.5, "cpu_time": 1.0, "peak_rss_mb": 100.0},
+        "split/video1": {"wall_time": 2.1, "cpu_time": 2.0, "peak_rss_mb": 100.0},
+        "split/video2": {"wall_time": 1.0, "cpu_time": 1.0, "peak_rss_mb": 50.0},
+    }
+    comparison = compare_results(results, baseline, threshold=1.2)
+    assert comparison["merge/video1"]["regression"]
+    assert comparison["merge/video1"]["wall_time_ratio"] == 1.5
+    assert not comparison["split/video1"]["regression"]
+    assert "split/video2" not in comparison
+
+def test_measure_command_reports_median_wall_and_cpu():
+    result = measure_command([sys.executable, "-c", "pass"], repeat=3)
+    assert result["runs"] == 3
+    assert 0 < result["wall_time"] < 10
+    assert result["peak_rss_mb"] is None
+    assert "error" in measure_command([sys.executable, "-c", "raise SystemExit(3)"], repeat=1)
+
+def test_format_table_without_rss():
+    table = format_table({"startup/help": {"wall_time": 0.2, "cpu_time": 0.1, "peak_rss_mb": None}})
+    assert "startup/help" in table.splitlines()[1]
@@ -0,0 +1,35 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import json
+import subprocess
+import pytest
+from unittest.mock import patch
+from src.cli import build_parser, main
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def test_library_import_does_not_load_moviepy():
+    code = "import sys, src.VideoMerger, src.AsyncProcessor; print('moviepy' in sys.modules)"
+    proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == "False"
+
+def test_parser_subcommands():
+    args = build_parser().parse_args(["split", "v.mp4", "10", "25.5", "--snap", "1"])
+    assert args.times == [10.0, 25.5] and args.snap == 1.0
+    args = build_parser().parse_args(["merge", "a.mp4", "b.mp4", "--resolution", "1280x720"])
+    assert args.resolution == (1280, 720) and args.mode == "auto"
+    with pytest.raises(SystemExit):
+        build_parser().parse_args(["merge", "a.mp4", "--resolution", "720p"])
+
+@patch("src.MediaProbe.get_keyframes", return_value=[0.0, 2.0])
+@patch("src.MediaProbe.probe_media", return_value={"duration": 4.0})
+def test_probe_prints_json(mock_probe, mock_keyframes, capsys):
+    assert main(["probe", "a.mp4", "--keyframes"]) == 0
+    info = json.loads(capsys.readouterr().out)
+    assert info == {"duration": 4.0, "path": "a.mp4", "keyframes": [0.0, 2.0]}
+
+@patch("src.CatGhepCoBan.CatGhepCoBan.merge_many", side_effect=IOError("hỏng"))
+def test_render_error_returns_nonzero(mock_merge, tmp_path):
+    assert main(["merge", "a.mp4", "b.mp4", "--temp-folder", str(tmp_path)]) == 1
@@ -0,0 +1,58 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pickle
+import pytest
+from unittest.mock import MagicMock
+from src.ClipPool import ClipPool
+
+def test_session_reuses_idle_reader_for_same_source():
+    factory = MagicMock(side_effect=lambda path: MagicMock(name=path))
+    pool = ClipPool(max_idle=1)
+    with pool.session() as s:
+        first = s.open(factory, "a.mp4")
+        assert pool.stats()["in_use"] == 1
+    with pool.session() as s:
+        assert s.open(factory, "a.mp4") is first
+        s.open(factory, "b.mp4")
+    assert factory.call_count == 2
+    # Chỉ giữ lại max_idle clip rảnh, clip cũ nhất bị đóng.
+    assert pool.live_readers() == 1
+    first.close.assert_called_once()
+    assert pool.stats()["reused"] == 1
+
+def test_session_closes_clips_on_exception():
+    clip = MagicMock()
+    pool = ClipPool()
+    with pytest.raises(IOError):
+        with pool.session() as s:
+            s.open(MagicMock(return_value=clip), "a.mp4")
+            raise IOError("ghi lỗi")
+    clip.close.assert_called_once()
+    assert pool.live_readers() == 0
+
+def test_close_all_and_pickle():
+    clip = MagicMock()
+    pool = ClipPool(max_idle=3)
+    with pool.session() as s:
+        s.open(MagicMock(return_value=clip), "a.mp4")
+    assert pool.live_readers() == 1
+    copy = pickle.loads(pickle.dumps(pool))
+    assert copy.max_idle == 3 and copy.live_readers() == 0
+    pool.close_all()
+    clip.close.assert_called_once()
+    assert pool.live_readers() == 0
+
+def test_overlapping_sessions_get_separate_readers():
+    factory = MagicMock(side_effect=lambda path: MagicMock(name=path))
+    pool = ClipPool(max_idle=2)
+    with pool.session() as s1:
+        first = s1.open(factory, "a.mp4")
+        with pool.session() as s2:
+            second = s2.open(factory, "a.mp4")
+            assert second is not first
+            assert pool.stats()["in_use"] == 2 and pool.stats()["reused"] == 0
+    # Cả hai rảnh thì được dùng lại, mỗi clip cho một session.
+    with pool.session() as s1, pool.session() as s2:
+        assert {s1.open(factory, "a.mp4"), s2.open(factory, "a.mp4")} == {first, second}
+    assert factory.call_count == 2 and pool.stats()["reused"] == 2
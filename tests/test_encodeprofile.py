@@ -0,0 +1,24 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from src.EncodeProfile import EncodeProfile, get_encode_profile
+
+def test_named_profiles():
+    assert get_encode_profile().name == "balanced"
+    draft = get_encode_profile("fast-draft")
+    assert draft.video_args("libx264") == [
+        "-preset", "ultrafast", "-crf", "28", "-pix_fmt", "yuv420p"
+    ]
+    assert draft.audio_args() == ["-b:a", "96k"]
+    with pytest.raises(ValueError):
+        get_encode_profile("nope")
+
+def test_threads_override_and_codec_specific_args():
+    profile = EncodeProfile("custom", preset="fast", crf=30).with_threads(4)
+    assert get_encode_profile(profile) is profile
+    assert profile.video_args("mpeg4") == ["-pix_fmt", "yuv420p", "-threads", "4"]
+    assert profile.video_args("libvpx-vp9")[:4] == ["-crf", "30", "-b:v", "0"]
+    kwargs = profile.moviepy_kwargs("libx264")
+    assert (kwargs["preset"], kwargs["threads"]) == ("fast", 4)
+    assert "preset" not in profile.moviepy_kwargs("mpeg4")
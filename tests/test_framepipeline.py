@@ -0,0 +1,123 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import numpy as np
+import pytest
+from unittest.mock import patch
+from src.FramePipeline import run_frame_pipeline, Overlay, Fade, chain
+
+class FakeReader:
+    """Trả về ``count`` frame, frame thứ i có mọi giá trị bằng i."""
+    count = 10
+    buffers = set()
+
+    def __init__(self, path, width, height, fps=None, duration=None):
+        self.index = 0
+
+    def read_into(self, frame):
+        FakeReader.buffers.add(frame.__array_interface__["data"][0])
+        if self.index >= self.count:
+            return False
+        frame.fill(self.index)
+        self.index += 1
+        return True
+
+    def kill(self):
+        pass
+
+    def close(self):
+        return 0, ""
+
+class FakeWriter:
+    written = []
+    fail_after = None
+
+    def __init__(self, *args):
+        FakeWriter.written = []
+        self.aborted = False
+
+    def write(self, frame):
+        if self.fail_after is not None and len(self.written) >= self.fail_after:
+            raise BrokenPipeError()
+        FakeWriter.written.append(frame.copy())
+
+    def close(self):
+        pass
+
+    def kill(self):
+        pass
+
+    def abort(self):
+        self.aborted = True
+        return "encoder chết"
+
+@pytest.fixture
+def fake_pipes():
+    FakeReader.buffers = set()
+    FakeWriter.fail_after = None
+    with patch("src.FramePipeline.FrameReader", FakeReader), \
+            patch("src.FramePipeline.FrameWriter", FakeWriter):
+        yield
+
+def test_pipeline_transforms_in_order_with_reused_buffers(fake_pipes):
+    times = []
+
+    def transform(frame, t):
+        times.append(t)
+        frame += 1
+
+    frames = run_frame_pipeline("in.mp4", "out.mp4", transform, 4, 2, 10, [], ring_size=3)
+    assert frames == 10
+    assert [int(f[0, 0, 0]) for f in FakeWriter.written] == list(range(1, 11))
+    assert times == pytest.approx([i / 10 for i in range(10)])
+    # Chỉ ``ring_size`` buffer được dùng cho mọi frame.
+    assert len(FakeReader.buffers) <= 3
+
+def test_pipeline_propagates_transform_error(fake_pipes):
+    def transform(frame, t):
+        if t >= 0.5:
+            raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        run_frame_pipeline("in.mp4", "out.mp4", transform, 4, 2, 10, [])
+
+def test_pipeline_reports_encoder_failure(fake_pipes):
+    FakeWriter.fail_after = 3
+    with pytest.raises(IOError, match="encoder chết"):
+        run_frame_pipeline("in.mp4", "out.mp4", lambda f, t: None, 4, 2, 10, [])
+
+def test_overlay_blends_in_place_and_clips_at_border():
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    image = np.full((2, 3, 4), 200, dtype=np.uint8)
+    image[..., 3] = 255
+    Overlay(image, x=2, y=1, opacity=0.5)(frame, 0.0)
+    assert frame[1, 2].tolist() == [100, 100, 100]
+    assert frame[2, 3].tolist() == [100, 100, 100]
+    assert frame[0].sum() == 0 and frame[:, :2].sum() == 0
+    # Ngoài khoảng [start, end) thì không đổi.
+    untouched = np.zeros((4, 4, 3), dtype=np.uint8)
+    Overlay(image, start=1.0)(untouched, 0.5)
+    assert untouched.sum() == 0
+
+def test_overlay_partly_off_frame():
+    image = np.full((2, 3, 3), 200, dtype=np.uint8)
+    frame = np.zeros((4, 4, 3), dtype=np.uint8)
+    # Góc trên trái ngoài frame: chỉ cột/hàng cuối của ảnh nằm trong frame.
+    Overlay(image, x=-2, y=-1)(frame, 0.0)
+    assert frame[0, 0].tolist() == [200, 200, 200]
+    assert frame.sum() == 200 * 3
+    frame.fill(0)
+    Overlay(image, x=3, y=3)(frame, 0.0)
+    assert frame[3, 3].tolist() == [200, 200, 200] and frame.sum() == 200 * 3
+    frame.fill(0)
+    Overlay(image, x=-5, y=0)(frame, 0.0)
+    Overlay(image, x=0, y=9)(frame, 0.0)
+    assert frame.sum() == 0
+
+def test_fade_and_chain():
+    frame = np.full((2, 2, 3), 200, dtype=np.uint8)
+    chain(Fade(2, 2, duration=10, fade_in=2, fade_out=2))(frame, 1.0)
+    assert frame[0, 0, 0] == 100
+    frame.fill(200)
+    Fade(2, 2, duration=10, fade_out=2)(frame, 9.5)
+    assert frame[0, 0, 0] == 50
@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import MagicMock
+from src.Instrumentation import Instrumentation, JsonLinesSink
+
+def test_stage_events_carry_operation_and_bytes(tmp_path):
+    events = []
+    instr = Instrumentation([events.append])
+    out = tmp_path / "out.mp4"
+    with instr.operation("merge_videos"):
+        with instr.operation("merge_videos"):
+            with instr.stage("mux", path=str(out)) as record:
+                out.write_bytes(b"x" * 10)
+                record["frames"] = 5
+    stage, operation = events
+    assert stage["stage"] == "mux" and stage["operation"] == "merge_videos"
+    assert stage["bytes_written"] == 10 and stage["frames"] == 5 and "fps" in stage
+    assert operation["event"] == "operation" and operation["status"] == "ok"
+
+def test_stage_error_is_reported_and_reraised():
+    events = []
+    instr = Instrumentation([events.append])
+    with pytest.raises(IOError):
+        with instr.stage("encode"):
+            raise IOError("boom")
+    assert events[0]["status"] == "error"
+
+def test_jsonl_sink_and_disabled_instrumentation(tmp_path):
+    path = tmp_path / "events.jsonl"
+    instr = Instrumentation([JsonLinesSink(str(path))])
+    with instr.stage("probe", input="a.mp4"):
+        pass
+    (line,) = path.read_text().splitlines()
+    assert json.loads(line)["input"] == "a.mp4"
+    with Instrumentation().stage("probe") as record:
+        record["frames"] = 1
+
+def test_write_videofile_splits_decode_transform_encode():
+    events = []
+    instr = Instrumentation([events.append])
+    source = MagicMock()
+    clip = MagicMock()
+
+    def write(path, **kwargs):
+        for t in range(3):
+            source.reader.get_frame(t)
+            clip.get_frame(t)
+    clip.write_videofile.side_effect = write
+    instr.write_videofile(clip, "out.mp4", [source], codec="libx264")
+    stages = {e["stage"]: e for e in events}
+    assert set(stages) == {"decode", "transform", "encode"}
+    assert stages["encode"]["frames"] == 3
+    assert clip.write_videofile.call_args[1]["codec"] == "libx264"
@@ -0,0 +1,74 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch
+from src.BatchMerger import MergeJob, JobResult
+from src.JobPlanner import CostModel, JobPlanner, makespan
+
+def _info(duration, codec="h264", width=720, height=1280, fps=30):
+    return {"duration": duration, "video_codec": codec, "width": width, "height": height, "fps": fps}
+
+def test_makespan_packs_longest_first():
+    # LPT: 5+3+3 | 4+3, không phải tối ưu (9) nhưng đủ sát cho ETA.
+    assert makespan([5, 4, 3, 3, 3], 2) == 10
+    assert makespan([4], 3) == 4
+    assert makespan([2, 2, 2], 1) == 6
+
+def test_features_copy_vs_encode():
+    assert CostModel.features(_info(60)) == ("copy", 60)
+    kind, work = CostModel.features(_info(10, codec="wmv2", width=1000, height=1000, fps=25))
+    assert kind == "encode" and work == pytest.approx(250.0)
+
+def test_plan_orders_longest_first_and_handles_probe_errors():
+    infos = {"short.mp4": _info(10), "long.mp4": _info(600), "avi.avi": _info(60, codec="wmv2")}
+
+    def probe(path):
+        if path not in infos:
+            raise IOError("hỏng")
+        return infos[path]
+    jobs = [MergeJob(p, "a.mp3", f"{i}.mp4") for i, p in enumerate(["short.mp4", "bad.mp4", "long.mp4", "avi.avi"])]
+    with patch("src.JobPlanner.probe_media", side_effect=probe):
+        order, estimates = JobPlanner(workers=2).plan(jobs)
+    # avi phải encode lại video nên đắt hơn cả file copy dài 600s.
+    assert order == [3, 2, 0, 1]
+    assert estimates[1].kind == "unknown" and estimates[1].cost == CostModel().overhead
+
+def test_observe_refines_eta_from_measured_throughput():
+    model = CostModel(overhead=0.0, rates={"copy": 0.1}, prior_seconds=1.0)
+    planner = JobPlanner(model, workers=1)
+    jobs = [MergeJob("a.mp4", "x.mp3", "a.mp4"), MergeJob("b.mp4", "x.mp3", "b.mp4")]
+    with patch("src.JobPlanner.probe_media", return_value=_info(100)):
+        planner.plan(jobs)
+    assert planner.eta() == pytest.approx(20.0)
+    # Job thật chạy chậm gấp 3 lần mô hình: phần còn lại được ước lượng lại.
+    planner.observe(JobResult(MergeJob("a.mp4", "x.mp3", "a.mp4"), output_path="a.mp4", wall_time=30.0))
+    assert model.scale("copy") == pytest.approx(31 / 11)
+    assert planner.eta() == pytest.approx(10 * 31 / 11)
+    # Job lỗi không dùng để hiệu chỉnh.
+    planner.observe(JobResult(jobs[1], error="boom", wall_time=1.0))
+    assert planner.remaining == {} and planner.eta() == 0.0
+    assert model.scale("copy") == pytest.approx(31 / 11)
+
+def test_eta_counts_only_remaining_time_of_running_jobs():
+    now = [0.0]
+    model = CostModel(overhead=0.0, rates={"copy": 1.0}, prior_seconds=1e9)
+    planner = JobPlanner(model, workers=2, clock=lambda: now[0])
+    lengths = {"a.mp4": 10, "b.mp4": 10, "c.mp4": 4, "d.mp4": 4}
+    jobs = [MergeJob(p, "x.mp3", p) for p in lengths]
+    with patch("src.JobPlanner.probe_media", side_effect=lambda p: _info(lengths[p])):
+        planner.plan(jobs)
+    planner.start()
+    assert planner.eta() == pytest.approx(14.0)
+    # a, b đang chạy được 6s: còn 4s mỗi job, không phải xếp lại từ đầu (14s).
+    now[0] = 6.0
+    assert planner.eta() == pytest.approx(8.0)
+    # a xong; worker của a nhận c lúc 10s.
+    now[0] = 10.0
+    planner.observe(JobResult(jobs[0], output_path="a.mp4", wall_time=10.0))
+    assert set(planner.running) == {planner._key(jobs[1]), planner._key(jobs[2])}
+    now[0] = 12.0
+    assert planner.eta() == pytest.approx(4.0)
+    # Job chạy quá ước lượng không làm ETA âm.
+    now[0] = 30.0
+    assert planner.eta() == pytest.approx(4.0)
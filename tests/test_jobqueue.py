@@ -0,0 +1,103 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from src.BatchMerger import MergeJob, JobResult
+from src.JobQueue import JobQueue
+from src.FFmpegTools import atomic_output
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    q = JobQueue(str(tmp_path / "jobs.sqlite"), max_attempts=3, backoff=10, clock=clock)
+    yield q
+    q.close()
+
+def test_add_skips_existing_jobs(queue):
+    jobs = [MergeJob("v.mp4", "a.mp3", "v_a.mp4"), MergeJob("v.mp4", "b.mp3", "v_b.mp4")]
+    assert queue.add(jobs, {"profile": "balanced"}) == 2
+    assert queue.add(jobs, {"profile": "balanced"}) == 0
+    # Đổi tham số encode là job khác.
+    assert queue.add(jobs[:1], {"profile": "archive"}) == 1
+    assert queue.counts()["pending"] == 3
+
+def test_claim_and_record_success(queue, tmp_path):
+    queue.add([MergeJob("v.mp4", "a.mp3", "v_a.mp4")])
+    (job,) = queue.claim()
+    assert job.job_id is not None and job.output_filename == "v_a.mp4"
+    assert queue.claim() == []
+    out = tmp_path / "v_a.mp4"
+    out.write_bytes(b"x")
+    assert queue.record(JobResult(job, output_path=str(out), wall_time=1.5)) == "done"
+    assert queue.created_files() == [str(out)]
+    assert queue.next_retry_in() is None
+
+def test_failed_job_backs_off_then_fails(queue, clock):
+    queue.add([MergeJob("v.mp4", "a.mp3")])
+    (job,) = queue.claim()
+    assert queue.record(JobResult(job, error="boom")) == "pending"
+    assert queue.claim() == []
+    assert queue.next_retry_in() == 10
+    clock.now += 10
+    (job,) = queue.claim()
+    assert queue.record(JobResult(job, error="boom")) == "pending"
+    # Backoff nhân đôi sau mỗi lần lỗi.
+    assert queue.next_retry_in() == 20
+    clock.now += 20
+    (job,) = queue.claim()
+    assert queue.record(JobResult(job, error="boom")) == "failed"
+    assert queue.next_retry_in() is None
+    assert queue.failures() == [("v.mp4", "a.mp3", "boom")]
+    assert queue.retry_failed() == 1
+    assert len(queue.claim()) == 1
+
+def test_recover_requeues_running_and_missing_outputs(tmp_path, clock):
+    db = str(tmp_path / "jobs.sqlite")
+    queue = JobQueue(db, clock=clock)
+    queue.add([MergeJob("v.mp4", "a.mp3", "1.mp4"), MergeJob("v.mp4", "b.mp3", "2.mp4")])
+    first, second = queue.claim()
+    queue.record(JobResult(first, output_path=str(tmp_path / "gone.mp4")))
+    queue.close()
+
+    # Mở lại sau khi tiến trình chết: job đang chạy và job mất file ra đều chạy lại.
+    queue = JobQueue(db, clock=clock)
+    assert queue.recover() == 2
+    assert len(queue.claim()) == 2
+    queue.close()
+
+def test_atomic_output_only_publishes_on_success(tmp_path):
+    out = tmp_path / "out.mp4"
+    with atomic_output(str(out)) as tmp:
+        assert tmp != str(out) and os.path.dirname(tmp) == str(tmp_path)
+        with open(tmp, "wb") as f:
+            f.write(b"ok")
+    assert out.read_bytes() == b"ok"
+
+    with pytest.raises(RuntimeError):
+        with atomic_output(str(tmp_path / "bad.mp4")) as tmp:
+            with open(tmp, "wb") as f:
+                f.write(b"half")
+            raise RuntimeError("killed")
+    assert sorted(os.listdir(tmp_path)) == ["out.mp4"]
+
+def test_atomic_output_writers_do_not_share_temp_file(tmp_path):
+    out = str(tmp_path / "out.mp4")
+    # Lần chạy lại chồng lên worker cũ: mỗi bên ghi file tạm riêng.
+    with atomic_output(out) as first, atomic_output(out) as second:
+        assert first != second
+        for tmp, data in ((first, b"first"), (second, b"second")):
+            with open(tmp, "wb") as f:
+                f.write(data)
+    with open(out, "rb") as f:
+        assert f.read() == b"first"
+    assert os.listdir(tmp_path) == ["out.mp4"]
@@ -0,0 +1,59 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch, MagicMock
+from src.MediaProbe import probe_media, ProbeCache
+
+FFMPEG_OUTPUT = """Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'clip.mp4':
+  Duration: 00:00:02.00, start: 0.000000, bitrate: 198 kb/s
+  Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p(tv, bt709, progressive), 720x1280 [SAR 1:1 DAR 9:16], 113 kb/s, 30 fps, 30 tbr, 15360 tbn (default)
+  Stream #0:1[0x2](und): Audio: aac (LC) (mp4a / 0x6134706D), 48000 Hz, stereo, fltp, 69 kb/s (default)
+At least one output file must be specified
+"""
+
+@patch("src.MediaProbe.subprocess.run")
+def test_probe_media_parses_streams(mock_run):
+    mock_run.return_value = MagicMock(stderr=FFMPEG_OUTPUT.encode("utf8"))
+    info = probe_media("clip.mp4")
+    assert info["duration"] == 2.0
+    assert info["video_codec"] == "h264"
+    assert info["pix_fmt"] == "yuv420p"
+    assert (info["width"], info["height"]) == (720, 1280)
+    assert info["fps"] == 30.0
+    assert info["audio_codec"] == "aac"
+    assert info["audio_rate"] == 48000
+    assert info["audio_channels"] == "stereo"
+
+@patch("src.MediaProbe.subprocess.run")
+def test_probe_media_invalid_file(mock_run):
+    mock_run.return_value = MagicMock(stderr=b"clip.mp4: Invalid data found when processing input")
+    with pytest.raises(IOError):
+        probe_media("clip.mp4")
+
+@patch("src.MediaProbe._probe_uncached")
+def test_probe_cache_memoizes_and_persists(mock_probe, tmp_path):
+    media = tmp_path / "a.mp4"
+    media.write_bytes(b"x")
+    db = str(tmp_path / "probe.sqlite")
+    mock_probe.return_value = {"duration": 3.0}
+    cache = ProbeCache(db)
+    assert cache.get(str(media))["duration"] == 3.0
+    assert cache.get(str(media))["duration"] == 3.0
+    assert mock_probe.call_count == 1
+    # Cache mới đọc lại từ sqlite, không gọi ffmpeg.
+    assert ProbeCache(db).get(str(media))["duration"] == 3.0
+    assert mock_probe.call_count == 1
+
+@patch("src.MediaProbe._probe_uncached")
+def test_probe_cache_invalidated_by_size_and_mtime(mock_probe, tmp_path):
+    media = tmp_path / "a.mp4"
+    media.write_bytes(b"x")
+    cache = ProbeCache(str(tmp_path / "probe.sqlite"))
+    mock_probe.return_value = {"duration": 3.0}
+    cache.get(str(media))
+    media.write_bytes(b"longer")
+    mock_probe.return_value = {"duration": 7.0}
+    assert cache.get(str(media))["duration"] == 7.0
+    assert ProbeCache(str(tmp_path / "probe.sqlite")).get(str(media))["duration"] == 7.0
+    assert mock_probe.call_count == 2
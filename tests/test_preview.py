@@ -0,0 +1,63 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch
+from src.Preview import PreviewGenerator, preview_times, frame_args, output_stem
+
+def _write_output(args):
+    with open(args[-1], "wb") as f:
+        f.write(b"img")
+
+def test_preview_times_snap_to_unused_keyframes():
+    times = preview_times(40.0, 4, keyframes=[0.0, 4.0, 14.0, 16.0, 30.0])
+    # Mốc 5, 15, 25, 35: 25 không có keyframe trong nửa bước, 35 trùng keyframe 30 đã dùng.
+    assert times == [(4.0, True), (14.0, True), (30.0, True), (35.0, False)]
+    assert preview_times(10.0, 2) == [(2.5, False), (7.5, False)]
+    assert preview_times(0, 4) == []
+
+def test_frame_args_decode_only_keyframe():
+    args = frame_args("v.mp4", 4.0, True, "t.webp", width=160, quality=70)
+    assert args[:2] == ["-skip_frame", "nokey"] and "-noaccurate_seek" in args
+    assert args[args.index("-ss") + 1] == "4.001000"
+    assert args[args.index("-vf") + 1] == "scale=160:-2"
+    assert args[args.index("-c:v") + 1] == "libwebp"
+    exact = frame_args("v.mp4", 2.5, False, "t.jpg")
+    assert "-skip_frame" not in exact and exact[:2] == ["-ss", "2.500000"]
+
+@patch("src.Preview.run_ffmpeg", side_effect=_write_output)
+@patch("src.Preview.get_keyframes", return_value=[0.0, 2.0, 4.0, 6.0])
+@patch("src.Preview.probe_media", return_value={"duration": 8.0})
+def test_sprite_sheets_extract_all_tiles_then_tile(mock_probe, mock_keyframes, mock_run, tmp_path):
+    generator = PreviewGenerator(str(tmp_path / "temp"), workers=2)
+    sprites = generator.sprite_sheets(["x/clip.mp4", "y/clip.mp4"], count=3, columns=2,
+                                      output_folder=str(tmp_path / "out"))
+    # Cùng tên file ở hai thư mục: mỗi video một sprite riêng.
+    assert sorted(sprites) == ["x/clip.mp4", "y/clip.mp4"]
+    assert len(set(sprites.values())) == 2
+    assert all(os.path.basename(p).startswith("clip_") for p in sprites.values())
+    assert all(os.path.exists(p) for p in sprites.values())
+    calls = [c.args[0] for c in mock_run.call_args_list]
+    assert sum("-skip_frame" in args for args in calls) == 6
+    tile = calls[-1]
+    assert tile[tile.index("-vf") + 1] == "tile=2x2"
+    # Ảnh ô tạm được dọn sau khi ghép.
+    assert os.listdir(tmp_path / "temp") == []
+
+@patch("src.Preview.run_ffmpeg", side_effect=IOError("ffmpeg lỗi"))
+@patch("src.Preview.get_keyframes", return_value=[])
+@patch("src.Preview.probe_media", return_value={"duration": 8.0})
+def test_thumbnail_error_propagates(mock_probe, mock_keyframes, mock_run, tmp_path):
+    generator = PreviewGenerator(str(tmp_path))
+    with pytest.raises(IOError):
+        generator.thumbnails("a.mp4", count=2)
+
+@patch("src.Preview.run_ffmpeg", side_effect=_write_output)
+@patch("src.Preview.get_keyframes", return_value=[])
+@patch("src.Preview.probe_media", return_value={"duration": 8.0})
+def test_thumbnails_same_name_in_different_folders(mock_probe, mock_keyframes, mock_run, tmp_path):
+    generator = PreviewGenerator(str(tmp_path))
+    thumbs = generator.thumbnails_many(["a/clip.mp4", "b/clip.mp4"], count=2)
+    a, b = thumbs["a/clip.mp4"], thumbs["b/clip.mp4"]
+    assert not set(a) & set(b) and len(os.listdir(tmp_path)) == 2
+    assert os.path.dirname(a[0]) == str(tmp_path / f"{output_stem('a/clip.mp4')}_thumbs")
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from unittest.mock import MagicMock
+from src.ResultCache import ResultCache
+
+
+def _render_to(paths, data=b"rendered"):
+    def render():
+        for p in paths:
+            with open(p, "wb") as f:
+                f.write(data)
+        return paths[0] if len(paths) == 1 else paths
+    return MagicMock(side_effect=render)
+
+def test_hit_skips_render(tmp_path):
+    src = tmp_path / "in.mp4"
+    src.write_bytes(b"input")
+    out = str(tmp_path / "out.mp4")
+    cache = ResultCache(str(tmp_path / "cache"))
+    render = _render_to([out])
+    assert cache.fetch_or_render("op", [str(src)], {"a": 1}, out, render) == out
+    os.remove(out)
+    assert cache.fetch_or_render("op", [str(src)], {"a": 1}, out, render) == out
+    assert render.call_count == 1
+    with open(out, "rb") as f:
+        assert f.read() == b"rendered"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_hit_keeps_output_identity(tmp_path):
+    src = tmp_path / "in.mp4"
+    src.write_bytes(b"input")
+    out = str(tmp_path / "fanout.mp4")
+    cache = ResultCache(str(tmp_path / "cache"))
+    render = _render_to([out])
+    cache.fetch_or_render("op", [str(src)], {}, out, render)
+    past = time.time() - 3600
+    os.utime(out, (past, past))
+    mtime = os.stat(out).st_mtime_ns
+    # File ra là input của thao tác sau: lần hit không được đổi định danh của nó.
+    key = cache.make_key("next", [out])
+    assert cache.fetch_or_render("op", [str(src)], {}, out, render) == out
+    assert os.stat(out).st_mtime_ns == mtime
+    assert cache.make_key("next", [out]) == key
+    # Lần dùng cuối vẫn được ghi nhận (atime) cho LRU.
+    assert all(last_used > past + 60 for _, _, last_used in cache.entries())
+
+def test_key_changes_with_params_and_input(tmp_path):
+    src = tmp_path / "in.mp4"
+    src.write_bytes(b"input")
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache.make_key("op", [str(src)], {"a": 1})
+    assert cache.make_key("op", [str(src)], {"a": 2}) != key
+    assert cache.make_key("other", [str(src)], {"a": 1}) != key
+    src.write_bytes(b"changed input")
+    assert cache.make_key("op", [str(src)], {"a": 1}) != key
+
+def test_multi_output_and_failed_render(tmp_path):
+    src = tmp_path / "in.mp4"
+    src.write_bytes(b"input")
+    outs = [str(tmp_path / "p1.mp4"), str(tmp_path / "p2.mp4")]
+    cache = ResultCache(str(tmp_path / "cache"))
+    failed = MagicMock(return_value=None)
+    assert cache.fetch_or_render("split", [str(src)], {}, outs, failed) is None
+    render = _render_to(outs)
+    cache.fetch_or_render("split", [str(src)], {}, outs, render)
+    assert cache.fetch_or_render("split", [str(src)], {}, outs, render) == outs
+    assert render.call_count == 1
+    assert len(cache.entries()) == 2
+
+def test_evict_by_size_and_age(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=15)
+    old = tmp_path / "cache" / "old.mp4"
+    new = tmp_path / "cache" / "new.mp4"
+    old.write_bytes(b"x" * 10)
+    new.write_bytes(b"y" * 10)
+    past = time.time() - 3600
+    os.utime(old, (past, past))
+    # Artifact cũ nhưng vừa được dùng lại thì không bị xóa.
+    os.utime(new, (time.time(), past))
+    assert cache.evict() == 1
+    assert not old.exists() and new.exists()
+    cache.max_bytes = None
+    cache.max_age = 60
+    os.utime(new, (past, past))
+    assert cache.evict() == 1
+    assert cache.entries() == []
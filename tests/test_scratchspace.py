@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pickle
+import pytest
+from unittest.mock import patch
+from src.ScratchSpace import ScratchSpace, JOBS_DIR
+
+def _write(path, size, age=0):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    if age:
+        t = time.time() - age
+        os.utime(path, (t, t))
+    return str(path)
+
+def test_job_folder_removed_on_exit_and_error(tmp_path):
+    space = ScratchSpace(str(tmp_path))
+    with space.job("merge many") as job:
+        assert os.path.dirname(job.path) == os.path.join(str(tmp_path), JOBS_DIR)
+        assert job.path.endswith("merge_many")
+        assert space.work_folder() == job.path
+        _write(os.path.join(job.path, "seg.mp4"), 10)
+        assert space.usage()["jobs"] > 0
+    assert not os.path.exists(job.path)
+    with pytest.raises(RuntimeError):
+        with space.job() as job:
+            raise RuntimeError("lỗi")
+    assert not os.path.exists(job.path)
+    # Ngoài job, intermediate nằm thẳng trong root.
+    assert space.work_folder() == str(tmp_path)
+
+def test_nested_job_reuses_outer(tmp_path):
+    space = ScratchSpace(str(tmp_path))
+    with space.job("outer") as outer:
+        with space.job("inner") as inner:
+            assert inner is outer
+        assert os.path.isdir(outer.path)
+    assert pickle.loads(pickle.dumps(space)).root == space.root
+
+def test_recover_removes_folders_of_dead_processes(tmp_path):
+    jobs = tmp_path / JOBS_DIR
+    dead = jobs / "999999-1-split"
+    alive = jobs / f"{os.getpid()}-1-split"
+    dead.mkdir(parents=True)
+    alive.mkdir()
+    with patch("src.ScratchSpace._pid_alive", return_value=False):
+        ScratchSpace(str(tmp_path))
+    assert not dead.exists() and alive.exists()
+
+def test_quota_evicts_least_recently_used_old_files(tmp_path):
+    oldest = _write(tmp_path / "a.mp4", 400, age=300)
+    older = _write(tmp_path / "b.mp4", 400, age=200)
+    fresh = _write(tmp_path / "c.mp4", 400, age=10)
+    space = ScratchSpace(str(tmp_path), quota_bytes=900, min_age=60)
+    space.touch(oldest)
+    assert space.enforce_quota() == 1
+    # b.mp4 dùng lâu nhất; c.mp4 mới ghi nên không bị xóa dù vẫn vượt quota.
+    assert os.path.exists(oldest) and not os.path.exists(older) and os.path.exists(fresh)
+    assert space.enforce_quota(extra_bytes=500) == 0
+    assert space.evicted == 1
+
+def test_small_intermediates_staged_on_tmpfs(tmp_path):
+    tmpfs = tmp_path / "shm"
+    tmpfs.mkdir()
+    space = ScratchSpace(str(tmp_path / "temp"), tmpfs_root=str(tmpfs),
+                         tmpfs_quota_bytes=1000, small_file_bytes=500)
+    with space.job("concat") as job:
+        fast = space.work_folder(100)
+        assert fast == job.fast_path and fast.startswith(str(tmpfs))
+        _write(os.path.join(fast, "list.txt"), 800)
+        # Quá ngưỡng file nhỏ, hoặc hết quota tmpfs: về thư mục job trên đĩa.
+        assert space.work_folder(600) == job.path
+        assert space.work_folder(300) == job.path
+        assert space.work_folder() == job.path
+    assert not os.path.exists(fast)
+    assert ScratchSpace(str(tmp_path / "other"), tmpfs_root=str(tmp_path / "missing")).tmpfs_root is None
+
+def test_clear_keeps_running_jobs(tmp_path):
+    space = ScratchSpace(str(tmp_path))
+    shared = _write(tmp_path / "out.mp4", 10)
+    with space.job() as job:
+        space.clear()
+        assert os.path.isdir(job.path)
+    assert not os.path.exists(shared)
+
+def test_clear_keeps_leased_files(tmp_path):
+    space = ScratchSpace(str(tmp_path))
+    mezz = _write(tmp_path / "mezz.mp4", 10)
+    other = _write(tmp_path / "old.mp4", 10)
+    # Batch khác đang giữ mezzanine: clear_temp_folder của batch này không xóa nó.
+    with space.lease([mezz], name="batch"):
+        space.clear()
+        assert os.path.exists(mezz) and not os.path.exists(other)
+    space.clear()
+    assert not os.path.exists(mezz)
+
+def test_leased_files_survive_quota(tmp_path):
+    space = ScratchSpace(str(tmp_path), quota_bytes=1, min_age=0)
+    held = _write(tmp_path / "fanout.mp4", 400, age=300)
+    other = _write(tmp_path / "old.mp4", 400, age=300)
+    outside = _write(tmp_path.parent / "src.mp4", 10)
+    with space.lease([held], name="batch") as lease:
+        with space.job("merge", inputs=[outside]) as job:
+            # Bắt đầu job thì dọn quota: chỉ file không ai giữ bị xóa.
+            assert os.path.exists(held) and not os.path.exists(other)
+            # Mezzanine được tạo trong job rồi giữ tới khi job xong.
+            mezz = _write(tmp_path / "norm.mp4", 400, age=300)
+            space.retain([mezz])
+            assert job.leases == [mezz]
+            assert space.enforce_quota() == 0 and os.path.exists(mezz)
+        assert space.leased_paths() == {held}
+        assert lease.leases == [held] and space.current_job() is None
+    assert space.leased_paths() == set()
+    assert space.enforce_quota() == 2 and os.listdir(tmp_path) == [JOBS_DIR]
+
+def test_touch_keeps_mtime(tmp_path):
+    path = _write(tmp_path / "a.mp4", 10, age=300)
+    mtime = os.stat(path).st_mtime_ns
+    ScratchSpace.touch(path)
+    # mtime là định danh file của ResultCache/cache probe nên không được đổi.
+    assert os.stat(path).st_mtime_ns == mtime
+    assert os.stat(path).st_atime > time.time() - 60
@@ -0,0 +1,76 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch
+from src.SegmentEncoder import plan_segments, encode_file
+
+def test_plan_segments_snaps_to_keyframes():
+    keyframes = [0, 2, 4, 6, 8.5, 10, 12, 14, 16, 18]
+    assert plan_segments(20.0, 2, keyframes) == [(0.0, 10), (10, 20.0)]
+    segments = plan_segments(20.0, 3, keyframes)
+    assert [s for s, _ in segments] == [0.0, 6, 14]
+    assert segments[-1][1] == 20.0
+
+def test_plan_segments_keeps_short_sources_whole():
+    assert plan_segments(5.0, 8) == [(0.0, 5.0)]
+    # Không tách ra đoạn ngắn hơn MIN_SEGMENT_SECONDS.
+    assert len(plan_segments(10.0, 8)) == 2
+
+def _fake_ffmpeg(calls):
+    def run(args):
+        calls.append(args)
+        with open(args[-1], "wb") as f:
+            f.write(b"x")
+    return run
+
+@patch("src.SegmentEncoder.get_keyframes", return_value=[0, 5, 10, 15])
+def test_encode_segmented_encodes_audio_once_and_concats(mock_keyframes, tmp_path):
+    calls = []
+    out = str(tmp_path / "out.mp4")
+    with patch("src.SegmentEncoder.run_ffmpeg", side_effect=_fake_ffmpeg(calls)):
+        encode_file(
+            "src.mp4", out, 20.0, ["-c:v", "libx264"], ["-i", "src.mp4"], ["-c:a", "aac"],
+            workers=4, temp_folder=str(tmp_path),
+        )
+    audio_jobs = [c for c in calls if c[-1].endswith("audio.m4a")]
+    video_jobs = [c for c in calls if c[-1].endswith(".mp4") and "-ss" in c]
+    assert len(audio_jobs) == 1
+    assert [c[c.index("-ss") + 1] for c in video_jobs] == ["0.000000", "5.000000", "10.000000", "15.000000"]
+    assert all("-c:v" in c and "-c:a" not in c for c in video_jobs)
+    concat = calls[-1]
+    assert concat[-1] != out and concat[concat.index("-c") + 1] == "copy"
+    # Thư mục đoạn tạm đã được dọn.
+    assert sorted(os.listdir(tmp_path)) == ["out.mp4"]
+
+def test_encode_file_cancelled_leaves_no_output(tmp_path):
+    def run(args):
+        with open(args[-1], "wb") as f:
+            f.write(b"half")
+        raise KeyboardInterrupt
+    out = str(tmp_path / "norm.mp4")
+    with patch("src.SegmentEncoder.run_ffmpeg", side_effect=run), pytest.raises(KeyboardInterrupt):
+        encode_file("src.mp4", out, 6.0, ["-c:v", "libx264"])
+    assert os.listdir(tmp_path) == []
+
+def test_encode_file_single_process_for_short_sources(tmp_path):
+    calls = []
+    with patch("src.SegmentEncoder.run_ffmpeg", side_effect=_fake_ffmpeg(calls)):
+        encode_file("src.mp4", str(tmp_path / "out.mp4"), 6.0, ["-c:v", "libx264"], workers=4)
+    assert len(calls) == 1
+    assert calls[0][calls[0].index("-t") + 1] == "6.000000"
+
+@patch("src.SegmentEncoder.get_keyframes", return_value=[])
+def test_encode_segmented_cleans_up_on_failure(mock_keyframes, tmp_path):
+    def run(args):
+        if "-ss" in args and args[args.index("-ss") + 1] != "0.000000":
+            raise IOError("ffmpeg lỗi")
+        with open(args[-1], "wb") as f:
+            f.write(b"x")
+    with patch("src.SegmentEncoder.run_ffmpeg", side_effect=run):
+        with pytest.raises(IOError):
+            encode_file(
+                "src.mp4", str(tmp_path / "out.mp4"), 20.0, [], workers=2,
+                temp_folder=str(tmp_path),
+            )
+    assert os.listdir(tmp_path) == []
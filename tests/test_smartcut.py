@@ -0,0 +1,109 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import shutil
+import subprocess
+import pytest
+from unittest.mock import patch
+from src.SmartCut import cut_segment, split_at_times
+
+INFO = {
+    "duration": 20.0, "video_codec": "h264", "pix_fmt": "yuv420p",
+    "fps": 30.0, "has_audio": True,
+}
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0]
+
+def _commands(mock_run):
+    return [call.args[0] for call in mock_run.call_args_list]
+
+@patch("src.SmartCut.get_keyframes", return_value=KEYFRAMES)
+@patch("src.SmartCut.probe_media", return_value=INFO)
+@patch("src.SmartCut.run_ffmpeg")
+def test_cut_reencodes_only_boundary_gops(mock_run, mock_probe, mock_kf, tmp_path):
+    cut_segment("in.mp4", 3.5, 7.0, "out.mp4", str(tmp_path))
+    head, body, tail, join = _commands(mock_run)
+    assert head[head.index("-ss") + 1] == "3.500000"
+    assert head[head.index("-c:v") + 1] == "libx264"
+    # Chỉ copy trọn các GOP [4, 6); GOP chứa điểm cắt cuối được encode lại.
+    assert body[body.index("-ss") + 1] == "4.000000"
+    assert body[body.index("-c:v") + 1] == "copy"
+    assert body[body.index("-frames:v") + 1] == "60" and "-t" not in body
+    assert "h264_mp4toannexb" in body
+    assert tail[tail.index("-ss") + 1] == "6.000000"
+    assert tail[tail.index("-t") + 1] == "1.000000"
+    assert tail[tail.index("-c:v") + 1] == "libx264"
+    assert join[join.index("-c:v") + 1] == "copy"
+    assert join[-1] == "out.mp4"
+    # Thư mục tạm đã được dọn.
+    assert os.listdir(tmp_path) == []
+
+@patch("src.SmartCut.get_keyframes", return_value=KEYFRAMES)
+@patch("src.SmartCut.probe_media", return_value=INFO)
+@patch("src.SmartCut.run_ffmpeg")
+def test_cut_on_keyframe_is_pure_copy(mock_run, mock_probe, mock_kf, tmp_path):
+    cut_segment("in.mp4", 4.0, 8.0, "out.mp4", str(tmp_path))
+    body, join = _commands(mock_run)
+    assert body[body.index("-c:v") + 1] == "copy"
+    assert body[body.index("-frames:v") + 1] == "120"
+    # Đoạn tới cuối file copy tới hết, không giới hạn số frame.
+    mock_run.reset_mock()
+    cut_segment("in.mp4", 8.0, None, "out.mp4", str(tmp_path))
+    body, join = _commands(mock_run)
+    assert "-frames:v" not in body and "-t" not in body
+
+@patch("src.SmartCut.get_keyframes", return_value=KEYFRAMES)
+@patch("src.SmartCut.probe_media", return_value=INFO)
+@patch("src.SmartCut.run_ffmpeg")
+def test_cut_inside_one_gop_reencodes(mock_run, mock_probe, mock_kf, tmp_path):
+    cut_segment("in.mp4", 4.5, 5.5, "out.mp4", str(tmp_path))
+    (cmd,) = _commands(mock_run)
+    assert cmd[cmd.index("-c:v") + 1] == "libx264"
+
+@patch("src.SmartCut.get_keyframes")
+@patch("src.SmartCut.probe_media", return_value=dict(INFO, video_codec="mpeg4"))
+@patch("src.SmartCut.run_ffmpeg")
+def test_cut_unsupported_codec_reencodes(mock_run, mock_probe, mock_kf, tmp_path):
+    cut_segment("in.avi", 3.5, 7.0, "out.mp4", str(tmp_path))
+    assert mock_run.call_count == 1
+    mock_kf.assert_not_called()
+
+@patch("src.SmartCut.cut_segment")
+@patch("src.SmartCut.probe_media", return_value=INFO)
+def test_split_at_times_bounds(mock_probe, mock_cut):
+    split_at_times("in.mp4", [12, 5], ["a", "b", "c"])
+    bounds = [call.args[1:3] for call in mock_cut.call_args_list]
+    assert bounds == [(0.0, 5), (5, 12), (12, 20.0)]
+    with pytest.raises(ValueError):
+        split_at_times("in.mp4", [5], ["a"])
+
+def _ffmpeg():
+    try:
+        from src.FFmpegTools import FFMPEG_BINARY
+    except Exception:
+        return None
+    return FFMPEG_BINARY if shutil.which(FFMPEG_BINARY) or os.path.isfile(FFMPEG_BINARY) else None
+
+def _frame_hashes(ffmpeg, path):
+    out = subprocess.run(
+        [ffmpeg, "-v", "error", "-i", path, "-map", "0:v:0", "-f", "framemd5", "-"],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return [line.rsplit(",", 1)[1].strip() for line in out.splitlines() if not line.startswith("#")]
+
+@pytest.mark.skipif(_ffmpeg() is None, reason="cần ffmpeg")
+def test_split_real_bframe_video_keeps_every_frame_once(tmp_path):
+    ffmpeg = _ffmpeg()
+    src = str(tmp_path / "src.mp4")
+    # 300 frame, keyframe mỗi 1s, 3 frame B: đoạn copy giữa chừng GOP sẽ lấn frame.
+    subprocess.run([
+        ffmpeg, "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=160x120:rate=30",
+        "-t", "10", "-c:v", "libx264", "-g", "30", "-bf", "3", "-pix_fmt", "yuv420p", src,
+    ], check=True)
+    source = _frame_hashes(ffmpeg, src)
+    outs = [str(tmp_path / f"part{i}.mp4") for i in range(4)]
+    split_at_times(src, [2.5, 5, 7.2], outs, str(tmp_path))
+    parts = [_frame_hashes(ffmpeg, out) for out in outs]
+    assert [len(p) for p in parts] == [75, 75, 66, 84]
+    # Phần giữa các keyframe được copy nguyên: frame 150 (5s) mở đầu phần 3.
+    assert parts[2][0] == source[150] and parts[2][:45] == source[150:195]
+    assert parts[3][-1] == source[-1]
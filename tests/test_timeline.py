@@ -0,0 +1,70 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import pytest
+from unittest.mock import patch
+from src.Timeline import Timeline
+
+INFOS = {
+    "a.mp4": {"duration": 20.0, "has_audio": True},
+    "b.mp4": {"duration": 5.0, "has_audio": False},
+    "song.mp3": {"duration": 60.0, "has_audio": True},
+}
+
+@pytest.fixture(autouse=True)
+def fake_probe():
+    with patch("src.Timeline.probe_media", side_effect=lambda p: INFOS[p]):
+        yield
+
+def _graph(args):
+    return args[args.index("-filter_complex") + 1]
+
+def test_build_args_single_encode_graph():
+    tl = Timeline((720, 1280), 30).add_clip("a.mp4", 2, 6).add_clip("b.mp4").add_clip("a.mp4", 10)
+    args = tl.build_args("out.mp4")
+    # Mỗi nguồn chỉ là một input dù được dùng nhiều lần.
+    assert args.count("-i") == 2
+    graph = _graph(args)
+    assert "concat=n=3:v=1:a=1" in graph
+    assert "scale=720:1280" in graph
+    # b.mp4 không có audio -> chèn khoảng lặng đúng độ dài.
+    assert "anullsrc=r=44100:cl=stereo,atrim=duration=5.000000[a1]" in graph
+    assert args[args.index("-t") + 1] == f"{4 + 5 + 10:.6f}"
+    assert args[-1] == "out.mp4"
+
+def test_overlay_replace_mutes_base_and_mixes():
+    tl = Timeline().add_clip("a.mp4").add_audio("song.mp3", at=1.5, end=4, replace=True, gain=0.5)
+    graph = _graph(tl.build_args("out.mp4"))
+    assert "volume=0:enable='between(t,1.500000,5.500000)'" in graph
+    assert "adelay=1500:all=1" in graph
+    assert "volume=0.5" in graph
+    assert "amix=inputs=2" in graph
+
+def test_empty_or_invalid_timeline():
+    with pytest.raises(ValueError):
+        Timeline().build_args("out.mp4")
+    with pytest.raises(ValueError):
+        Timeline().add_clip("b.mp4", start=6).build_args("out.mp4")
+
+def test_video_chunks_split_long_segments():
+    tl = Timeline().add_clip("a.mp4", 0, 20).add_clip("b.mp4")
+    assert tl.video_chunks(10) == [("a.mp4", 0, 10.0), ("a.mp4", 10.0, 20.0), ("b.mp4", 0.0, 5.0)]
+    # Không chia nhỏ hơn MIN_SEGMENT_SECONDS.
+    assert [c[2] - c[1] for c in tl.video_chunks(1)] == [4.0] * 5 + [5.0]
+
+def test_render_segmented_encodes_audio_once(tmp_path):
+    calls = []
+
+    def run(args):
+        calls.append(args)
+        open(args[-1], "wb").close()
+    tl = Timeline((720, 1280), 30).add_clip("a.mp4", 0, 20).add_audio("song.mp3", at=2, replace=True)
+    out = str(tmp_path / "out.mp4")
+    with patch("src.SegmentEncoder.run_ffmpeg", side_effect=run):
+        tl.render_segmented(out, 2, str(tmp_path), video_args=["-crf", "23"], audio_args=["-b:a", "128k"])
+    audio, *videos, concat = calls
+    assert "v=0" in _graph(audio) and "[vout]" not in _graph(audio) and "-c:v" not in audio
+    assert [c[c.index("-ss") + 1] for c in videos] == ["0.000000", "10.000000"]
+    assert all("-an" in c and "scale=720:1280" in c[c.index("-vf") + 1] for c in videos)
+    assert concat[concat.index("-c") + 1] == "copy"
+    assert os.listdir(tmp_path) == ["out.mp4"]
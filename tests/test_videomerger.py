@@ -8,16 +8,17 @@ from moviepy import VideoFileClip, concatenate_videoclips
 
 @pytest.fixture
 def merger(tmp_path):
-    return VideoMerger(str(tmp_path))
+    return VideoMerger(str(tmp_path / "out"), temp_folder=str(tmp_path / "temp"))
+
+def _write_output(*args, **kwargs):
+    with open(args[2], "wb") as f:
+        f.write(b"mp4")
+    return args[2]
 
 @patch("src.VideoMerger.os.path.exists", return_value=True)
-@patch("src.VideoMerger.VideoFileClip")
-def test_get_video_details_success(mock_vfc, mock_exists, merger):
-    mock_clip = MagicMock()
-    mock_clip.size = (1280, 720)
-    mock_clip.fps = 30
-    mock_clip.duration = 10
-    mock_vfc.return_value.__enter__.return_value = mock_clip
+@patch("src.VideoMerger.probe_media")
+def test_get_video_details_success(mock_probe, mock_exists, merger):
+    mock_probe.return_value = {"width": 1280, "height": 720, "fps": 30, "duration": 10}
     size, fps, duration = merger.get_video_details("abc.mp4")
     assert size == (1280, 720)
     assert fps == 30
@@ -33,40 +34,57 @@ def test_get_video_details_exception(mock_vfc, merger):
     size, fps, duration = merger.get_video_details(__file__)
     assert size is None and fps is None and duration is None
 
-@patch("src.VideoMerger.VideoFileClip")
-@patch("src.VideoMerger.CatGhepCoBan")
-def test_merge_with_audio_swap_at_start_long_audio(mock_cg, mock_vfc, merger):
-    # audio dài hơn video
-    merger.CG = mock_cg()
-    merger.get_video_details = MagicMock(side_effect=[
-        (None, None, 20),  # audio_source_path duration
-        ((1280, 720), 30, 10)  # video_target_path duration
-    ])
-    merger.CG.mix_audio_with_video.return_value = "out.mp4"
-    out = merger.merge_with_audio_swap_at_start("audio.mp3", "video.mp4")
-    assert out == "out.mp4"
-    merger.CG.mix_audio_with_video.assert_called_once()
+@patch("src.VideoMerger.swap_audio_at_start_copy")
+@patch("src.VideoMerger.probe_media")
+def test_merge_with_audio_swap_at_start_long_audio(mock_probe, mock_swap, merger):
+    # audio dài hơn video: chỉ thay audio, video giữ nguyên thời lượng.
+    mock_probe.return_value = {"has_audio": True, "duration": 20}
+    merger.get_video_details = MagicMock(return_value=((1280, 720), 30, 10))
+    merger.CG.replace_audio = MagicMock(side_effect=_write_output)
+    out = merger.merge_with_audio_swap_at_start("video.mp4", "audio.mp3")
+    assert out == os.path.join(merger.output_folder, "swapped_video.mp4")
+    assert os.path.exists(out) and merger.created_files == [out]
+    assert merger.CG.replace_audio.call_args[0][:2] == ("video.mp4", "audio.mp3")
+    mock_swap.assert_not_called()
 
+@patch("src.VideoMerger.swap_audio_at_start_copy", side_effect=IOError("codec"))
+@patch("src.VideoMerger.concatenate_videoclips")
+@patch("src.VideoMerger.AudioFileClip")
 @patch("src.VideoMerger.VideoFileClip")
-@patch("src.VideoMerger.CatGhepCoBan")
-def test_merge_with_audio_swap_at_start_short_audio(mock_cg, mock_vfc, merger):
-    # audio ngắn hơn video
-    merger.CG = mock_cg()
-    merger.get_video_details = MagicMock(side_effect=[
-        (None, None, 5),  # audio_source_path duration
-        ((1280, 720), 30, 10)  # video_target_path duration
-    ])
-    merger.CG.extract_audio.return_value = "audio.mp3"
-    merger.CG.split_video_by_time.return_value = ("part1.mp4", "part2.mp4")
-    merger.CG.mix_audio_with_video.return_value = "part1_with_audio.mp4"
-    mock_clip1 = MagicMock()
-    mock_clip2 = MagicMock()
-    mock_final = MagicMock()
-    mock_vfc.side_effect = [mock_clip1, mock_clip2]
-    with patch("src.VideoMerger.concatenate_videoclips", return_value=mock_final):
-        out = merger.merge_with_audio_swap_at_start("audio.mp3", "video.mp4")
+@patch("src.VideoMerger.probe_media")
+def test_merge_with_audio_swap_at_start_short_audio(mock_probe, mock_vfc, mock_afc, mock_concat,
+                                                    mock_swap, merger):
+    # audio ngắn hơn video và không stream copy được: ghép lại bằng moviepy.
+    mock_probe.return_value = {"has_audio": True, "duration": 5}
+    merger.get_video_details = MagicMock(return_value=((1280, 720), 30, 10))
+    video = MagicMock()
+    mock_vfc.return_value = video
+    mock_final = mock_concat.return_value
+    mock_final.write_videofile.side_effect = lambda path, **kwargs: open(path, "wb").close()
+    out = merger.merge_with_audio_swap_at_start("video.mp4", "audio.mp3")
+    video.subclipped.assert_any_call(0, 5)
+    video.subclipped.assert_any_call(5)
+    mock_afc.assert_called_once_with("audio.mp3")
     assert mock_final.write_videofile.called
-    assert out is not None
+    assert out == os.path.join(merger.output_folder, "swapped_video.mp4") and os.path.exists(out)
+
+@patch("src.VideoMerger.probe_media")
+@patch("src.VideoMerger.VideoFileClip")
+@patch("src.VideoMerger.AudioFileClip")
+def test_long_audio_swap_keeps_video_stream(mock_afc, mock_vfc, mock_probe, merger):
+    merger.CG = MagicMock()
+    merger.CG.cached_render.side_effect = lambda op, inputs, params, out, render: render()
+    merger.CG.replace_audio.side_effect = _write_output
+    mock_probe.return_value = {"has_audio": True, "duration": 20}
+    merger.get_video_details = MagicMock(return_value=((1280, 720), 30, 10))
+    out = merger.merge_with_audio_swap_at_start("video.mp4", "song.mp3", "out.mp4")
+    video, audio, tmp_path = merger.CG.replace_audio.call_args[0]
+    assert (video, audio) == ("video.mp4", "song.mp3")
+    # Ghi vào file tạm rồi mới đổi tên thành file ra.
+    assert tmp_path != out and os.path.exists(out) and not os.path.exists(tmp_path)
+    mock_vfc.assert_not_called()
+    mock_afc.assert_not_called()
+    assert out.endswith("out.mp4")
 
 @patch("src.VideoMerger.CatGhepCoBan")
 def test_merge_with_audio_swap_at_start_fail(mock_cg, merger):
@@ -81,4 +99,162 @@ def test_stats_logs_created_files(merger, caplog):
         merger.stats()
     assert "Tổng số video đã tạo: 2" in caplog.text
     assert "- a.mp4" in caplog.text
-    assert "- b.mp4" in caplog.text
\ No newline at end of file
+    assert "- b.mp4" in caplog.text
+
+@patch("src.VideoMerger.swap_audio_at_start_copy", side_effect=IOError("codec"))
+@patch("src.VideoMerger.concatenate_videoclips")
+@patch("src.VideoMerger.VideoFileClip")
+@patch("src.VideoMerger.probe_media")
+def test_short_audio_from_video_stays_open_until_written(mock_probe, mock_vfc, mock_concat, mock_swap, merger):
+    mock_probe.return_value = {"has_audio": True, "duration": 3}
+    merger.get_video_details = MagicMock(return_value=((720, 1280), 30, 10))
+    audio_source = MagicMock()
+    video = MagicMock()
+    mock_vfc.side_effect = [audio_source, video]
+
+    def write(path, **kwargs):
+        audio_source.close.assert_not_called()
+        raise IOError("disk full")
+    mock_concat.return_value.write_videofile.side_effect = write
+    out = merger.merge_with_audio_swap_at_start("video.mp4", "song.mp4", "out.mp4")
+    assert out is None
+    # Lỗi khi ghi vẫn đóng hết reader.
+    audio_source.close.assert_called_once()
+    video.close.assert_called_once()
+    assert merger.CG.clips.live_readers() == 0
+
+@patch("src.VideoMerger.swap_audio_at_start_copy")
+@patch("src.VideoMerger.VideoFileClip")
+@patch("src.VideoMerger.probe_media")
+def test_short_audio_swap_copies_video_stream(mock_probe, mock_vfc, mock_swap, merger):
+    mock_probe.return_value = {"has_audio": True, "duration": 3}
+    merger.get_video_details = MagicMock(return_value=((720, 1280), 30, 10))
+    mock_swap.side_effect = _write_output
+    out = merger.merge_with_audio_swap_at_start("video.mp4", "song.mp3", "out.mp4")
+    assert mock_swap.call_args[0][3:6] == (3, 10, True)
+    mock_vfc.assert_not_called()
+    assert out.endswith("out.mp4")
+
+@patch("src.SegmentEncoder.run_ffmpeg")
+@patch("src.VideoMerger.probe_media")
+def test_fan_out_prepares_video_once(mock_probe, mock_run, merger):
+    mock_run.side_effect = lambda args: open(args[-1], "wb").close()
+    mock_probe.return_value = {"video_codec": "wmv2", "has_audio": True, "duration": 5.0}
+    merger.merge_with_audio_swap_at_start = MagicMock(side_effect=lambda v, a, n: n)
+    outs = merger.merge_fan_out("clips/talk.wmv", ["a/s1.mp3", "a/s2.mp3", "a/s3.mp3"])
+    assert outs == ["talk_s1.mp4", "talk_s2.mp4", "talk_s3.mp4"]
+    mock_run.assert_called_once()
+    sources = {c.args[0] for c in merger.merge_with_audio_swap_at_start.call_args_list}
+    assert sources == {os.path.join(merger.CG.temp_folder, "talk_fanout.mp4")}
+    mock_probe.return_value = {"video_codec": "h264"}
+    assert merger.prepare_fan_out_source("clips/talk.mp4") == "clips/talk.mp4"
+
+@patch("src.VideoMerger.VideoFileClip")
+@patch("src.VideoMerger.swap_audio_at_start_copy", side_effect=RuntimeError("killed"))
+@patch("src.VideoMerger.probe_media")
+def test_failed_render_leaves_no_output(mock_probe, mock_swap, mock_vfc, merger):
+    mock_probe.return_value = {"has_audio": True, "duration": 3}
+    merger.get_video_details = MagicMock(return_value=((720, 1280), 30, 10))
+
+    def partial_write(video, audio, tmp_path, *args, **kwargs):
+        with open(tmp_path, "wb") as f:
+            f.write(b"half")
+        raise RuntimeError("killed")
+    mock_swap.side_effect = partial_write
+    assert merger.merge_with_audio_swap_at_start("video.mp4", "song.mp3", "out.mp4") is None
+    assert os.listdir(merger.output_folder) == []
+
+def test_run_queue_retries_failed_jobs(merger, tmp_path):
+    from src.JobQueue import JobQueue
+    from src.BatchMerger import JobResult
+    now = [0.0]
+    queue = JobQueue(str(tmp_path / "jobs.sqlite"), backoff=5, clock=lambda: now[0])
+    merger.enqueue_cross_product(queue, ["v.mp4"], ["a.mp3", "b.mp3"])
+    merger._prepare_sources = lambda jobs, lease: jobs
+    attempts = []
+
+    def run_batch(jobs, on_result):
+        results = []
+        for job in jobs:
+            attempts.append(job.audio_path)
+            if job.audio_path == "b.mp3" and attempts.count("b.mp3") == 1:
+                result = JobResult(job, error="boom")
+            else:
+                out = str(tmp_path / job.output_filename)
+                _write_output(None, None, out)
+                merger.created_files.append(out)
+                result = JobResult(job, output_path=out)
+            on_result(result)
+            results.append(result)
+        return results
+    merger.run_batch = run_batch
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+    merger.run_queue(queue, sleep=sleep)
+    assert attempts == ["a.mp3", "b.mp3", "b.mp3"]
+    assert sleeps == [5]
+    assert queue.counts()["done"] == 2
+    # Chạy lại hàng đợi đã xong không làm lại job nào.
+    merger.run_queue(queue, sleep=sleep)
+    assert len(attempts) == 3 and len(merger.created_files) == 2
+    queue.close()
+
+@patch("src.VideoMerger.VideoFileClip")
+@patch("src.VideoMerger.swap_audio_at_start_copy")
+@patch("src.VideoMerger.probe_media")
+def test_short_audio_swap_resumes_at_silence(mock_probe, mock_swap, mock_vfc, tmp_path):
+    merger = VideoMerger(str(tmp_path), temp_folder=str(tmp_path / "temp"), silence_snap=2.0)
+    mock_probe.return_value = {"has_audio": True, "duration": 3}
+    merger.get_video_details = MagicMock(return_value=((720, 1280), 30, 10))
+    merger.CG.snap_to_silence = MagicMock(return_value=4.2)
+    mock_swap.side_effect = _write_output
+    merger.merge_with_audio_swap_at_start("video.mp4", "song.mp3", "out.mp4")
+    merger.CG.snap_to_silence.assert_called_once_with("video.mp4", 3, 2.0, forward_only=True)
+    assert mock_swap.call_args[1]["switch_time"] == 4.2
+
+def test_swap_args_pad_new_audio_until_switch_time():
+    from src.FFmpegTools import swap_audio_at_start_args
+    args = swap_audio_at_start_args("v.mp4", "a.mp3", "out.mp4", 3.0, 10.0, switch_time=4.5)
+    graph = args[args.index("-filter_complex") + 1]
+    assert "atrim=end=3.000000" in graph and "apad=whole_dur=4.500000" in graph
+    assert "atrim=start=4.500000" in graph
+
+@patch("src.CatGhepCoBan.CatGhepCoBan.replace_audio")
+@patch("src.VideoMerger.swap_audio_at_start_copy")
+@patch("src.JobPlanner.probe_media")
+@patch("src.VideoMerger.probe_media")
+@patch("src.SegmentEncoder.run_ffmpeg")
+def test_quota_keeps_fan_out_source_for_whole_batch(mock_run, mock_probe, mock_plan_probe,
+                                                    mock_swap, mock_replace, tmp_path):
+    from src.ScratchSpace import ScratchSpace
+    scratch = ScratchSpace(str(tmp_path / "temp"), quota_bytes=1, min_age=0)
+    merger = VideoMerger(str(tmp_path / "out"), max_workers=1, scratch=scratch)
+    videos = [_write_output(None, None, str(tmp_path / f"{name}.avi")) for name in ("v", "w")]
+    audios = {
+        "a8.mp3": {"has_audio": True, "duration": 8.0},
+        "a30.mp3": {"has_audio": True, "duration": 30.0},
+    }
+    mock_probe.side_effect = lambda path: audios.get(path) or {
+        "video_codec": "wmv2", "has_audio": True, "duration": 10.0,
+        "width": 720, "height": 1280, "fps": 30}
+    mock_plan_probe.side_effect = mock_probe.side_effect
+    mock_run.side_effect = lambda args: _write_output(None, None, args[-1])
+    used = []
+
+    def write(video_path, audio_path, output_path, *args, **kwargs):
+        # Nguồn fan-out phải còn nguyên lúc job dùng, dù quota đã bị vượt.
+        used.append(os.path.exists(video_path))
+        return _write_output(None, None, output_path)
+    mock_swap.side_effect = write
+    mock_replace.side_effect = lambda v, a, out: write(v, a, out)
+    results = merger.merge_cross_product(videos, list(audios))
+    assert [r.ok for r in results] == [True] * 4 and used == [True] * 4
+    sources = {os.path.join(scratch.root, f"{name}_fanout.mp4") for name in ("v", "w")}
+    assert {r.job.video_path for r in results} == sources
+    # Hết batch thì nguồn không còn được giữ và bị dọn theo quota như thường.
+    assert scratch.leased_paths() == set()
+    scratch.enforce_quota()
+    assert not any(os.path.exists(source) for source in sources)
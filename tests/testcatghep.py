@@ -2,7 +2,7 @@ import os
 import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import pytest
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 from src.CatGhepCoBan import CatGhepCoBan
 
 @pytest.fixture
@@ -36,12 +36,58 @@ def test_merge_videos(mock_vfc, mock_concat, cg):
     mock_out.write_videofile.assert_called_once()
     assert out_path.endswith(".mp4")
 
+def _probe_info(**overrides):
+    info = {
+        "duration": 5.0, "has_video": True, "video_codec": "h264", "pix_fmt": "yuv420p",
+        "width": 720, "height": 1280, "fps": 30.0, "has_audio": True,
+        "audio_codec": "aac", "audio_rate": 44100, "audio_channels": "stereo",
+    }
+    info.update(overrides)
+    return info
+
+@patch("src.CatGhepCoBan.concat_copy")
+@patch("src.CatGhepCoBan.VideoFileClip")
+@patch("src.CatGhepCoBan.probe_media")
+def test_merge_videos_stream_copy_when_params_match(mock_probe, mock_vfc, mock_copy, cg):
+    mock_probe.return_value = _probe_info()
+    mock_copy.side_effect = lambda paths, out, folder: out
+    out_path = cg.merge_videos("a.mp4", "b.mp4")
+    mock_copy.assert_called_once()
+    assert mock_copy.call_args[0][0] == ["a.mp4", "b.mp4"]
+    mock_vfc.assert_not_called()
+    assert out_path.endswith("a_b.mp4")
+
+@patch("src.CatGhepCoBan.concat_copy")
+@patch("src.CatGhepCoBan.concatenate_videoclips")
+@patch("src.CatGhepCoBan.VideoFileClip")
+@patch("src.CatGhepCoBan.probe_media")
+def test_merge_videos_falls_back_to_reencode(mock_probe, mock_vfc, mock_concat, mock_copy, cg):
+    mock_probe.side_effect = [_probe_info(), _probe_info(width=1280, height=720)]
+    cg.merge_videos("a.mp4", "b.mp4")
+    mock_copy.assert_not_called()
+    mock_concat.return_value.write_videofile.assert_called_once()
+
+@patch("src.CatGhepCoBan.probe_media")
+def test_can_stream_copy_checks_audio_and_fps(mock_probe, cg):
+    mock_probe.side_effect = [_probe_info(), _probe_info(has_audio=False, audio_codec=None)]
+    assert not cg.can_stream_copy(["a.mp4", "b.mp4"])
+    mock_probe.side_effect = [_probe_info(fps=25.0)]
+    assert not cg.can_stream_copy(["a.mp4"])
+    mock_probe.side_effect = IOError("bad file")
+    assert not cg.can_stream_copy(["a.mp4"])
+
+@patch("src.CatGhepCoBan.probe_media")
+def test_merge_videos_copy_mode_rejects_mismatch(mock_probe, cg):
+    mock_probe.return_value = _probe_info(video_codec="hevc")
+    with pytest.raises(ValueError):
+        cg.merge_videos("a.mp4", "b.mp4", mode="copy")
+
 @patch("src.CatGhepCoBan.VideoFileClip")
 def test_extract_audio_with_audio(mock_vfc, cg):
     mock_audio = MagicMock()
     mock_clip = MagicMock()
     mock_clip.audio = mock_audio
-    mock_vfc.return_value.__enter__.return_value = mock_clip
+    mock_vfc.return_value = mock_clip
     out = cg.extract_audio("video1.mp4")
     mock_audio.write_audiofile.assert_called_once()
     assert out.endswith(".mp3")
@@ -50,84 +96,214 @@ def test_extract_audio_with_audio(mock_vfc, cg):
 def test_extract_audio_no_audio(mock_vfc, cg):
     mock_clip = MagicMock()
     mock_clip.audio = None
-    mock_vfc.return_value.__enter__.return_value = mock_clip
+    mock_vfc.return_value = mock_clip
     out = cg.extract_audio("video1.mp4")
     assert out is None
 
-@patch("src.CatGhepCoBan.AudioFileClip")
 @patch("src.CatGhepCoBan.VideoFileClip")
-def test_set_audio_video(mock_vfc, mock_afc, cg):
+@patch("src.CatGhepCoBan.replace_audio_copy")
+@patch("src.CatGhepCoBan.probe_media")
+def test_set_audio_video(mock_probe, mock_copy, mock_vfc, cg):
+    mock_probe.return_value = _probe_info(duration=10.0)
+    mock_copy.side_effect = lambda v, a, out, **kw: out
+    out = cg.set_audio_video("video1.mp4", "video2.mp4")
+    mock_copy.assert_called_once()
+    assert mock_copy.call_args[0][:2] == ("video1.mp4", "video2.mp4")
+    assert mock_copy.call_args[1]["duration"] == 10.0
+    mock_vfc.assert_not_called()
+    assert out.endswith("_new_audio.mp4")
+
+@patch("src.CatGhepCoBan.VideoFileClip")
+@patch("src.CatGhepCoBan.replace_audio_copy")
+@patch("src.CatGhepCoBan.probe_media")
+def test_replace_audio_falls_back_to_reencode(mock_probe, mock_copy, mock_vfc, cg):
+    mock_probe.return_value = _probe_info(duration=10.0)
+    mock_copy.side_effect = IOError("codec not supported in mp4")
     mock_video = MagicMock()
-    mock_audio = MagicMock()
     mock_video.duration = 10
-    mock_audio.duration = 15
-    mock_vfc.return_value = mock_video
-    mock_afc.return_value = mock_audio
-    mock_video.set_audio.return_value = mock_video
-    out = cg.set_audio_video("video1.mp4", "video2.mp4")
-    # Sửa dòng này:
-    mock_video.set_audio.assert_called_once_with(mock_audio.subclip.return_value)
-    mock_video.write_videofile.assert_called_once()
-    assert out.endswith(".mp4")
+    mock_audio_src = MagicMock()
+    mock_audio_src.audio.duration = 15
+    mock_vfc.side_effect = [mock_video, mock_audio_src]
+    out = cg.replace_audio("video1.avi", "video2.mp4")
+    mock_video.with_audio.assert_called_once_with(mock_audio_src.audio.subclipped.return_value)
+    mock_video.with_audio.return_value.write_videofile.assert_called_once()
+    assert out.endswith("_audio_replaced.mp4")
 
 @patch("src.CatGhepCoBan.VideoFileClip")
 def test_split_video_by_time(mock_vfc, cg):
     mock_clip = MagicMock()
     mock_clip.duration = 20
-    mock_clip.subclip.side_effect = [MagicMock(), MagicMock()]
-    mock_vfc.return_value.__enter__.return_value = mock_clip
-    out1, out2 = cg.split_video_by_time("video1.mp4", 10)
-    assert mock_clip.subclip.call_count == 2
+    mock_clip.subclipped.side_effect = [MagicMock(), MagicMock()]
+    mock_vfc.return_value = mock_clip
+    out1, out2 = cg.split_video_by_time("video1.mp4", 10, mode="reencode")
+    assert mock_clip.subclipped.call_count == 2
     assert out1.endswith("part1.mp4")
     assert out2.endswith("part2.mp4")
 
-@patch("src.CatGhepCoBan.CompositeAudioClip")
-@patch("src.CatGhepCoBan.AudioFileClip")
-def test_mix_two_audios(mock_afc, mock_cac, cg):
-    mock_audio1 = MagicMock()
-    mock_audio2 = MagicMock()
-    mock_audio1.duration = 5
-    mock_audio2.duration = 10
-    mock_afc.side_effect = [mock_audio1, mock_audio2]
-    mock_combined = MagicMock()
-    mock_cac.return_value = mock_combined
+@patch("src.CatGhepCoBan.VideoFileClip")
+@patch("src.CatGhepCoBan.split_at_times")
+def test_split_video_by_time_smart(mock_split, mock_vfc, cg):
+    out1, out2 = cg.split_video_by_time("video1.mp4", 10)
+    mock_split.assert_called_once_with(
+        "video1.mp4", [10], [out1, out2], ANY, cg.video_codec, cg.encode_profile
+    )
+    # Intermediate nằm trong thư mục job riêng, bị xóa khi thao tác xong.
+    work_folder = mock_split.call_args[0][3]
+    assert os.path.dirname(work_folder) == os.path.join(cg.temp_folder, ".jobs")
+    assert not os.path.exists(work_folder)
+    mock_vfc.assert_not_called()
+    assert out1.endswith("video1_part1.mp4")
+
+@patch("src.CatGhepCoBan.split_at_times")
+def test_split_video_at_times_names_parts(mock_split, cg):
+    mock_split.side_effect = lambda src, times, outs, folder, codec, profile: outs
+    outs = cg.split_video_at_times("talk.mp4", [60, 120, 180])
+    assert [os.path.basename(o) for o in outs] == [
+        "talk_part1.mp4", "talk_part2.mp4", "talk_part3.mp4", "talk_part4.mp4"
+    ]
+
+@patch("src.CatGhepCoBan.mix_tracks")
+def test_mix_two_audios(mock_mix, cg):
+    mock_mix.side_effect = lambda paths, out, gains, **kw: out
     out = cg.mix_two_audios("video1.mp4", "video2.mp4", duration_limit=6)
-    mock_cac.assert_called_once()
-    mock_combined.write_audiofile.assert_called_once()
+    mock_mix.assert_called_once()
+    assert mock_mix.call_args[0][0] == ["video1.mp4", "video2.mp4"]
+    assert mock_mix.call_args[1]["duration"] == 6
     assert out.endswith("_mixed.mp3")
 
-@patch("src.CatGhepCoBan.CompositeAudioClip")
-@patch("src.CatGhepCoBan.AudioFileClip")
-@patch("src.CatGhepCoBan.VideoFileClip")
-def test_mix_audio_with_video_has_audio(mock_vfc, mock_afc, mock_cac, cg):
-    mock_video = MagicMock()
-    mock_audio = MagicMock()
-    mock_video.audio = MagicMock()
-    mock_video.duration = 10
-    mock_audio.duration = 8
-    mock_vfc.return_value = mock_video
-    mock_afc.return_value = mock_audio
-    mock_final_audio = MagicMock()
-    mock_cac.return_value = mock_final_audio
-    mock_video.set_audio.return_value = mock_video
+@patch("src.CatGhepCoBan.mix_tracks")
+def test_mix_audios_n_tracks_with_gains(mock_mix, cg):
+    mock_mix.side_effect = lambda paths, out, gains, **kw: out
+    out = cg.mix_audios(["a.mp3", "b.wav", "c.m4a"], gains=[1.0, 0.5, 0.25])
+    assert mock_mix.call_args[0][2] == [1.0, 0.5, 0.25]
+    assert out.endswith("a_b_c_mixed.mp3")
+
+@patch("src.CatGhepCoBan.mix_tracks")
+@patch("src.CatGhepCoBan.probe_media")
+def test_mix_audio_with_video_has_audio(mock_probe, mock_mix, cg):
+    mock_probe.return_value = _probe_info(duration=10.0)
+    mock_mix.side_effect = lambda tracks, out, gains, **kw: out
     out = cg.mix_audio_with_video("video1.mp4", "video2.mp4")
-    mock_cac.assert_called_once_with([mock_video.audio, mock_audio])
-    mock_video.set_audio.assert_called_once_with(mock_final_audio)
-    mock_video.write_videofile.assert_called_once()
+    args, kwargs = mock_mix.call_args
+    assert args[0] == ["video1.mp4", "video2.mp4"]
+    assert kwargs["duration"] == 10.0
+    assert kwargs["video_path"] == "video1.mp4"
+    assert out.endswith("_da_tron_am_thanh.mp4")
+
+@patch("src.CatGhepCoBan.mix_tracks")
+@patch("src.CatGhepCoBan.probe_media")
+def test_mix_audio_with_video_no_audio(mock_probe, mock_mix, cg):
+    mock_probe.return_value = _probe_info(duration=10.0, has_audio=False)
+    mock_mix.side_effect = lambda tracks, out, gains, **kw: out
+    out = cg.mix_audio_with_video("video1.mp4", "video2.mp4", gains=(0.5, 0.8))
+    assert mock_mix.call_args[0][0] == ["video2.mp4"]
+    assert mock_mix.call_args[0][2] == [0.8]
     assert out.endswith("_da_tron_am_thanh.mp4")
 
-@patch("src.CatGhepCoBan.AudioFileClip")
+@patch("src.CatGhepCoBan.replace_audio_copy")
+def test_result_cache_skips_repeated_render(mock_remux, tmp_path):
+    from src.ResultCache import ResultCache
+    video = tmp_path / "v.mp4"
+    audio = tmp_path / "a.mp3"
+    video.write_bytes(b"video")
+    audio.write_bytes(b"audio")
+    out = str(tmp_path / "out.mp4")
+
+    def remux(video_path, audio_path, output_path, **kwargs):
+        with open(output_path, "wb") as f:
+            f.write(b"out")
+        return output_path
+    mock_remux.side_effect = remux
+    cg = CatGhepCoBan(temp_folder=str(tmp_path), result_cache=ResultCache(str(tmp_path / "cache")))
+    with patch("src.CatGhepCoBan.probe_media", return_value=_probe_info()):
+        cg.replace_audio(str(video), str(audio), out)
+        cg.replace_audio(str(video), str(audio), out)
+    assert mock_remux.call_count == 1
+    assert os.path.exists(out)
+
 @patch("src.CatGhepCoBan.VideoFileClip")
-def test_mix_audio_with_video_no_audio(mock_vfc, mock_afc, cg):
-    mock_video = MagicMock()
-    mock_audio = MagicMock()
-    mock_video.audio = None
-    mock_video.duration = 10
-    mock_audio.duration = 8
-    mock_vfc.return_value = mock_video
-    mock_afc.return_value = mock_audio
-    mock_video.set_audio.return_value = mock_video
-    out = cg.mix_audio_with_video("video1.mp4", "video2.mp4")
-    mock_video.set_audio.assert_called_once_with(mock_audio)
-    mock_video.write_videofile.assert_called_once()
-    assert out.endswith("_da_tron_am_thanh.mp4")
\ No newline at end of file
+@patch("src.CatGhepCoBan.concatenate_videoclips")
+@patch("src.CatGhepCoBan.probe_media")
+def test_reencode_uses_encode_profile(mock_probe, mock_concat, mock_vfc, tmp_path):
+    mock_probe.return_value = _probe_info()
+    cg = CatGhepCoBan(temp_folder=str(tmp_path), encode_profile="fast-draft")
+    cg.merge_videos("a.mp4", "b.mp4", mode="reencode")
+    kwargs = mock_concat.return_value.write_videofile.call_args[1]
+    assert kwargs["preset"] == "ultrafast"
+    assert kwargs["ffmpeg_params"] == ["-crf", "28"]
+    assert kwargs["pixel_format"] == "yuv420p"
+    assert kwargs["audio_bitrate"] == "96k"
+
+@patch("src.CatGhepCoBan.concat_copy")
+@patch("src.SegmentEncoder.run_ffmpeg")
+@patch("src.CatGhepCoBan.probe_media")
+def test_normalize_encodes_each_source_once(mock_probe, mock_ffmpeg, mock_copy, tmp_path):
+    from src.ResultCache import ResultCache
+    intro = tmp_path / "intro.mov"
+    intro.write_bytes(b"intro")
+    videos = []
+    for name in ("a.mp4", "b.mp4"):
+        (tmp_path / name).write_bytes(name.encode())
+        videos.append(str(tmp_path / name))
+    # intro sai độ phân giải, không có audio; các video đã đúng mezzanine.
+    mock_probe.side_effect = lambda path: (
+        _probe_info(width=1920, height=1080, has_audio=False, audio_codec=None)
+        if path == str(intro) else _probe_info()
+    )
+
+    def encode(args):
+        with open(args[-1], "wb") as f:
+            f.write(b"norm")
+    mock_ffmpeg.side_effect = encode
+    mock_copy.side_effect = lambda paths, out, folder: out
+    cg = CatGhepCoBan(
+        temp_folder=str(tmp_path / "temp"), normalize_cache=ResultCache(str(tmp_path / "norm"))
+    )
+    for video in videos:
+        cg.merge_videos(str(intro), video, str(tmp_path / "out.mp4"))
+    assert mock_ffmpeg.call_count == 1
+    args = mock_ffmpeg.call_args[0][0]
+    assert args[args.index("-vf") + 1].startswith("scale=720:1280,setsar=1,fps=30")
+    assert args[args.index("-t") + 1] == "5.000000"
+    assert "anullsrc=r=44100:cl=stereo" in args
+    parts = mock_copy.call_args[0][0]
+    assert parts[1] == videos[1] and parts[0].endswith(".mp4") and parts[0] != str(intro)
+
+@patch("src.CatGhepCoBan.VideoFileClip")
+@patch("src.CatGhepCoBan.probe_media")
+def test_normalize_source_keeps_normalized_input(mock_probe, mock_vfc, cg):
+    mock_probe.return_value = _probe_info()
+    assert cg.normalize_source("a.mp4") == "a.mp4"
+    mock_vfc.assert_not_called()
+
+@patch("src.CatGhepCoBan.VideoFileClip")
+@patch("src.CatGhepCoBan.concat_copy")
+@patch("src.SegmentEncoder.run_ffmpeg")
+@patch("src.CatGhepCoBan.probe_media")
+def test_merge_many_normalizes_only_mismatched_clips(mock_probe, mock_ffmpeg, mock_copy, mock_vfc, cg):
+    mock_probe.side_effect = lambda path: (
+        _probe_info(fps=25.0) if path.startswith("intro") else _probe_info()
+    )
+    mock_ffmpeg.side_effect = lambda args: open(args[-1], "wb").close()
+    mock_copy.side_effect = lambda paths, out, folder: out
+    paths = ["intro.mp4", "a.mp4", "b.mp4", "intro.mp4"]
+    out = cg.merge_many(paths)
+    # intro xuất hiện hai lần nhưng chỉ encode một lần; một lần nối duy nhất.
+    assert mock_ffmpeg.call_count == 1
+    mock_copy.assert_called_once()
+    parts = mock_copy.call_args[0][0]
+    assert parts[1:3] == ["a.mp4", "b.mp4"]
+    assert parts[0] == parts[3] and parts[0] != "intro.mp4"
+    mock_vfc.assert_not_called()
+    assert out.endswith("intro_merged_4.mp4")
+
+@patch("src.CatGhepCoBan.concat_copy")
+@patch("src.CatGhepCoBan.probe_media")
+def test_merge_many_copies_compatible_list(mock_probe, mock_copy, cg):
+    mock_probe.return_value = _probe_info(audio_rate=48000)
+    mock_copy.side_effect = lambda paths, out, folder: out
+    cg.merge_many(["a.mp4", "b.mp4", "c.mp4"], "out.mp4")
+    mock_copy.assert_called_once_with(["a.mp4", "b.mp4", "c.mp4"], "out.mp4", ANY)
+    assert mock_copy.call_args[0][2].startswith(os.path.join(cg.temp_folder, ".jobs"))
+    with pytest.raises(ValueError):
+        cg.merge_many([])